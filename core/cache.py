@@ -0,0 +1,127 @@
+"""
+Versioned caching for slowly changing reference data.
+
+Every namespace has a version counter in the CacheVersion table. Cached
+values are keyed by that version, so bumping it (from model signals)
+invalidates the whole namespace at once across all processes, whatever
+cache backend they use: with the default per-process LocMemCache each
+process simply loads its own copy of the new version. Each process also
+keeps the values it has seen in a small LRU, and the version numbers it
+has read for VERSION_TTL seconds, so the common case costs no query at
+all. A bump is seen at once by the process that made it and within
+VERSION_TTL seconds by the others.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CacheVersion
+
+LOCAL_CACHE_SIZE = 256
+# How long a process trusts a version number it read before asking again
+VERSION_TTL = 5
+DEFAULT_TIMEOUT = 60 * 60 * 24
+# Fragments keyed on updated_at never go stale; the timeout only bounds
+# how long text pulled in from other rows (a course title, say) can lag
+FRAGMENT_TIMEOUT = 60 * 60
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """A small thread-safe least-recently-used mapping"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local = LocalLRU(LOCAL_CACHE_SIZE)
+# {namespace: (version, time.monotonic() when read)}
+_versions = {}
+
+
+def get_version(namespace):
+    """Current version of ``namespace``, as every process sees it"""
+    versions = CacheVersion.objects.filter(namespace=namespace)
+    version = versions.values_list('version', flat=True).first()
+    if version is None:
+        try:
+            with transaction.atomic():
+                # Seed from the clock so a recreated counter never reuses a version still in the cache
+                CacheVersion.objects.create(namespace=namespace, version=time.time_ns() // 1000)
+        except IntegrityError:
+            # Another process created it first
+            pass
+        version = versions.values_list('version', flat=True).get()
+    _versions[namespace] = (version, time.monotonic())
+    return version
+
+
+def recent_version(namespace):
+    """Version of ``namespace`` as read at most VERSION_TTL seconds ago"""
+    version, read_at = _versions.get(namespace, (None, 0))
+    if version is None or time.monotonic() - read_at >= VERSION_TTL:
+        version = get_version(namespace)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every cached value in ``namespace``; returns the new version"""
+    # The UPDATE is atomic, so concurrent bumps from different processes are never lost
+    CacheVersion.objects.filter(namespace=namespace).update(version=F('version') + 1)
+    return get_version(namespace)
+
+
+def bump_version_on_commit(namespace, using=None):
+    """Bump once the current transaction commits, so readers never cache uncommitted data"""
+    transaction.on_commit(lambda: bump_version(namespace), using=using)
+
+
+def get_reference(namespace, name, loader, timeout=DEFAULT_TIMEOUT):
+    """Return the cached value of ``loader()`` for the current namespace version"""
+    key = f'refdata:{namespace}:{name}:{recent_version(namespace)}'
+    value = _local.get(key, _MISSING)
+    if value is _MISSING:
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            cache.set(key, value, timeout)
+        _local.set(key, value)
+    return value
+
+
+def touch(model, pks, using=None):
+    """Move ``updated_at`` forward on rows of ``model``.
+
+    Template fragments are cached under their object's updated_at, so
+    touching a parent when one of its child rows changes re-renders it. A
+    queryset update is used so no save signals fire.
+    """
+    pks = {pk for pk in pks if pk is not None}
+    if pks:
+        model.objects.using(using).filter(pk__in=pks).update(updated_at=timezone.now())
@@ -0,0 +1,78 @@
+"""
+Conditional GET for the public catalog pages.
+
+A view decorated with conditional_page() is given a validator function that
+runs before it: ``validator(request, *args, **kwargs)`` returns the newest
+``updated_at`` among the rows the page shows and a tuple of anything else
+the page depends on (a row count), all read from the database so every
+process computes the same validators for the same data. Those become
+the ETag and Last-Modified headers, and a request whose If-None-Match or
+If-Modified-Since still matches gets a 304 without the view running.
+Validators only aggregate timestamps; code that changes what a page shows
+without saving the rows involved touches their updated_at (see
+core.cache.touch) so the validators notice.
+
+Only anonymous requests are validated. Signed-in pages carry per-user
+content and are always rendered, as are requests with pending flash
+messages.
+"""
+import hashlib
+import os
+from functools import lru_cache, wraps
+
+from django.contrib.messages import get_messages
+from django.template import engines
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+@lru_cache(maxsize=None)
+def template_version():
+    """Newest template file modification time, so deploys that change markup change every ETag"""
+    newest = 0
+    for engine in engines.all():
+        for directory in getattr(engine, 'template_dirs', ()):
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    try:
+                        newest = max(newest, os.stat(os.path.join(root, name)).st_mtime_ns)
+                    except FileNotFoundError:
+                        continue
+    return newest
+
+
+def make_etag(last_modified, parts=()):
+    content = '|'.join(str(part) for part in (template_version(), last_modified.isoformat(), *parts))
+    return quote_etag(hashlib.md5(content.encode(), usedforsecurity=False).hexdigest())
+
+
+def conditional_page(validator):
+    """Answer anonymous GETs with a 304 when ``validator`` says the page is unchanged.
+
+    ``validator`` returns (last_modified, parts), or None to render the page
+    normally (for a 404, say).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated or len(get_messages(request)):
+                return view(request, *args, **kwargs)
+            validated = validator(request, *args, **kwargs)
+            if validated is None:
+                return view(request, *args, **kwargs)
+            last_modified, parts = validated
+            etag = make_etag(last_modified, parts)
+            timestamp = int(last_modified.timestamp())
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(timestamp))
+            # Browsers may keep the page but must ask before showing it again
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,308 @@
+"""
+Server-side proxy and disk cache for external image URLs.
+
+Profile and course pictures given as URLs (Worker.profile_picture_url,
+Course.image_url) are rendered through proxy_url(), which signs the source
+URL and a VARIANT_WIDTHS width into a token for the ``image_proxy`` view.
+The first request fetches the source, resizes it and stores the result;
+later requests are served from disk and browsers keep the response for a
+year, since a token always names the same image.
+
+The cache directory holds two kinds of files:
+
+* ``blobs/ab/<sha256>.<ext>`` - resized images, named by the hash of their
+  bytes so identical pictures behind different URLs are stored once;
+* ``refs/ab/<sha256>`` - one per (URL, width, format), naming its blob.
+
+Each process checks the size of the cache after writing EVICT_CHECK_EVERY
+of IMAGE_PROXY_MAX_BYTES. If the blobs are over the limit, the least
+recently served are deleted along with the refs naming them. A blob that
+disappears between lookup and serving (evicted by another process, say)
+is treated as a miss and refetched. Failed fetches are remembered for
+FAILURE_TIMEOUT seconds so a dead host is not retried on every page view.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .images import VARIANT_FORMATS, VARIANT_WIDTHS
+
+logger = logging.getLogger(__name__)
+
+SALT = 'core.image_proxy'
+
+CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'jpg': 'image/jpeg',
+}
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+FETCH_TIMEOUT = 5
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+FAILURE_TIMEOUT = 5 * 60
+# Eviction frees space down to this fraction of the limit so it runs rarely
+EVICT_TO = 0.9
+# Stores check the cache size after writing this fraction of the limit
+EVICT_CHECK_EVERY = 0.05
+# Serving a blob refreshes its mtime at most this often
+TOUCH_INTERVAL = 60 * 60
+
+_evict_lock = threading.Lock()
+_written_lock = threading.Lock()
+_written = 0
+_fetch_locks = [threading.Lock() for _ in range(16)]
+
+
+class ImageProxyError(Exception):
+    """The source image could not be fetched or decoded"""
+
+
+def cache_root():
+    return Path(getattr(settings, 'IMAGE_PROXY_ROOT', Path(settings.MEDIA_ROOT) / 'image_cache'))
+
+
+def max_bytes():
+    return getattr(settings, 'IMAGE_PROXY_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+
+def proxy_url(url, size='card'):
+    """URL of the cached ``size`` copy of the external image ``url``.
+
+    Anything but an absolute http(s) URL is returned unchanged.
+    """
+    if not url or not url.startswith(('http://', 'https://')):
+        return url
+    # A plain Signer keeps the token stable, unlike the timestamped signing.dumps()
+    token = signing.Signer(salt=SALT).sign_object([url, VARIANT_WIDTHS[size]], compress=True)
+    return reverse('image_proxy', args=[token])
+
+
+def unsign(token):
+    """(url, width) from a proxy_url() token; raises signing.BadSignature"""
+    url, width = signing.Signer(salt=SALT).unsign_object(token)
+    if width not in VARIANT_WIDTHS.values():
+        raise signing.BadSignature('Unknown image width')
+    return url, width
+
+
+def _ref_path(root, url, width, extension):
+    key = hashlib.sha256(f'{width}:{extension}:{url}'.encode()).hexdigest()
+    return root / 'refs' / key[:2] / key
+
+
+def _blob_path(root, name):
+    return root / 'blobs' / name[:2] / name
+
+
+def _write_atomically(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def lookup(url, width, extension, root=None):
+    """Path of the cached blob for this image, or None on a miss"""
+    root = root or cache_root()
+    try:
+        name = _ref_path(root, url, width, extension).read_text().strip()
+        blob = _blob_path(root, name)
+        modified = blob.stat().st_mtime
+    except (FileNotFoundError, ValueError):
+        return None
+    if time.time() - modified > TOUCH_INTERVAL:
+        try:
+            os.utime(blob)
+        except FileNotFoundError:
+            return None
+    return blob
+
+
+def fetch(url, timeout=None, limit=None):
+    """Download ``url``, refusing anything over ``limit`` bytes"""
+    timeout = timeout or getattr(settings, 'IMAGE_PROXY_TIMEOUT', FETCH_TIMEOUT)
+    limit = limit or MAX_SOURCE_BYTES
+    request = urllib.request.Request(url, headers={'Accept': 'image/*', 'User-Agent': 'skilldevplatform-image-proxy'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > limit:
+                raise ImageProxyError(f'{url} is larger than {limit} bytes')
+            content = response.read(limit + 1)
+    except (urllib.error.URLError, OSError, ValueError) as exc:
+        raise ImageProxyError(f'Could not fetch {url}: {exc}') from exc
+    if len(content) > limit:
+        raise ImageProxyError(f'{url} is larger than {limit} bytes')
+    return content
+
+
+def resize(content, width, extension):
+    """Encode ``content`` at most ``width`` pixels wide; never upscales"""
+    try:
+        image = ImageOps.exif_transpose(Image.open(BytesIO(content)))
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise ImageProxyError(f'Not a usable image: {exc}') from exc
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    image_format, options = VARIANT_FORMATS[extension]
+    if image_format == 'JPEG' and image.mode == 'RGBA':
+        image = image.convert('RGB')
+    image.thumbnail((width, width * 4), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def store(url, width, extension, content, root=None):
+    """Save resized ``content`` for the image and return the blob path"""
+    root = root or cache_root()
+    name = f'{hashlib.sha256(content).hexdigest()}.{extension}'
+    blob = _blob_path(root, name)
+    written = 0
+    if blob.exists():
+        os.utime(blob)
+    else:
+        _write_atomically(blob, content)
+        written = len(content)
+    _write_atomically(_ref_path(root, url, width, extension), name.encode())
+    _count_written(written, root)
+    return blob
+
+
+def _count_written(size, root):
+    """Evict once this process has written EVICT_CHECK_EVERY of the limit since the last check"""
+    global _written
+    with _written_lock:
+        _written += size
+        due = _written >= max_bytes() * EVICT_CHECK_EVERY
+        if due:
+            _written = 0
+    if due:
+        evict(root=root)
+
+
+def get(url, width, extension, root=None):
+    """Path of the cached image, fetching and resizing it on a miss.
+
+    Raises ImageProxyError when the source is unavailable; the failure is
+    cached so the source is not hammered.
+    """
+    root = root or cache_root()
+    blob = lookup(url, width, extension, root)
+    if blob:
+        return blob
+    failure_key = f'image_proxy:failed:{hashlib.sha256(url.encode()).hexdigest()}'
+    if cache.get(failure_key):
+        raise ImageProxyError(f'{url} failed recently')
+    # Concurrent misses for one image fetch it once
+    with _fetch_locks[hash((url, width, extension)) % len(_fetch_locks)]:
+        blob = lookup(url, width, extension, root)
+        if blob:
+            return blob
+        try:
+            content = resize(fetch(url), width, extension)
+        except ImageProxyError:
+            cache.set(failure_key, True, FAILURE_TIMEOUT)
+            raise
+        return store(url, width, extension, content, root)
+
+
+def open_image(url, width, extension, root=None):
+    """(open file, path) of the cached image, like get().
+
+    A blob evicted between lookup and opening counts as a miss, so it is
+    fetched again instead of failing the request.
+    """
+    for _ in range(2):
+        path = get(url, width, extension, root)
+        try:
+            return open(path, 'rb'), path
+        except FileNotFoundError:
+            continue
+    raise ImageProxyError(f'{url} was evicted before it could be served')
+
+
+def usage(root=None):
+    """[(mtime, size, path)] for every cached blob"""
+    root = root or cache_root()
+    blobs = []
+    for directory in (root / 'blobs').glob('*'):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith('.tmp'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    blobs.append((stat.st_mtime, stat.st_size, entry.path))
+    return blobs
+
+
+def evict(limit=None, root=None):
+    """Delete the least recently served blobs until the cache fits ``limit`` bytes.
+
+    Refs naming a blob that is gone are deleted too. Returns (files
+    removed, bytes removed), counting blobs only.
+    """
+    limit = max_bytes() if limit is None else limit
+    root = root or cache_root()
+    with _evict_lock:
+        started = time.time()
+        blobs = usage(root)
+        total = sum(size for _, size, _ in blobs)
+        if total <= limit:
+            return 0, 0
+        target = limit * EVICT_TO
+        removed = freed = 0
+        kept = set()
+        for _, size, path in sorted(blobs):
+            if total - freed <= target:
+                kept.add(os.path.basename(path))
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            removed += 1
+            freed += size
+        _prune_refs(root, kept, started)
+    logger.info('Evicted %d cached images (%d bytes)', removed, freed)
+    return removed, freed
+
+
+def _prune_refs(root, blob_names, before):
+    """Delete refs older than ``before`` whose blob is not in ``blob_names``"""
+    for directory in (root / 'refs').glob('*'):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or entry.name.startswith('.tmp'):
+                    continue
+                try:
+                    # Refs written since eviction started may name blobs it did not list
+                    if entry.stat().st_mtime >= before:
+                        continue
+                    with open(entry.path) as file:
+                        name = file.read().strip()
+                    if name not in blob_names:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    continue
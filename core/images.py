@@ -0,0 +1,117 @@
+"""
+Resized image variants for uploaded pictures.
+
+Every tracked ImageField gets WebP and JPEG copies at each VARIANT_WIDTHS
+width, written next to the original under a ``variants/`` folder. They are
+generated on the background pool after upload, and the finished set is
+recorded in the model's ``<field>_variants`` column as the name of the image
+it belongs to. The ``responsive_image`` template tag reads that column, not
+the storage, to serve the variants once they exist and the original until
+then; replacing the image makes the recorded name stale by itself.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .tasks import submit_on_commit
+
+logger = logging.getLogger(__name__)
+
+# Sent with the model as sender once rows are marked as having variants, for
+# caches that hold instances (their updated_at is bumped already)
+variants_recorded = Signal()
+
+VARIANT_WIDTHS = {
+    'thumb': 320,
+    'card': 640,
+    'large': 1280,
+}
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_name(name, width, extension):
+    # The whole file name, extension included, so foo.png and foo.jpg get separate variants
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, 'variants', f'{filename}_{width}w.{extension}').replace(os.sep, '/')
+
+
+def variants_field(field_name):
+    """Name of the column recording which image of ``field_name`` has its variants"""
+    return f'{field_name}_variants'
+
+
+def has_variants(file):
+    """True once every variant of ``file`` has been written and recorded on its instance"""
+    return bool(file.name) and getattr(file.instance, variants_field(file.field.name), '') == file.name
+
+
+def variants_stored(name, storage):
+    """True when the storage holds a complete variant set for ``name``"""
+    # The largest WebP is written last, so it marks a complete set
+    return storage.exists(variant_name(name, max(VARIANT_WIDTHS.values()), 'webp'))
+
+
+def record_variants(model, field_name, name, using=None):
+    """Mark the rows still showing the image ``name`` as having its variants"""
+    # Detail fragments are cached by updated_at and must pick up the <picture> markup
+    updated = model._default_manager.using(using).filter(**{field_name: name}).update(
+        **{variants_field(field_name): name}, updated_at=timezone.now(),
+    )
+    if updated:
+        variants_recorded.send(sender=model, field_name=field_name, name=name, using=using)
+
+
+def generate_variants(name, storage):
+    """Write every variant of the stored image ``name``; never upscales"""
+    with storage.open(name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    for extension in ('jpg', 'webp'):
+        image_format, options = VARIANT_FORMATS[extension]
+        for width in sorted(VARIANT_WIDTHS.values()):
+            resized = image.copy()
+            resized.thumbnail((width, width * 4), Image.LANCZOS)
+            if image_format == 'JPEG' and resized.mode == 'RGBA':
+                resized = resized.convert('RGB')
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **options)
+            target = variant_name(name, width, extension)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def generate_variants_quietly(model, field_name, name, storage, using=None):
+    try:
+        generate_variants(name, storage)
+    except (OSError, ValueError):
+        logger.warning('Could not generate image variants for %s', name, exc_info=True)
+        return
+    record_variants(model, field_name, name, using=using)
+
+
+def track(model, *field_names):
+    """Generate variants in the background whenever ``field_names`` get a new image"""
+
+    def schedule_variants(sender, instance, raw=False, using=None, **kwargs):
+        if raw:
+            return
+        for field_name in field_names:
+            file = getattr(instance, field_name)
+            if file and not has_variants(file):
+                submit_on_commit(generate_variants_quietly, model, field_name, file.name, file.storage, using, using=using)
+
+    post_save.connect(schedule_variants, sender=model, weak=False, dispatch_uid=f'image_variants_{model._meta.label}')
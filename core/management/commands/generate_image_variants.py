@@ -0,0 +1,48 @@
+"""
+Management command to generate resized variants for existing uploaded images
+"""
+from django.core.management.base import BaseCommand
+from core.images import generate_variants, has_variants, record_variants, variants_field, variants_stored
+from skills.models import Skill
+from training.models import Course
+from workers.models import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates WebP/JPEG variants for uploaded skill, course and worker images and records them on the rows; '
+        'variant sets already in storage are only recorded'
+    )
+
+    IMAGE_FIELDS = [
+        (Skill, 'image'),
+        (Course, 'image'),
+        (Worker, 'profile_picture'),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist')
+
+    def handle(self, *args, **options):
+        generated = 0
+        for model, field_name in self.IMAGE_FIELDS:
+            objects = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for obj in objects.only('pk', field_name, variants_field(field_name)).iterator(chunk_size=500):
+                file = getattr(obj, field_name)
+                if not options['force']:
+                    if has_variants(file):
+                        continue
+                    if variants_stored(file.name, file.storage):
+                        # Generated before availability was recorded on the row
+                        record_variants(model, field_name, file.name)
+                        continue
+                try:
+                    generate_variants(file.name, file.storage)
+                except (OSError, ValueError) as exc:
+                    self.stdout.write(self.style.ERROR(f'Skipping {file.name}: {exc}'))
+                    continue
+                record_variants(model, field_name, file.name)
+                generated += 1
+                self.stdout.write(self.style.SUCCESS(f'Generated variants for {file.name}'))
+
+        self.stdout.write(self.style.SUCCESS(f'\nGenerated variants for {generated} images.'))
@@ -0,0 +1,205 @@
+"""
+Management command to bulk import skills and categories from CSV or JSONL
+"""
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.cache import bump_version
+from skills import graph
+from skills.models import Skill, SkillCategory
+from skills.reference import CATALOG
+from skills.search import index_skills
+
+DIFFICULTY_LEVELS = {choice for choice, _ in Skill._meta.get_field('difficulty_level').choices}
+
+UPDATE_FIELDS = ['description', 'category', 'difficulty_level', 'estimated_duration_hours', 'is_active', 'updated_at']
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams skills from a CSV or JSONL file and upserts them by name in batches. '
+        'Columns: name, description, category, difficulty_level, estimated_duration_hours, '
+        'prerequisites, is_active. Existing skills get every column replaced; prerequisites are only added.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import, or - for stdin')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows upserted per batch')
+        parser.add_argument('--prerequisite-separator', default='|', help='Separator for prerequisite names in CSV')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = max(1, options['batch_size'])
+        self.separator = options['prerequisite_separator']
+
+        self.categories = {}
+        self.skill_ids = {}
+        self.pending_prerequisites = {}
+        self.edges = set()
+        self.committed = False
+
+        started = time.monotonic()
+        imported = linked = 0
+        source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            rows = self.read_rows(source, file_format)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                imported += self.import_batch(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'{imported} skills imported ({imported / elapsed:,.0f} rows/s)')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            # Batches commit on their own, so a bad row still leaves the earlier ones to link and publish
+            if self.committed:
+                try:
+                    linked = self.link_prerequisites()
+                finally:
+                    bump_version(CATALOG)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'\nImported {imported} skills and {linked} prerequisite links in {elapsed:.1f}s '
+            f'({imported / elapsed if elapsed else imported:,.0f} rows/s).'
+        ))
+        if self.pending_prerequisites:
+            missing = sorted({name for names in self.pending_prerequisites.values() for name in names})
+            self.stdout.write(self.style.WARNING(f'{len(missing)} prerequisites not found: {", ".join(missing[:20])}'))
+        self.stdout.write(self.style.WARNING('Run "python manage.py refresh_related" to update related skills.'))
+
+    def read_rows(self, source, file_format):
+        if file_format == 'csv':
+            for line_number, row in enumerate(csv.DictReader(source), start=2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise CommandError(f'Line {line_number}: invalid JSON ({exc})')
+
+    def parse(self, line_number, row):
+        name = (row.get('name') or '').strip()
+        if not name:
+            raise CommandError(f'Line {line_number}: missing skill name')
+        difficulty = (row.get('difficulty_level') or row.get('difficulty') or 'beginner').strip().lower()
+        if difficulty not in DIFFICULTY_LEVELS:
+            raise CommandError(f'Line {line_number}: unknown difficulty "{difficulty}"')
+        prerequisites = row.get('prerequisites') or []
+        if isinstance(prerequisites, str):
+            prerequisites = prerequisites.split(self.separator)
+        is_active = row.get('is_active', True)
+        if isinstance(is_active, str):
+            is_active = is_active.strip().lower() not in ('0', 'false', 'no', '')
+        hours = row.get('estimated_duration_hours') or row.get('duration') or 40
+        try:
+            hours = int(hours)
+        except (TypeError, ValueError):
+            raise CommandError(f'Line {line_number}: estimated_duration_hours must be a whole number, not "{hours}"')
+        if hours < 0:
+            raise CommandError(f'Line {line_number}: estimated_duration_hours must not be negative')
+        return {
+            'name': name,
+            'description': row.get('description') or '',
+            'category': (row.get('category') or 'General').strip(),
+            'difficulty_level': difficulty,
+            'estimated_duration_hours': hours,
+            'is_active': bool(is_active),
+            'prerequisites': [prerequisite.strip() for prerequisite in prerequisites if prerequisite.strip()],
+        }
+
+    def resolve_categories(self, names):
+        missing = set(names) - self.categories.keys()
+        if not missing:
+            return
+        self.categories.update(SkillCategory.objects.filter(name__in=missing).values_list('name', 'pk'))
+        new = [SkillCategory(name=name) for name in missing - self.categories.keys()]
+        if new:
+            SkillCategory.objects.bulk_create(new)
+            self.committed = True
+            self.categories.update(SkillCategory.objects.filter(name__in=[c.name for c in new]).values_list('name', 'pk'))
+
+    def import_batch(self, batch):
+        # Later rows win when a batch names the same skill twice
+        records = {}
+        for line_number, row in batch:
+            record = self.parse(line_number, row)
+            records[record['name']] = record
+
+        self.resolve_categories({record['category'] for record in records.values()})
+        skills = [
+            Skill(
+                name=record['name'],
+                description=record['description'],
+                category_id=self.categories[record['category']],
+                difficulty_level=record['difficulty_level'],
+                estimated_duration_hours=record['estimated_duration_hours'],
+                is_active=record['is_active'],
+            )
+            for record in records.values()
+        ]
+        with transaction.atomic():
+            Skill.objects.bulk_create(skills, update_conflicts=True, unique_fields=['name'], update_fields=UPDATE_FIELDS)
+            ids = dict(Skill.objects.filter(name__in=records.keys()).values_list('name', 'pk'))
+            for skill in skills:
+                skill.pk = ids[skill.name]
+            index_skills(skills)
+        self.committed = True
+        self.skill_ids.update(ids)
+
+        for record in records.values():
+            if record['prerequisites']:
+                self.pending_prerequisites[record['name']] = record['prerequisites']
+        self.resolve_prerequisites()
+        return len(skills)
+
+    def resolve_prerequisites(self, lookup_missing=False):
+        """Turn pending prerequisite names into edges where both ends are known"""
+        if lookup_missing:
+            wanted = {name for names in self.pending_prerequisites.values() for name in names} - self.skill_ids.keys()
+            wanted = list(wanted)
+            for start in range(0, len(wanted), 500):
+                self.skill_ids.update(
+                    Skill.objects.filter(name__in=wanted[start:start + 500]).values_list('name', 'pk')
+                )
+        for name, prerequisites in list(self.pending_prerequisites.items()):
+            unresolved = []
+            for prerequisite in prerequisites:
+                if prerequisite in self.skill_ids:
+                    self.edges.add((self.skill_ids[name], self.skill_ids[prerequisite]))
+                else:
+                    unresolved.append(prerequisite)
+            if unresolved:
+                self.pending_prerequisites[name] = unresolved
+            else:
+                del self.pending_prerequisites[name]
+
+    def link_prerequisites(self):
+        """Insert the collected prerequisite edges and rebuild the closure, rejecting cycles"""
+        self.resolve_prerequisites(lookup_missing=True)
+        if not self.edges:
+            return 0
+        Through = Skill.prerequisites.through
+        try:
+            with transaction.atomic():
+                Through.objects.bulk_create(
+                    (Through(from_skill_id=skill_id, to_skill_id=prerequisite_id) for skill_id, prerequisite_id in self.edges),
+                    batch_size=5000,
+                    ignore_conflicts=True,
+                )
+                graph.rebuild()
+        except graph.PrerequisiteCycleError as exc:
+            raise CommandError(f'Skills were imported but prerequisites were not linked: {exc.messages[0]}')
+        return len(self.edges)
@@ -0,0 +1,51 @@
+"""
+Management command to render queued course completion certificates
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from training import certificates
+from training.models import Enrollment
+
+
+class Command(BaseCommand):
+    help = (
+        'Works off the certificate queue: claims due jobs in batches, renders their PDFs on a process pool '
+        'and attaches them to the enrollments. Runs until interrupted unless --once is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=certificates.BATCH_SIZE, help='Jobs claimed at a time')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='Rendering processes (default: CPU count)')
+        parser.add_argument('--poll', type=float, default=5.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Stop once no job is due')
+        parser.add_argument('--enqueue-missing', action='store_true', help='First queue every completed enrollment without a certificate')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['processes'] < 1:
+            raise CommandError('--batch-size and --processes must be at least 1')
+        if options['enqueue_missing']:
+            queued = certificates.enqueue(Enrollment.objects.all())
+            self.stdout.write(f'Queued {queued} certificates.')
+
+        issued = failed = 0
+        with ProcessPoolExecutor(max_workers=options['processes']) as pool:
+            try:
+                while True:
+                    job_ids = certificates.claim(options['batch_size'])
+                    if not job_ids:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                        continue
+                    batch_issued, batch_failed = certificates.process(job_ids, pool=pool)
+                    issued += batch_issued
+                    failed += batch_failed
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'  {batch_issued} issued, {batch_failed} failed')
+            except KeyboardInterrupt:
+                # Claimed jobs of an interrupted batch are reclaimed after CLAIM_TIMEOUT
+                self.stdout.write('Interrupted.')
+        self.stdout.write(self.style.SUCCESS(f'Issued {issued} certificates; {failed} failed (see the certificate jobs in the admin).'))
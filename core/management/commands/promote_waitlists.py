@@ -0,0 +1,29 @@
+"""
+Management command to fill free course seats from the waitlists
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from training.models import Course
+from training.services import promote_waitlist
+
+
+class Command(BaseCommand):
+    help = (
+        'Enrolls waitlisted workers into every course with free seats, in queue order. '
+        'Promotion normally runs in the background when seats open; this catches up after '
+        'restarts or bulk edits that bypassed it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses', help='Only promote for this course (repeatable)')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.filter(is_active=True, waitlist_count__gt=0, active_enrollment_count__lt=F('capacity'))
+        if options['courses']:
+            courses = courses.filter(pk__in=options['courses'])
+
+        promoted = 0
+        course_ids = list(courses.values_list('pk', flat=True))
+        for course_id in course_ids:
+            promoted += promote_waitlist(course_id)
+        self.stdout.write(self.style.SUCCESS(f'Enrolled {promoted} waitlisted workers in {len(course_ids)} courses.'))
@@ -0,0 +1,25 @@
+"""
+Management command to shrink the external image cache to its size limit
+"""
+from django.core.management.base import BaseCommand, CommandError
+from core import image_proxy
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the least recently served images from the external image cache '
+        'until it fits IMAGE_PROXY_MAX_BYTES (or --max-bytes).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-bytes', type=int, help='Size limit to prune to (default: IMAGE_PROXY_MAX_BYTES)')
+
+    def handle(self, *args, **options):
+        limit = options['max_bytes']
+        if limit is not None and limit < 0:
+            raise CommandError('--max-bytes must not be negative')
+        before = sum(size for _, size, _ in image_proxy.usage())
+        removed, freed = image_proxy.evict(limit=limit)
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} cached images ({freed:,} bytes); {before - freed:,} bytes remain.'
+        ))
@@ -0,0 +1,17 @@
+"""
+Management command to rebuild the skill prerequisite closure table
+"""
+from django.core.management.base import BaseCommand, CommandError
+from skills import graph
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the transitive closure of skill prerequisites'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Rebuilding prerequisite graph...'))
+        try:
+            paths = graph.rebuild()
+        except graph.PrerequisiteCycleError as exc:
+            raise CommandError(exc.messages[0])
+        self.stdout.write(self.style.SUCCESS(f'Stored {paths} prerequisite paths.'))
@@ -0,0 +1,19 @@
+"""
+Management command to recompute enrollment progress from module progress
+"""
+from django.core.management.base import BaseCommand
+from training import progress
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes course module minutes and every enrollment\'s completed modules, minutes, '
+        'time spent, progress percentage and status from CourseProgress rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses', help='Only rebuild this course (repeatable)')
+
+    def handle(self, *args, **options):
+        updated = progress.rebuild(options['courses'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt progress for {updated} enrollments.'))
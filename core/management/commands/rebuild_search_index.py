@@ -0,0 +1,42 @@
+"""
+Management command to rebuild the full-text search indexes from scratch
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from skills.models import Skill
+from skills.search import SKILL_INDEX, index_skills
+from workers.models import Worker
+from workers.search import WORKER_INDEX, index_workers
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows indexed per batch')
+
+    def handle(self, *args, **options):
+        if not SKILL_INDEX.supported:
+            self.stdout.write(self.style.WARNING('Full-text search is not supported on this database, nothing to do.'))
+            return
+
+        chunk_size = options['chunk_size']
+        indexes = [
+            ('skill', SKILL_INDEX, index_skills, Skill.objects.only('pk', 'name', 'description')),
+            ('worker', WORKER_INDEX, index_workers, Worker.objects.select_related('user')),
+        ]
+        for label, index, index_rows, queryset in indexes:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilding {label} search index...'))
+            with transaction.atomic():
+                index.clear()
+                batch = []
+                indexed = 0
+                for obj in queryset.iterator(chunk_size=chunk_size):
+                    batch.append(obj)
+                    if len(batch) >= chunk_size:
+                        index_rows(batch)
+                        indexed += len(batch)
+                        batch = []
+                index_rows(batch)
+                indexed += len(batch)
+            self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} {label}s.'))
@@ -0,0 +1,32 @@
+"""
+Management command to recompute every worker's course recommendations
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from training import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the top course recommendations of every active worker in chunks. '
+        'Meant to run nightly; workers added since are filled in on demand.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=recommendations.CHUNK_SIZE, help='Workers scored and stored per transaction')
+        parser.add_argument('--limit', type=int, default=recommendations.RECOMMENDATION_LIMIT, help='Recommendations stored per worker')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['limit'] < 1:
+            raise CommandError('--chunk-size and --limit must be positive')
+        started = time.monotonic()
+
+        def progress(processed):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{processed} workers scored ({processed / elapsed:,.0f} workers/s)')
+
+        processed = recommendations.refresh_all(chunk_size=options['chunk_size'], limit=options['limit'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'\nRefreshed recommendations for {processed} workers in {time.monotonic() - started:.1f}s.'
+        ))
@@ -0,0 +1,22 @@
+"""
+Management command to recompute the related skills and related courses tables
+"""
+from django.core.management.base import BaseCommand
+from skills import related as skill_related
+from training import related as course_related
+
+
+class Command(BaseCommand):
+    help = 'Recomputes precomputed related skills and related courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skills-only', action='store_true', help='Only refresh related skills')
+        parser.add_argument('--courses-only', action='store_true', help='Only refresh related courses')
+
+    def handle(self, *args, **options):
+        if not options['courses_only']:
+            count = skill_related.refresh_all()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed related skills for {count} skills.'))
+        if not options['skills_only']:
+            count = course_related.refresh_all()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed related courses for {count} courses.'))
@@ -0,0 +1,31 @@
+"""
+Management command to recompute denormalized counters from their source rows
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.cache import bump_version
+from training.counters import recount_enrollments, recount_waitlists
+from workers.counters import recount_departments, recount_skill_workers
+from workers.reference import DIRECTORY
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized counters (skill worker counts, department facets, course enrollments and waitlists)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = recount_skill_workers()
+        self.stdout.write(self.style.SUCCESS(f'Recounted skill workers; {updated} skills changed.'))
+
+        with transaction.atomic():
+            departments = recount_departments()
+        bump_version(DIRECTORY)
+        self.stdout.write(self.style.SUCCESS(f'Recounted workers for {departments} departments.'))
+
+        with transaction.atomic():
+            courses = recount_enrollments()
+        self.stdout.write(self.style.SUCCESS(f'Recounted enrollments for {courses} courses.'))
+
+        with transaction.atomic():
+            courses = recount_waitlists()
+        self.stdout.write(self.style.SUCCESS(f'Recounted waitlists for {courses} courses.'))
@@ -0,0 +1,50 @@
+"""
+Management command to print the department skill-gap report
+"""
+import csv
+
+from django.core.management.base import BaseCommand
+from workers.skill_gap import build_report
+from workers.talent import LEVELS
+
+
+class Command(BaseCommand):
+    help = 'Compares each department with its skill targets and lists the shortfalls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', help='Only report on this department')
+        parser.add_argument('--format', choices=['table', 'csv'], default='table', help='Output format')
+        parser.add_argument('--all', action='store_true', help='Include targets that are already met')
+
+    def handle(self, *args, **options):
+        gaps = build_report()
+        if options['department']:
+            gaps = [gap for gap in gaps if gap.department == options['department']]
+        if not options['all']:
+            gaps = [gap for gap in gaps if gap.workers_needed]
+
+        if options['format'] == 'csv':
+            writer = csv.writer(self.stdout)
+            writer.writerow([
+                'department', 'position', 'skill', 'minimum_level', 'target_percent',
+                'headcount', 'holders', 'actual_percent', 'gap_percent', 'workers_needed', *LEVELS,
+            ])
+            for gap in gaps:
+                writer.writerow([
+                    gap.department, gap.position, gap.skill.name, gap.minimum_level, gap.target_percent,
+                    gap.headcount, gap.holders, gap.actual_percent, gap.gap_percent, gap.workers_needed,
+                    *gap.distribution,
+                ])
+            return
+
+        if not gaps:
+            self.stdout.write(self.style.SUCCESS('No skill gaps found.'))
+            return
+        for gap in gaps:
+            scope = ' / '.join(filter(None, [gap.department, gap.position]))
+            self.stdout.write(
+                f'{scope}: {gap.skill.name} ({gap.minimum_level}+) '
+                f'{gap.actual_percent}% of {gap.headcount} vs target {gap.target_percent}% '
+                f'- {gap.workers_needed} more needed'
+            )
+        self.stdout.write(self.style.SUCCESS(f'\n{len(gaps)} gaps reported.'))
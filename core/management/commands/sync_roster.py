@@ -0,0 +1,359 @@
+"""
+Management command to sync workers from an HR roster export in CSV or JSONL
+"""
+import csv
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from core.cache import bump_version, touch
+from skills.models import Skill
+from workers import talent
+from workers.counters import recount_departments, recount_skill_workers
+from workers.models import Worker, WorkerSkill
+from workers.reference import DIRECTORY
+from workers.search import index_workers
+from workers.skill_gap import SKILL_GAP
+
+USER_FIELDS = ['email', 'first_name', 'last_name']
+WORKER_FIELDS = ['department', 'position', 'phone', 'date_of_joining', 'is_active']
+
+
+def _setup_hasher():
+    # Spawned (not forked) pool processes start without the app registry
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams an HR roster and upserts users, workers and worker skills by employee_id in batches. '
+        'Columns: employee_id, username, email, first_name, last_name, department, position, phone, '
+        'date_of_joining, is_active, password, skills ("Python:advanced|Docker"). Only rows that differ '
+        'from the database are written; a skills column replaces the worker\'s active skills.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to sync, or - for stdin')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows upserted per batch')
+        parser.add_argument('--skill-separator', default='|', help='Separator between skills in CSV')
+        parser.add_argument(
+            '--default-password',
+            help='Initial password for new accounts without a password column (default: unusable password)',
+        )
+        parser.add_argument('--hash-workers', type=int, help='Processes hashing new passwords (default: CPU count)')
+        parser.add_argument(
+            '--deactivate-missing', action='store_true',
+            help='Deactivate active workers whose employee_id is not in the roster',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = max(1, options['batch_size'])
+        self.separator = options['skill_separator']
+        self.default_password = options['default_password']
+        self.hash_workers = options['hash_workers'] or os.cpu_count() or 1
+        self.pool = None
+
+        self.skill_ids = dict(Skill.objects.values_list('name', 'pk'))
+        self.seen = set()
+        self.changed_skills = set()
+        self.missing_skills = set()
+        self.stats = dict.fromkeys(['created', 'updated', 'unchanged', 'skipped'], 0)
+
+        self.committed = False
+
+        started = time.monotonic()
+        processed = deactivated = 0
+        source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            try:
+                rows = self.read_rows(source, file_format)
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    processed += self.sync_batch(batch)
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(f'{processed} roster rows synced ({processed / elapsed:,.0f} rows/s)')
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+                if self.pool is not None:
+                    self.pool.shutdown()
+            if options['deactivate_missing']:
+                deactivated = self.deactivate_missing()
+        finally:
+            # Batches commit on their own, so a bad row still leaves the earlier ones to account for
+            if self.committed:
+                self.refresh_derived()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSynced {processed} rows in {elapsed:.1f}s: {self.stats["created"]} created, '
+            f'{self.stats["updated"]} updated, {self.stats["unchanged"]} unchanged, '
+            f'{deactivated} deactivated.'
+        ))
+        if self.stats['skipped']:
+            self.stdout.write(self.style.WARNING(
+                f'{self.stats["skipped"]} rows skipped because their username belongs to another worker.'
+            ))
+        if self.missing_skills:
+            missing = sorted(self.missing_skills)
+            self.stdout.write(self.style.WARNING(f'{len(missing)} skills not found: {", ".join(missing[:20])}'))
+
+    def read_rows(self, source, file_format):
+        if file_format == 'csv':
+            for line_number, row in enumerate(csv.DictReader(source), start=2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise CommandError(f'Line {line_number}: invalid JSON ({exc})')
+
+    def parse(self, line_number, row):
+        employee_id = str(row.get('employee_id') or '').strip()
+        if not employee_id:
+            raise CommandError(f'Line {line_number}: missing employee_id')
+        joined = row.get('date_of_joining') or ''
+        try:
+            joined = datetime.date.fromisoformat(joined.strip()) if joined else timezone.now().date()
+        except ValueError:
+            raise CommandError(f'Line {line_number}: invalid date_of_joining "{joined}"')
+        is_active = row.get('is_active', True)
+        if isinstance(is_active, str):
+            is_active = is_active.strip().lower() not in ('0', 'false', 'no', '')
+        return {
+            'employee_id': employee_id,
+            'username': (row.get('username') or employee_id.lower()).strip(),
+            'email': (row.get('email') or '').strip(),
+            'first_name': (row.get('first_name') or '').strip(),
+            'last_name': (row.get('last_name') or '').strip(),
+            'department': (row.get('department') or 'General').strip(),
+            'position': (row.get('position') or 'Employee').strip(),
+            'phone': (row.get('phone') or '').strip(),
+            'date_of_joining': joined,
+            'is_active': bool(is_active),
+            'password': row.get('password') or self.default_password,
+            'skills': self.parse_skills(line_number, row['skills']) if 'skills' in row else None,
+        }
+
+    def parse_skills(self, line_number, skills):
+        """Map of skill name -> proficiency level from "Name:level" entries"""
+        if isinstance(skills, str):
+            skills = [entry for entry in skills.split(self.separator) if entry.strip()]
+        parsed = {}
+        for entry in skills or []:
+            if isinstance(entry, dict):
+                name, level = entry.get('name', ''), entry.get('level') or 'beginner'
+            else:
+                name, _, level = entry.partition(':')
+            name, level = name.strip(), (level or 'beginner').strip().lower()
+            if level not in talent.LEVEL_RANK:
+                raise CommandError(f'Line {line_number}: unknown proficiency "{level}" for skill "{name}"')
+            parsed[name] = level
+        return parsed
+
+    def hash_passwords(self, passwords):
+        """make_password() for each entry, on the process pool when there is real hashing to do"""
+        if not any(passwords):
+            return [make_password(None) for _ in passwords]
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.hash_workers, initializer=_setup_hasher)
+        chunksize = max(1, len(passwords) // (self.hash_workers * 4))
+        return list(self.pool.map(make_password, passwords, chunksize=chunksize))
+
+    def sync_batch(self, batch):
+        # Later rows win when a batch names the same employee twice
+        records = {}
+        for line_number, row in batch:
+            record = self.parse(line_number, row)
+            records[record['employee_id']] = record
+        self.seen.update(records)
+
+        existing = {
+            employee_id: (pk, user_id, fields)
+            for employee_id, pk, user_id, *fields in Worker.objects
+            .filter(employee_id__in=records.keys())
+            .values_list('employee_id', 'pk', 'user_id', *WORKER_FIELDS)
+        }
+        # Hash before opening the transaction so it is only held for the writes
+        accounts, user_ids = self.prepare_accounts(
+            [record for employee_id, record in records.items() if employee_id not in existing], records
+        )
+        with transaction.atomic():
+            user_ids.update(self.create_users(accounts))
+            changed = self.update_users(records, existing)
+            created, updated = self.upsert_workers(records, existing, user_ids)
+            changed |= updated
+            worker_ids = dict(Worker.objects.filter(employee_id__in=records.keys()).values_list('employee_id', 'pk'))
+            reskilled = self.sync_skills(records, worker_ids)
+            # Detail page fragments are keyed on the worker's updated_at
+            touch(Worker, reskilled - changed - created)
+            index_workers(Worker.objects.filter(pk__in=changed | created).select_related('user'))
+        self.committed = True
+
+        updated = (changed | reskilled) - created
+        self.stats['created'] += len(created)
+        self.stats['updated'] += len(updated)
+        self.stats['unchanged'] += len(records) - len(created) - len(updated)
+        return len(batch)
+
+    def prepare_accounts(self, new, records):
+        """Split new employees into accounts to create and existing free accounts to link.
+
+        Returns ([(record, password hash)], {employee_id: user_id}). Employees
+        whose username belongs to another worker are dropped from ``records``.
+        """
+        if not new:
+            return [], {}
+        by_username = dict(User.objects.filter(username__in=[r['username'] for r in new]).values_list('username', 'pk'))
+        taken = set(Worker.objects.filter(user_id__in=by_username.values()).values_list('user_id', flat=True))
+        accounts, user_ids = [], {}
+        for record in new:
+            user_id = by_username.get(record['username'])
+            if user_id is None:
+                accounts.append(record)
+            elif user_id in taken:
+                del records[record['employee_id']]
+                self.stats['skipped'] += 1
+            else:
+                user_ids[record['employee_id']] = user_id
+        return list(zip(accounts, self.hash_passwords([r['password'] for r in accounts]))), user_ids
+
+    def create_users(self, accounts):
+        """Create the prepared accounts; returns {employee_id: user_id}"""
+        if not accounts:
+            return {}
+        User.objects.bulk_create(
+            [
+                User(
+                    username=record['username'],
+                    email=record['email'],
+                    first_name=record['first_name'],
+                    last_name=record['last_name'],
+                    password=password,
+                )
+                for record, password in accounts
+            ],
+            batch_size=1000,
+        )
+        by_username = dict(
+            User.objects.filter(username__in=[r['username'] for r, _ in accounts]).values_list('username', 'pk')
+        )
+        return {record['employee_id']: by_username[record['username']] for record, _ in accounts}
+
+    def update_users(self, records, existing):
+        """Bring names and emails of existing employees' accounts up to date"""
+        user_ids = {user_id: employee_id for employee_id, (_, user_id, _) in existing.items() if employee_id in records}
+        stored = User.objects.filter(pk__in=user_ids).values_list('pk', 'username', *USER_FIELDS)
+        changed, workers = [], set()
+        for user_id, username, *values in stored:
+            employee_id = user_ids[user_id]
+            record = records[employee_id]
+            if values != [record[field] for field in USER_FIELDS]:
+                changed.append(User(username=username, **{field: record[field] for field in USER_FIELDS}))
+                workers.add(existing[employee_id][0])
+        # An upsert on the unique username is far cheaper than bulk_update()'s CASE expressions
+        User.objects.bulk_create(
+            changed, batch_size=1000, update_conflicts=True, unique_fields=['username'], update_fields=USER_FIELDS,
+        )
+        return workers
+
+    def upsert_workers(self, records, existing, user_ids):
+        """Create new workers and rewrite changed ones; returns (created pks, changed pks)"""
+        rows, created, changed = [], [], set()
+        for employee_id, record in records.items():
+            values = [record[field] for field in WORKER_FIELDS]
+            if employee_id not in existing:
+                created.append(employee_id)
+                user_id = user_ids[employee_id]
+            elif values != existing[employee_id][2]:
+                changed.add(existing[employee_id][0])
+                user_id = existing[employee_id][1]
+            else:
+                continue
+            rows.append(Worker(user_id=user_id, employee_id=employee_id, **dict(zip(WORKER_FIELDS, values))))
+        Worker.objects.bulk_create(
+            rows, batch_size=1000, update_conflicts=True, unique_fields=['employee_id'],
+            update_fields=WORKER_FIELDS + ['updated_at'],
+        )
+        created_pks = set(Worker.objects.filter(employee_id__in=created).values_list('pk', flat=True))
+        return created_pks, changed
+
+    def sync_skills(self, records, worker_ids):
+        """Make each listed worker's active skills match the roster; returns the workers changed"""
+        wanted = {}
+        for employee_id, record in records.items():
+            if record['skills'] is None:
+                continue
+            worker_id = worker_ids[employee_id]
+            wanted[worker_id] = {}
+            for name, level in record['skills'].items():
+                if name in self.skill_ids:
+                    wanted[worker_id][self.skill_ids[name]] = level
+                else:
+                    self.missing_skills.add(name)
+        if not wanted:
+            return set()
+
+        rows = []
+        stored = WorkerSkill.objects.filter(worker_id__in=wanted).values_list(
+            'worker_id', 'skill_id', 'proficiency_level', 'is_active'
+        )
+        seen = set()
+        for worker_id, skill_id, level, is_active in stored:
+            seen.add((worker_id, skill_id))
+            target = wanted[worker_id].get(skill_id)
+            if target is None:
+                if is_active:
+                    rows.append(WorkerSkill(worker_id=worker_id, skill_id=skill_id, proficiency_level=level, is_active=False))
+            elif (level, is_active) != (target, True):
+                rows.append(WorkerSkill(worker_id=worker_id, skill_id=skill_id, proficiency_level=target))
+        for worker_id, skills in wanted.items():
+            for skill_id, level in skills.items():
+                if (worker_id, skill_id) not in seen:
+                    rows.append(WorkerSkill(worker_id=worker_id, skill_id=skill_id, proficiency_level=level))
+
+        WorkerSkill.objects.bulk_create(
+            rows, batch_size=1000, update_conflicts=True, unique_fields=['worker', 'skill'],
+            update_fields=['proficiency_level', 'is_active', 'updated_at'],
+        )
+        self.changed_skills.update(row.skill_id for row in rows)
+        return {row.worker_id for row in rows}
+
+    def deactivate_missing(self):
+        """Deactivate active workers that the roster no longer lists"""
+        active = set(Worker.objects.filter(is_active=True).values_list('employee_id', flat=True))
+        missing = sorted(active - self.seen)
+        now = timezone.now()
+        for start in range(0, len(missing), 500):
+            Worker.objects.filter(employee_id__in=missing[start:start + 500]).update(is_active=False, updated_at=now)
+            self.committed = True
+        return len(missing)
+
+    def refresh_derived(self):
+        """Bulk writes skip signals, so recount and invalidate what they maintain"""
+        self.stdout.write('Refreshing counters and caches...')
+        with transaction.atomic():
+            if self.changed_skills:
+                recount_skill_workers(self.changed_skills)
+            recount_departments()
+        talent.invalidate()
+        for namespace in (DIRECTORY, SKILL_GAP):
+            bump_version(namespace)
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=100, unique=True)),
+                ('version', models.PositiveBigIntegerField()),
+            ],
+        ),
+    ]
@@ -9,5 +9,27 @@ class BaseModel(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    # Counters and other columns kept up to date with queryset updates; a full
+    # save() of an instance loaded before such an update would write them back
+    maintained_fields = ()
+
     class Meta:
         abstract = True
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if update_fields is None and self.maintained_fields and not self._state.adding and not force_insert:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.maintained_fields and field.attname not in deferred
+            ]
+        super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
+
+
+class CacheVersion(models.Model):
+    """Version counter of a core.cache namespace, shared by every process"""
+    namespace = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"{self.namespace} (v{self.version})"
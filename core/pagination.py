@@ -0,0 +1,160 @@
+"""
+Keyset (cursor) pagination for the listing pages.
+
+Pages are addressed by the ordering values of their first or last row
+instead of an offset, so every page costs one indexed range query no matter
+how deep it is. The primary key is always appended to the ordering to make
+it total. Totals are counted only up to a cap.
+"""
+import base64
+import binascii
+import datetime
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+COUNT_CAP = 1000
+
+
+def capped_count(queryset, cap=COUNT_CAP):
+    """Count rows up to ``cap + 1``; returns (count, capped)"""
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count > cap
+
+
+def _encode(values, direction):
+    values = [value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value for value in values]
+    payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode(cursor, fields):
+    """Cursor values converted by ``fields``, or (None, None) for anything malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, direction = payload['v'], payload['d']
+        if len(values) != len(fields):
+            return None, None
+        return [field.to_python(value) for field, value in zip(fields, values)], direction
+    except (binascii.Error, ValidationError, ValueError, KeyError, TypeError):
+        return None, None
+
+
+def _ordering_fields(queryset, ordering):
+    """The model field (or annotation output field) behind each entry of ``ordering``"""
+    fields = []
+    for name in ordering:
+        name = name.lstrip('-')
+        if name in queryset.query.annotations:
+            fields.append(queryset.query.annotations[name].output_field)
+            continue
+        model, field = queryset.model, None
+        for part in name.split(LOOKUP_SEP):
+            field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+            model = field.related_model
+        fields.append(field)
+    return fields
+
+
+class KeysetPage:
+    """One page of rows plus the cursors for its neighbours"""
+
+    def __init__(self, request, object_list, ordering, has_next, has_previous, page_size, count, count_capped):
+        self.request = request
+        self.object_list = object_list
+        self.ordering = ordering
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.page_size = page_size
+        self.count = count
+        self.count_capped = count_capped
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _values(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def _query(self, cursor):
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        if self.has_next:
+            return self._query(_encode(self._values(self.object_list[-1]), 'next'))
+        return None
+
+    @property
+    def previous_query(self):
+        if self.has_previous:
+            return self._query(_encode(self._values(self.object_list[0]), 'prev'))
+        return None
+
+    @property
+    def first_query(self):
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        return params.urlencode()
+
+
+def _after(ordering, values, reverse):
+    """Q matching rows strictly after ``values`` in ``ordering`` (before, if reverse)"""
+    clauses = []
+    for index, field in enumerate(ordering):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = 'lt' if descending != reverse else 'gt'
+        equal = {other.lstrip('-'): value for other, value in zip(ordering[:index], values[:index])}
+        clauses.append(Q(**equal, **{f'{name}__{lookup}': values[index]}))
+    return reduce(lambda a, b: a | b, clauses)
+
+
+def paginate(request, queryset, ordering, page_size=None, count=True):
+    """Return the KeysetPage of ``queryset`` addressed by ``request``.
+
+    ``ordering`` lists the fields (with '-' for descending) the page is
+    ordered by; 'pk' is appended to make it unique. The page size comes from
+    the ``page_size`` query parameter, clamped to MAX_PAGE_SIZE.
+    """
+    ordering = list(ordering) + ['pk']
+    try:
+        page_size = int(request.GET.get('page_size') or page_size or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    # A cursor that does not fit the ordering starts over from the first page
+    values, direction = _decode(request.GET.get('cursor', ''), _ordering_fields(queryset, ordering))
+    if values is None:
+        direction = 'next'
+    reverse = direction == 'prev'
+
+    rows = queryset
+    if values is not None:
+        rows = rows.filter(_after(ordering, values, reverse))
+    if reverse:
+        rows = rows.order_by(*[field[1:] if field.startswith('-') else f'-{field}' for field in ordering])
+    else:
+        rows = rows.order_by(*ordering)
+    rows = list(rows[:page_size + 1])
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, values is not None
+
+    total, capped = capped_count(queryset) if count else (None, False)
+    return KeysetPage(request, rows, ordering, has_next, has_previous, page_size, total, capped)
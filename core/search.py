@@ -0,0 +1,168 @@
+"""
+Full-text search indexes backed by the database's native engine.
+
+SQLite stores each index in an FTS5 virtual table keyed by rowid, PostgreSQL
+in a table of weighted tsvector documents with a GIN index. Callers fall back
+to icontains filtering on any other backend (see FullTextIndex.supported).
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SUPPORTED_VENDORS = ('sqlite', 'postgresql')
+
+# tsvector weights are limited to four classes, highest first
+PG_WEIGHT_CLASSES = ['A', 'B', 'C', 'D']
+
+
+def tokenize(query):
+    """Split free text into search tokens, dropping FTS operator characters"""
+    return TOKEN_RE.findall(query or '')
+
+
+class FullTextIndex:
+    """A ranked full-text index over some text columns of one model.
+
+    Rows are keyed by the indexed object's primary key. ``columns`` are listed
+    from most to least important; ``weights`` gives their relative ranking
+    weight (bm25 column weights on SQLite, tsvector weight classes on
+    PostgreSQL). With ``prefix_all`` every query token is prefix-matched,
+    not just the last one.
+    """
+
+    def __init__(self, table, columns, weights=None, tokenizer='unicode61', config='simple', prefix_all=False):
+        self.table = table
+        self.columns = list(columns)
+        self.weights = list(weights or [1.0] * len(self.columns))
+        self.tokenizer = tokenizer
+        self.config = config
+        self.prefix_all = prefix_all
+
+    @property
+    def supported(self):
+        return connection.vendor in SUPPORTED_VENDORS
+
+    # Schema -----------------------------------------------------------------
+
+    def create(self, schema_editor):
+        vendor = schema_editor.connection.vendor
+        if vendor == 'sqlite':
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                f"{', '.join(self.columns)}, tokenize='{self.tokenizer}')"
+            )
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"object_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+            )
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin "
+                f"ON {self.table} USING GIN (document)"
+            )
+
+    def drop(self, schema_editor):
+        if schema_editor.connection.vendor in SUPPORTED_VENDORS:
+            schema_editor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    # Maintenance ------------------------------------------------------------
+
+    def index(self, rows, using=None):
+        """Insert or replace documents; ``rows`` yields (pk, [column texts])"""
+        conn = self._connection(using)
+        rows = [(pk, [text or '' for text in texts]) for pk, texts in rows]
+        if not rows or conn.vendor not in SUPPORTED_VENDORS:
+            return
+        with conn.cursor() as cursor:
+            if conn.vendor == 'sqlite':
+                cursor.executemany(
+                    f"DELETE FROM {self.table} WHERE rowid = %s",
+                    [(pk,) for pk, _ in rows],
+                )
+                placeholders = ', '.join(['%s'] * (len(self.columns) + 1))
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (rowid, {', '.join(self.columns)}) "
+                    f"VALUES ({placeholders})",
+                    [(pk, *texts) for pk, texts in rows],
+                )
+            else:
+                document = ' || '.join(
+                    f"setweight(to_tsvector('{self.config}', %s), '{weight_class}')"
+                    for weight_class in self._weight_classes()
+                )
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (object_id, document) VALUES (%s, {document}) "
+                    f"ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document",
+                    [(pk, *texts) for pk, texts in rows],
+                )
+
+    def remove(self, pks, using=None):
+        conn = self._connection(using)
+        pks = list(pks)
+        if not pks or conn.vendor not in SUPPORTED_VENDORS:
+            return
+        key = 'rowid' if conn.vendor == 'sqlite' else 'object_id'
+        with conn.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE {key} = %s", [(pk,) for pk in pks])
+
+    def clear(self, using=None):
+        conn = self._connection(using)
+        if conn.vendor in SUPPORTED_VENDORS:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table}")
+
+    # Querying ---------------------------------------------------------------
+
+    def search(self, query, limit=200, within=None, using=None):
+        """Return primary keys matching every token of ``query``, best first.
+
+        The last token (or every token, see ``prefix_all``) is matched as a
+        prefix so results update while the user is still typing. ``within``
+        is a queryset of the indexed model to restrict matches to; it is
+        applied inside the index query, so ``limit`` counts only its rows.
+        """
+        conn = self._connection(using)
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        key = 'rowid' if conn.vendor == 'sqlite' else 'object_id'
+        restriction, restriction_params = '', []
+        if within is not None:
+            sql, restriction_params = within.order_by().values('pk').query.get_compiler(conn.alias).as_sql()
+            restriction = f" AND {key} IN ({sql})"
+        with conn.cursor() as cursor:
+            if conn.vendor == 'sqlite':
+                weights = ', '.join(str(float(weight)) for weight in self.weights)
+                cursor.execute(
+                    f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s{restriction} "
+                    f"ORDER BY bm25({self.table}, {weights}) LIMIT %s",
+                    [self.match_expression(tokens), *restriction_params, limit],
+                )
+            else:
+                prefixed = len(tokens) if self.prefix_all else 1
+                tsquery = ' & '.join(tokens[:-prefixed] + [f'{token}:*' for token in tokens[-prefixed:]])
+                cursor.execute(
+                    f"SELECT object_id FROM {self.table}, to_tsquery('{self.config}', %s) query "
+                    f"WHERE document @@ query{restriction} ORDER BY ts_rank(document, query) DESC LIMIT %s",
+                    [tsquery, *restriction_params, limit],
+                )
+            return [row[0] for row in cursor.fetchall()]
+
+    def match_expression(self, tokens):
+        """FTS5 MATCH string: quoted tokens ANDed, the last one (or all) as prefixes"""
+        quoted = [f'"{token}"' for token in tokens]
+        for index in range(0 if self.prefix_all else len(quoted) - 1, len(quoted)):
+            quoted[index] += '*'
+        return ' '.join(quoted)
+
+    def _weight_classes(self):
+        ranked = sorted(range(len(self.columns)), key=lambda i: -self.weights[i])
+        classes = [None] * len(self.columns)
+        for position, column_index in enumerate(ranked):
+            classes[column_index] = PG_WEIGHT_CLASSES[min(position, len(PG_WEIGHT_CLASSES) - 1)]
+        return classes
+
+    def _connection(self, using):
+        return connections[using or DEFAULT_DB_ALIAS]
@@ -0,0 +1,113 @@
+"""
+Scoring helpers and neighbour storage shared by the related-item jobs.
+"""
+import heapq
+from collections import defaultdict
+
+from django.db import transaction
+
+from .cache import touch
+
+DIFFICULTY_LEVELS = ['beginner', 'intermediate', 'advanced', 'expert']
+DIFFICULTY_RANK = {level: index for index, level in enumerate(DIFFICULTY_LEVELS)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def difficulty_similarity(a, b):
+    """1.0 for the same level, falling linearly to 0.0 for beginner vs expert"""
+    distance = abs(DIFFICULTY_RANK.get(a, 0) - DIFFICULTY_RANK.get(b, 0))
+    return 1.0 - distance / (len(DIFFICULTY_LEVELS) - 1)
+
+
+def top_k(scores, k):
+    """Best ``k`` (id, score) pairs from a {id: score} mapping, ties broken by id"""
+    return heapq.nsmallest(k, ((item, score) for item, score in scores.items() if score > 0), key=lambda pair: (-pair[1], pair[0]))
+
+
+class NeighbourTable:
+    """The stored top-k neighbours of one model, one row per (owner, related, score, rank).
+
+    A job supplies ``load(ids, using)``, returning its feature tables with
+    the active objects' {pk: attributes} first (everything when ``ids`` is
+    None, otherwise just enough to score ``ids``), and
+    ``compute(*features, ids)``, returning {pk: [(related_id, score), ...]}.
+    """
+
+    def __init__(self, model, owner_field, load, compute):
+        self.model = model
+        self.owner_field = owner_field
+        self.owner_id = f'{owner_field}_id'
+        self.owner_model = model._meta.get_field(owner_field).related_model
+        self.load = load
+        self.compute = compute
+
+    def store(self, results, replace_all=False, using=None):
+        """Replace the stored neighbours of every object in ``results`` (or of all objects)"""
+        stored = self.model.objects.using(using).all()
+        with transaction.atomic(using=using):
+            (stored if replace_all else stored.filter(**{f'{self.owner_id}__in': results.keys()})).delete()
+            stored.bulk_create(
+                (
+                    self.model(**{self.owner_id: pk}, related_id=related_id, score=score, rank=rank)
+                    for pk, neighbours in results.items()
+                    for rank, (related_id, score) in enumerate(neighbours, start=1)
+                ),
+                batch_size=5000,
+            )
+
+    def changed(self, results, using=None):
+        """Objects in ``results`` whose stored neighbours differ from the new ones"""
+        stored = defaultdict(list)
+        rows = (
+            self.model.objects.using(using)
+            .filter(**{f'{self.owner_id}__in': results.keys()})
+            .order_by(self.owner_id, 'rank')
+            .values_list(self.owner_id, 'related_id')
+        )
+        for pk, related_id in rows:
+            stored[pk].append(related_id)
+        return [
+            pk for pk, neighbours in results.items()
+            if stored[pk] != [related_id for related_id, _ in neighbours]
+        ]
+
+    def refresh_all(self, using=None):
+        """Recompute every object's neighbours; returns the number of objects processed"""
+        results = self.compute(*self.load(None, using=using), None)
+        changed = self.changed(results, using=using)
+        self.store(results, replace_all=True, using=using)
+        # Detail pages are validated against updated_at for conditional GETs
+        touch(self.owner_model, changed, using=using)
+        return len(results)
+
+    def refresh(self, ids, using=None):
+        """Recompute the neighbours of ``ids`` and of the objects around them.
+
+        Objects currently listing a changed one, and the changed objects' new
+        neighbours, are refreshed too so the lists stay roughly symmetric.
+        Only the features needed to score them are loaded.
+        """
+        ids = set(ids)
+        if not ids:
+            return
+        features = self.load(ids, using=using)
+        results = self.compute(*features, ids)
+        affected = set(
+            self.model.objects.using(using).filter(related_id__in=ids).values_list(self.owner_id, flat=True)
+        )
+        for neighbours in results.values():
+            affected.update(related_id for related_id, _ in neighbours)
+        affected -= ids
+        if affected:
+            results.update(self.compute(*self.load(affected, using=using), affected))
+        # Inactive or deleted objects lose their stored neighbours
+        results.update({pk: [] for pk in ids if pk not in features[0]})
+        changed = self.changed(results, using=using)
+        self.store(results, using=using)
+        touch(self.owner_model, changed, using=using)
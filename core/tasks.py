@@ -0,0 +1,44 @@
+"""
+In-process background execution for work that must not block a response.
+
+Tasks run on a shared thread pool once the surrounding transaction commits.
+They are best effort: anything that must survive a restart needs a
+management command that can redo it.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+            thread_name_prefix='background',
+        )
+    return _executor
+
+
+def _run(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(fn, '__name__', fn))
+    finally:
+        # Pool threads outlive requests, so release their DB connections here
+        close_old_connections()
+
+
+def submit(fn, *args, **kwargs):
+    return get_executor().submit(_run, fn, args, kwargs)
+
+
+def submit_on_commit(fn, *args, using=None, **kwargs):
+    transaction.on_commit(lambda: submit(fn, *args, **kwargs), using=using)
@@ -0,0 +1,46 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.image_proxy import proxy_url
+from core.images import VARIANT_WIDTHS, has_variants, variant_name
+
+register = template.Library()
+
+
+def _srcset(file, extension):
+    return ', '.join(
+        f'{file.storage.url(variant_name(file.name, width, extension))} {width}w'
+        for width in sorted(VARIANT_WIDTHS.values())
+    )
+
+
+@register.simple_tag
+def responsive_image(file, size='card', sizes=None, **attrs):
+    """Render ``file`` as a <picture> of its WebP/JPEG variants.
+
+    ``size`` names the VARIANT_WIDTHS entry used as the fallback src and the
+    default display width; extra keyword arguments become <img> attributes.
+    Until the variants exist the original is rendered as a plain <img>.
+    """
+    attributes = format_html_join(' ', '{}="{}"', ((name.replace('_', '-'), value) for name, value in attrs.items()))
+    if not has_variants(file):
+        return format_html('<img src="{}" loading="lazy" {}>', file.url, attributes)
+
+    width = VARIANT_WIDTHS[size]
+    sizes = sizes or f'(max-width: 576px) 100vw, {width}px'
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" loading="lazy" {}></picture>',
+        _srcset(file, 'webp'),
+        sizes,
+        file.storage.url(variant_name(file.name, width, 'jpg')),
+        _srcset(file, 'jpg'),
+        sizes,
+        attributes,
+    )
+
+
+@register.filter
+def proxied(url, size='card'):
+    """Route the external image ``url`` through the local image cache at ``size``"""
+    return proxy_url(url, size)
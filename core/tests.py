@@ -1,3 +1,349 @@
-from django.test import TestCase
+import base64
+import http.server
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core import cache as core_cache
+from core import image_proxy
+from core.exports import chunked, csv_lines
+from core.images import generate_variants, has_variants, variant_name
+from core.templatetags.image_variants import responsive_image
+from core.pagination import paginate
+from skills.models import Skill, SkillCategory
+from skills.reference import CATALOG
+from workers.models import DepartmentFacet, Worker
+
+
+class CacheVersionTests(TestCase):
+    def setUp(self):
+        core_cache._local.clear()
+        core_cache._versions.clear()
+
+    def test_bump_is_seen_by_another_cache_client(self):
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return len(loads)
+
+        with mock.patch('core.cache.cache', LocMemCache('first', {})):
+            before = core_cache.get_version('tests')
+            self.assertEqual(core_cache.get_reference('tests', 'value', loader), 1)
+            self.assertEqual(core_cache.bump_version('tests'), before + 1)
+
+        # A process with its own cache, whose in-memory copy is already stale
+        core_cache._local.clear()
+        core_cache._versions.clear()
+        with mock.patch('core.cache.cache', LocMemCache('second', {})):
+            self.assertEqual(core_cache.get_version('tests'), before + 1)
+            self.assertEqual(core_cache.get_reference('tests', 'value', loader), 2)
+
+
+    def test_warm_reads_make_no_queries(self):
+        core_cache.get_reference('tests', 'value', lambda: 'loaded')
+        with self.assertNumQueries(0):
+            self.assertEqual(core_cache.get_reference('tests', 'value', lambda: 'reloaded'), 'loaded')
+
+        # Another process's bump is picked up once the version is VERSION_TTL old
+        core_cache.CacheVersion.objects.filter(namespace='tests').update(version=F('version') + 1)
+        self.assertEqual(core_cache.get_reference('tests', 'value', lambda: 'reloaded'), 'loaded')
+        later = time.monotonic() + core_cache.VERSION_TTL
+        with mock.patch('core.cache.time.monotonic', return_value=later), self.assertNumQueries(1):
+            self.assertEqual(core_cache.get_reference('tests', 'value', lambda: 'reloaded'), 'reloaded')
+
+        # This process's own bumps are seen at once
+        core_cache.bump_version('tests')
+        with self.assertNumQueries(0):
+            self.assertEqual(core_cache.get_reference('tests', 'value', lambda: 'bumped'), 'bumped')
+
+
+def cursor(values, direction='next'):
+    payload = json.dumps({'v': values, 'd': direction}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class CursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = SkillCategory.objects.create(name='Engineering')
+        for name in ('Ansible', 'Bash', 'C'):
+            Skill.objects.create(name=name, description=name, category=category)
+        user = User.objects.create_user('ada')
+        Worker.objects.create(user=user, employee_id='E-1', department='R&D', position='Engineer', date_of_joining=date(2020, 1, 1))
+
+    def test_malformed_cursors_show_the_first_page(self):
+        for url, value in (
+            (reverse('skill_list'), cursor(['xx', 'abc'])),
+            (reverse('skill_list'), cursor([1])),
+            (reverse('skill_list'), 'not base64!'),
+            (reverse('worker_list'), cursor(['garbage', 1])),
+            (reverse('worker_list'), cursor([{'a': 1}, 1])),
+        ):
+            with self.subTest(url=url, cursor=value):
+                self.assertEqual(self.client.get(url, {'cursor': value}).status_code, 200)
+
+    def test_cursor_values_are_converted(self):
+        factory = RequestFactory()
+        first = paginate(factory.get('/', {'page_size': 2}), Skill.objects.all(), ['name'])
+        self.assertEqual([skill.name for skill in first], ['Ansible', 'Bash'])
+        second = paginate(factory.get('/?' + first.next_query), Skill.objects.all(), ['name'])
+        self.assertEqual([skill.name for skill in second], ['C'])
+
+        request = factory.get('/', {'cursor': cursor(['Bash', 'abc'])})
+        page = paginate(request, Skill.objects.all(), ['name'])
+        self.assertFalse(page.has_previous)
+        self.assertEqual(len(page), 3)
+
+
+class ExportTests(TestCase):
+    def test_chunks_follow_the_primary_key_one_query_each(self):
+        category = SkillCategory.objects.create(name='Engineering')
+        skills = [Skill.objects.create(name=name, description=name, category=category) for name in 'CBAED']
+        with self.assertNumQueries(4):
+            chunks = list(chunked(Skill.objects.values('pk', 'name'), chunk_size=2))
+        self.assertEqual([[row['name'] for row in chunk] for chunk in chunks], [['C', 'B'], ['A', 'E'], ['D']])
+        self.assertEqual([row['pk'] for chunk in chunks for row in chunk], [skill.pk for skill in skills])
+
+    def test_csv_joins_lists_into_one_cell(self):
+        lines = csv_lines(['name', 'skills'], [{'name': 'Ada, Countess', 'skills': ['Python:expert', 'Docker']}])
+        self.assertEqual(''.join(lines), 'name,skills\r\n"Ada, Countess",Python:expert|Docker\r\n')
+
+
+class ImageSource(http.server.BaseHTTPRequestHandler):
+    """Serves a distinct JPEG for every path and counts the requests"""
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), (len(self.path) * 10 % 256, 80, 160)).save(buffer, 'JPEG')
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(buffer.tell()))
+        self.end_headers()
+        self.wfile.write(buffer.getvalue())
+
+    def log_message(self, *args):
+        pass
+
+
+class ImageProxyTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ImageSource)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        ImageSource.requests.clear()
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(IMAGE_PROXY_ROOT=self.root, IMAGE_PROXY_MAX_BYTES=10 ** 9)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def source(self, name):
+        return f'http://127.0.0.1:{self.server.server_port}/{name}.jpg'
+
+    def get(self, name, size='thumb'):
+        return self.client.get(image_proxy.proxy_url(self.source(name), size), HTTP_ACCEPT='image/webp')
+
+    def files(self, kind):
+        return [path for path in (self.root / kind).glob('*/*') if path.is_file()]
+
+    def test_fetches_once_then_serves_from_disk(self):
+        for _ in range(2):
+            response = self.get('portrait')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/webp')
+            image = Image.open(BytesIO(b''.join(response.streaming_content)))
+            self.assertEqual(image.width, image_proxy.VARIANT_WIDTHS['thumb'])
+        self.assertEqual(ImageSource.requests, ['/portrait.jpg'])
+
+    def test_blob_evicted_before_serving_is_refetched(self):
+        fetch = image_proxy.get
+        evicted = []
+
+        def get_then_evict(*args):
+            path = fetch(*args)
+            if not evicted:
+                # Another process evicts the blob between lookup and open
+                path.unlink()
+                evicted.append(path)
+            return path
+
+        with mock.patch('core.image_proxy.get', get_then_evict):
+            response = self.get('portrait')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ImageSource.requests), 2)
+
+    def test_evict_prunes_refs(self):
+        self.get('first')
+        self.get('second', 'large')
+        refs = self.files('refs')
+        self.assertEqual(len(refs), 2)
+        for ref in refs:
+            # Refs written during an eviction are left for the next one
+            os.utime(ref, (0, 0))
+        removed, _ = image_proxy.evict(limit=0, root=self.root)
+        self.assertEqual(removed, 2)
+        self.assertEqual(self.files('blobs'), [])
+        self.assertEqual(self.files('refs'), [])
+
+    def test_stores_check_the_size_on_a_threshold(self):
+        with mock.patch('core.image_proxy.evict') as evict:
+            self.get('first')
+            evict.assert_not_called()
+            with override_settings(IMAGE_PROXY_MAX_BYTES=1):
+                self.get('second')
+            evict.assert_called_once()
+
+
+class ImportSkillsTests(TestCase):
+    def import_csv(self, content, *args):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        path = directory / 'skills.csv'
+        path.write_text(content)
+        call_command('import_skills', str(path), *args, stdout=StringIO())
+
+    def test_bad_duration_names_the_line(self):
+        content = 'name,estimated_duration_hours\nPython,40\nDocker,a week\n'
+        with self.assertRaisesMessage(CommandError, 'Line 3: estimated_duration_hours must be a whole number, not "a week"'):
+            self.import_csv(content)
+
+    def test_bad_row_still_links_the_committed_batches(self):
+        content = (
+            'name,prerequisites\n'
+            'Python,\n'
+            'Django,Python\n'
+            'Flask,Python\n'
+            ',Python\n'
+        )
+        version = core_cache.get_version(CATALOG)
+        with self.assertRaisesMessage(CommandError, 'Line 5: missing skill name'):
+            self.import_csv(content, '--batch-size', '1')
+        self.assertEqual(
+            set(Skill.objects.get(name='Flask').prerequisites.values_list('name', flat=True)), {'Python'},
+        )
+        self.assertEqual(Skill.objects.get(name='Django').prerequisites.count(), 1)
+        self.assertGreater(core_cache.get_version(CATALOG), version)
+
+
+class SyncRosterTests(TestCase):
+    def setUp(self):
+        self.skill = Skill.objects.create(
+            name='Python', description='Python', category=SkillCategory.objects.create(name='Engineering'),
+        )
+
+    def sync(self, content, *args):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        path = directory / 'roster.csv'
+        path.write_text(content)
+        call_command('sync_roster', str(path), *args, stdout=StringIO())
+
+    def test_syncs_workers_and_their_counters(self):
+        self.sync(
+            'employee_id,username,department,skills\n'
+            'E-1,ada,R&D,Python:advanced\n'
+            'E-2,grace,R&D,Python\n'
+            'E-3,alan,Sales,\n'
+        )
+        self.assertEqual(Worker.objects.count(), 3)
+        self.assertEqual(Worker.objects.get(employee_id='E-1').user.username, 'ada')
+        self.skill.refresh_from_db()
+        self.assertEqual(self.skill.worker_count, 2)
+        self.assertEqual(dict(DepartmentFacet.objects.values_list('name', 'worker_count')), {'R&D': 2, 'Sales': 1})
+
+        self.sync('employee_id,username,department\nE-1,ada,R&D\n', '--deactivate-missing')
+        self.assertEqual(set(Worker.objects.filter(is_active=True).values_list('employee_id', flat=True)), {'E-1'})
+        self.assertEqual(dict(DepartmentFacet.objects.values_list('name', 'worker_count')), {'R&D': 1})
+
+    def test_bad_row_still_refreshes_the_committed_batches(self):
+        content = (
+            'employee_id,username,department,date_of_joining,skills\n'
+            'E-1,ada,R&D,2020-01-01,Python\n'
+            'E-2,grace,R&D,2020-01-01,Python\n'
+            'E-3,alan,Sales,yesterday,Python\n'
+        )
+        with self.assertRaisesMessage(CommandError, 'Line 4: invalid date_of_joining "yesterday"'):
+            self.sync(content, '--batch-size', '1')
+        self.assertEqual(Worker.objects.count(), 2)
+        self.skill.refresh_from_db()
+        self.assertEqual(self.skill.worker_count, 2)
+        self.assertEqual(dict(DepartmentFacet.objects.values_list('name', 'worker_count')), {'R&D': 2})
+
+
+def png(colour='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (1600, 900), colour).save(buffer, 'PNG')
+    return SimpleUploadedFile('picture.png', buffer.getvalue(), content_type='image/png')
+
+
+@mock.patch('core.tasks.submit', lambda fn, *args, **kwargs: fn(*args, **kwargs))
+class ImageVariantsTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.category = SkillCategory.objects.create(name='Engineering')
+
+    def test_availability_is_recorded_on_the_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            skill = Skill.objects.create(name='Python', description='Python', category=self.category, image=png())
+        self.assertFalse(has_variants(skill.image))
+
+        skill.refresh_from_db()
+        self.assertEqual(skill.image_variants, skill.image.name)
+        with mock.patch.object(default_storage, 'exists') as exists:
+            self.assertIn('<picture>', responsive_image(skill.image))
+        exists.assert_not_called()
+
+        # A new picture has no variants until they are generated for it
+        skill.image = png('blue')
+        self.assertFalse(has_variants(skill.image))
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.save()
+        skill.refresh_from_db()
+        self.assertTrue(has_variants(skill.image))
+
+    def test_sources_differing_only_in_extension_keep_their_own_variants(self):
+        for name, colour in (('skills/picture.png', 'red'), ('skills/picture.jpg', 'blue')):
+            buffer = BytesIO()
+            Image.new('RGB', (800, 450), colour).save(buffer, 'PNG' if name.endswith('png') else 'JPEG')
+            default_storage.save(name, SimpleUploadedFile(name, buffer.getvalue()))
+            generate_variants(name, default_storage)
+
+        red, blue = (variant_name(name, 320, 'jpg') for name in ('skills/picture.png', 'skills/picture.jpg'))
+        self.assertNotEqual(red, blue)
+        for variant, channel in ((red, 0), (blue, 2)):
+            with default_storage.open(variant) as file:
+                self.assertGreater(Image.open(file).getpixel((10, 10))[channel], 200)
@@ -1,13 +1,19 @@
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from skills.models import Skill
+from django.views.decorators.http import require_GET
+from core import image_proxy
+from skills.reference import featured_skills
 from training.models import Course
+from training.recommendations import recommended_courses
 from workers.models import Worker
+from workers.services import provision_worker
 
 
 def home(request):
     """Home page view"""
-    skills = Skill.objects.filter(is_active=True)[:6]
+    skills = featured_skills()
     courses = Course.objects.filter(is_active=True).order_by('-created_at')[:12]
     workers_count = Worker.objects.filter(is_active=True).count()
     
@@ -27,37 +33,40 @@ def about(request):
 @login_required
 def dashboard(request):
     """Dashboard view for logged in users"""
-    from django.utils import timezone
-    import random
-    from workers.models import Worker
-    
-    user = request.user
     context = {}
     
     # Auto-create worker profile if it doesn't exist
-    if not hasattr(user, 'worker_profile'):
-        # Generate unique employee ID
-        max_attempts = 100
-        for _ in range(max_attempts):
-            employee_id = f'EMP{random.randint(10000, 99999)}'
-            if not Worker.objects.filter(employee_id=employee_id).exists():
-                break
-        else:
-            employee_id = f'EMP{int(timezone.now().timestamp())}'
-        
-        worker = Worker.objects.create(
-            user=user,
-            employee_id=employee_id,
-            department='General',
-            position='Employee',
-            date_of_joining=timezone.now().date(),
-            is_active=True,
-        )
-    else:
-        worker = user.worker_profile
+    worker, _ = provision_worker(request.user)
     
     context['worker'] = worker
     context['enrollments'] = worker.enrollments.all()[:5]
     context['completed_courses'] = worker.enrollments.filter(status='completed').count()
+    context['recommended_courses'] = recommended_courses(worker)
         
     return render(request, 'core/dashboard.html', context)
+
+
+@require_GET
+def proxied_image(request, token):
+    """Serve a cached, resized copy of an external image (see core.image_proxy)"""
+    try:
+        url, width = image_proxy.unsign(token)
+    except signing.BadSignature:
+        raise Http404('Unknown image')
+    extension = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpg'
+    try:
+        file, path = image_proxy.open_image(url, width, extension)
+    except image_proxy.ImageProxyError:
+        # Lets the <img> onerror fallback take over
+        return HttpResponse(status=502)
+
+    etag = f'"{path.stem}"'
+    if request.headers.get('If-None-Match') == etag:
+        file.close()
+        response = HttpResponse(status=304)
+    else:
+        response = FileResponse(file, content_type=image_proxy.CONTENT_TYPES[extension])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response['Vary'] = 'Accept'
+    return response
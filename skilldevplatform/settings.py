@@ -142,6 +142,10 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Disk cache for external profile and course images (see core.image_proxy)
+IMAGE_PROXY_ROOT = MEDIA_ROOT / 'image_cache'
+IMAGE_PROXY_MAX_BYTES = int(os.environ.get('IMAGE_PROXY_MAX_BYTES', 256 * 1024 * 1024))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,13 @@
+"""
+Settings for running the tests against a file-backed SQLite database.
+
+The default in-memory test database cannot be shared between threads, so
+the concurrency tests skip themselves there. Run them with:
+
+    python manage.py test --settings=skilldevplatform.settings_test
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES = {**DATABASES, 'default': {**DATABASES['default'], 'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'}}}
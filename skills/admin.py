@@ -1,7 +1,24 @@
+from django import forms
 from django.contrib import admin
+from .graph import PrerequisiteCycleError, validate_prerequisites
 from .models import SkillCategory, Skill
 
 
+class SkillAdminForm(forms.ModelForm):
+    class Meta:
+        model = Skill
+        fields = '__all__'
+    
+    def clean_prerequisites(self):
+        prerequisites = self.cleaned_data['prerequisites']
+        if self.instance.pk:
+            try:
+                validate_prerequisites(self.instance.pk, [skill.pk for skill in prerequisites])
+            except PrerequisiteCycleError as exc:
+                raise forms.ValidationError(exc.messages)
+        return prerequisites
+
+
 @admin.register(SkillCategory)
 class SkillCategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'icon', 'is_active', 'created_at']
@@ -12,19 +29,20 @@ class SkillCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Skill)
 class SkillAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'difficulty_level', 'estimated_duration_hours', 'is_active', 'created_at']
+    form = SkillAdminForm
+    list_display = ['name', 'category', 'difficulty_level', 'estimated_duration_hours', 'worker_count', 'is_active', 'created_at']
     list_filter = ['category', 'difficulty_level', 'is_active', 'created_at']
     search_fields = ['name', 'description']
     list_editable = ['is_active']
     filter_horizontal = ['prerequisites']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'worker_count']
     
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'description', 'category', 'image')
         }),
         ('Details', {
-            'fields': ('difficulty_level', 'estimated_duration_hours', 'prerequisites')
+            'fields': ('difficulty_level', 'estimated_duration_hours', 'prerequisites', 'worker_count')
         }),
         ('Status', {
             'fields': ('is_active', 'created_at', 'updated_at')
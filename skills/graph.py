@@ -0,0 +1,152 @@
+"""
+Prerequisite graph over skills.
+
+Skill.prerequisites forms a directed acyclic graph. Its transitive closure is
+materialized in SkillPrerequisitePath, one row per (skill, prerequisite) pair
+reachable through any chain, with ``depth`` holding the longest chain length.
+Because a prerequisite always sits deeper than everything that depends on it,
+ordering a skill's closure rows by descending depth is a topological order:
+a full learning path is a single indexed query.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import touch
+from .models import Skill, SkillPrerequisitePath
+
+PrerequisiteEdges = Skill.prerequisites.through
+
+
+class PrerequisiteCycleError(ValidationError):
+    """Raised when a prerequisite would make a skill depend on itself"""
+
+
+def load_edges(using=None):
+    """Map of skill id -> set of its direct prerequisite ids"""
+    edges = defaultdict(set)
+    rows = PrerequisiteEdges.objects.using(using).values_list('from_skill_id', 'to_skill_id')
+    for skill_id, prerequisite_id in rows.iterator(chunk_size=5000):
+        edges[skill_id].add(prerequisite_id)
+    return edges
+
+
+def compute_closure(edges, skill_ids=None):
+    """Longest-path depth to every ancestor, for ``skill_ids`` (default: all).
+
+    Returns {skill_id: {prerequisite_id: depth}}. Raises
+    PrerequisiteCycleError if the graph reachable from ``skill_ids`` has a
+    cycle.
+    """
+    if skill_ids is None:
+        skill_ids = set(edges)
+    ancestors = {}
+    in_progress = set()
+
+    for root in skill_ids:
+        if root in ancestors:
+            continue
+        # Iterative post-order DFS so deep chains don't hit the recursion limit
+        stack = [(root, iter(edges.get(root, ())))]
+        in_progress.add(root)
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if child in in_progress:
+                    raise PrerequisiteCycleError(f'Prerequisite cycle through skill {child}.')
+                if child not in ancestors:
+                    in_progress.add(child)
+                    stack.append((child, iter(edges.get(child, ()))))
+                    break
+            else:
+                stack.pop()
+                in_progress.discard(node)
+                depths = {}
+                for child in edges.get(node, ()):
+                    depths[child] = max(depths.get(child, 0), 1)
+                    for ancestor, depth in ancestors[child].items():
+                        if depth + 1 > depths.get(ancestor, 0):
+                            depths[ancestor] = depth + 1
+                ancestors[node] = depths
+
+    return {skill_id: ancestors[skill_id] for skill_id in skill_ids}
+
+
+def _write_closure(closure, using=None, batch_size=5000):
+    SkillPrerequisitePath.objects.using(using).bulk_create(
+        (
+            SkillPrerequisitePath(skill_id=skill_id, prerequisite_id=prerequisite_id, depth=depth)
+            for skill_id, depths in closure.items()
+            for prerequisite_id, depth in depths.items()
+        ),
+        batch_size=batch_size,
+    )
+
+
+def rebuild(using=None):
+    """Recompute the whole closure table; returns the number of paths"""
+    closure = compute_closure(load_edges(using))
+    with transaction.atomic(using=using):
+        SkillPrerequisitePath.objects.using(using).all().delete()
+        _write_closure(closure, using=using)
+        # Learning paths show on the detail pages, which are validated against updated_at
+        Skill.objects.using(using).update(updated_at=timezone.now())
+    return sum(len(depths) for depths in closure.values())
+
+
+def dependents_of(skill_ids, using=None):
+    """Ids of every skill that (transitively) requires one of ``skill_ids``"""
+    return set(
+        SkillPrerequisitePath.objects.using(using)
+        .filter(prerequisite_id__in=skill_ids)
+        .values_list('skill_id', flat=True)
+    )
+
+
+def refresh(skill_ids, using=None):
+    """Recompute closure rows after the prerequisites of ``skill_ids`` changed.
+
+    Only the changed skills and the skills depending on them are rewritten.
+    """
+    skill_ids = set(skill_ids)
+    if not skill_ids:
+        return
+    affected = skill_ids | dependents_of(skill_ids, using=using)
+    closure = compute_closure(load_edges(using), affected)
+    with transaction.atomic(using=using):
+        SkillPrerequisitePath.objects.using(using).filter(skill_id__in=affected).delete()
+        _write_closure(closure, using=using)
+        touch(Skill, affected, using=using)
+
+
+def validate_prerequisites(skill_id, prerequisite_ids, using=None):
+    """Raise PrerequisiteCycleError unless every edge prerequisite -> skill is safe"""
+    prerequisite_ids = set(prerequisite_ids)
+    if skill_id in prerequisite_ids:
+        raise PrerequisiteCycleError('A skill cannot be its own prerequisite.')
+    # A cycle appears iff the skill is already an ancestor of a new prerequisite
+    conflict = (
+        SkillPrerequisitePath.objects.using(using)
+        .filter(skill_id__in=prerequisite_ids, prerequisite_id=skill_id)
+        .select_related('skill')
+        .first()
+    )
+    if conflict:
+        raise PrerequisiteCycleError(
+            f'"{conflict.skill}" already requires this skill, so it cannot be a prerequisite of it.'
+        )
+
+
+def learning_path(skill):
+    """Every active prerequisite of ``skill``, in an order they can be learned.
+
+    Returns SkillPrerequisitePath rows with ``prerequisite`` preloaded.
+    """
+    return (
+        SkillPrerequisitePath.objects
+        .filter(skill=skill, prerequisite__is_active=True)
+        .select_related('prerequisite__category')
+        .order_by('-depth', 'prerequisite__name')
+    )
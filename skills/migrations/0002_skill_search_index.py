@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# Schema of skills.search.SKILL_INDEX as of this migration, inlined so later
+# changes to the live index do not rewrite history
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    skills = apps.get_model('skills', 'Skill')._meta.db_table
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS skills_skill_search USING fts5(name, description, tokenize='unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO skills_skill_search (rowid, name, description) "
+            f"SELECT id, COALESCE(name, ''), COALESCE(description, '') FROM {skills}"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS skills_skill_search (object_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS skills_skill_search_document_gin ON skills_skill_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO skills_skill_search (object_id, document) "
+            f"SELECT id, setweight(to_tsvector('simple', COALESCE(name, '')), 'A') "
+            f"|| setweight(to_tsvector('simple', COALESCE(description, '')), 'B') FROM {skills} "
+            f"ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document"
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS skills_skill_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_worker_count(apps, schema_editor):
+    Skill = apps.get_model('skills', 'Skill')
+    WorkerSkill = apps.get_model('workers', 'WorkerSkill')
+    active = (
+        WorkerSkill.objects.filter(skill=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('skill')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Skill.objects.update(worker_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0002_skill_search_index'),
+        ('workers', '0002_worker_profile_picture_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='worker_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Active worker skills, maintained from WorkerSkill changes'),
+        ),
+        migrations.RunPython(backfill_worker_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+
+
+def longest_paths(edges):
+    """{skill_id: {prerequisite_id: longest chain length}}, as skills.graph.compute_closure computed it.
+
+    Edges closing a cycle are ignored, so data predating cycle checks cannot
+    fail the migration.
+    """
+    ancestors = {}
+    for root in list(edges):
+        if root in ancestors:
+            continue
+        stack = [(root, iter(edges.get(root, ())))]
+        in_progress = {root}
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if child not in ancestors and child not in in_progress:
+                    in_progress.add(child)
+                    stack.append((child, iter(edges.get(child, ()))))
+                    break
+            else:
+                stack.pop()
+                in_progress.discard(node)
+                depths = {}
+                for child in edges.get(node, ()):
+                    if child not in ancestors:
+                        continue
+                    depths[child] = max(depths.get(child, 0), 1)
+                    for ancestor, depth in ancestors[child].items():
+                        if depth + 1 > depths.get(ancestor, 0):
+                            depths[ancestor] = depth + 1
+                ancestors[node] = depths
+    return ancestors
+
+
+def build_closure(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Skill = apps.get_model('skills', 'Skill')
+    SkillPrerequisitePath = apps.get_model('skills', 'SkillPrerequisitePath')
+    edges = defaultdict(set)
+    for skill_id, prerequisite_id in Skill.prerequisites.through.objects.using(db).values_list('from_skill_id', 'to_skill_id'):
+        edges[skill_id].add(prerequisite_id)
+    SkillPrerequisitePath.objects.using(db).bulk_create(
+        (
+            SkillPrerequisitePath(skill_id=skill_id, prerequisite_id=prerequisite_id, depth=depth)
+            for skill_id, depths in longest_paths(edges).items()
+            for prerequisite_id, depth in depths.items()
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0003_skill_worker_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillPrerequisitePath',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(help_text='Length of the longest prerequisite chain between the two skills')),
+                ('prerequisite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependent_paths', to='skills.skill')),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prerequisite_paths', to='skills.skill')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['skill', '-depth'], name='skills_path_skill_depth_idx')],
+                'unique_together': {('skill', 'prerequisite')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+import heapq
+from itertools import islice
+
+# Scoring as skills.related computed it when the table was added
+RELATED_LIMIT = 8
+COURSE_WEIGHT = 0.5
+CATEGORY_WEIGHT = 0.3
+DIFFICULTY_WEIGHT = 0.2
+DIFFICULTY_LEVELS = ['beginner', 'intermediate', 'advanced', 'expert']
+DIFFICULTY_RANK = {level: index for index, level in enumerate(DIFFICULTY_LEVELS)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def difficulty_similarity(a, b):
+    distance = abs(DIFFICULTY_RANK.get(a, 0) - DIFFICULTY_RANK.get(b, 0))
+    return 1.0 - distance / (len(DIFFICULTY_LEVELS) - 1)
+
+
+def backfill_related_skills(apps, schema_editor):
+    Skill = apps.get_model('skills', 'Skill')
+    RelatedSkill = apps.get_model('skills', 'RelatedSkill')
+    db = schema_editor.connection.alias
+    skills = {
+        pk: (category_id, difficulty)
+        for pk, category_id, difficulty in Skill.objects.using(db)
+        .filter(is_active=True)
+        .values_list('pk', 'category_id', 'difficulty_level')
+    }
+    links = (
+        Skill.courses.through.objects.using(db)
+        .filter(course__is_active=True, skill__is_active=True)
+        .values_list('skill_id', 'course_id')
+    )
+    courses_by_skill = defaultdict(set)
+    skills_by_course = defaultdict(set)
+    for skill_id, course_id in links.iterator(chunk_size=5000):
+        courses_by_skill[skill_id].add(course_id)
+        skills_by_course[course_id].add(skill_id)
+    buckets = defaultdict(list)
+    for skill_id in sorted(skills):
+        buckets[skills[skill_id]].append(skill_id)
+
+    rows = []
+    for skill_id, (category_id, difficulty) in skills.items():
+        courses = courses_by_skill.get(skill_id, set())
+        candidates = set()
+        for course_id in courses:
+            candidates |= skills_by_course[course_id]
+        by_distance = sorted(DIFFICULTY_LEVELS, key=lambda level: abs(DIFFICULTY_RANK[level] - DIFFICULTY_RANK.get(difficulty, 0)))
+        same_category = (other for level in by_distance for other in buckets.get((category_id, level), ()))
+        candidates.update(islice(same_category, RELATED_LIMIT + 1))
+        candidates.discard(skill_id)
+        scores = []
+        for other in candidates:
+            other_category, other_difficulty = skills[other]
+            score = (
+                COURSE_WEIGHT * jaccard(courses, courses_by_skill.get(other, set()))
+                + CATEGORY_WEIGHT * (other_category == category_id)
+                + DIFFICULTY_WEIGHT * difficulty_similarity(difficulty, other_difficulty)
+            )
+            if score > 0:
+                scores.append((other, score))
+        best = heapq.nsmallest(RELATED_LIMIT, scores, key=lambda pair: (-pair[1], pair[0]))
+        rows.extend(
+            RelatedSkill(skill_id=skill_id, related_id=related_id, score=score, rank=rank)
+            for rank, (related_id, score) in enumerate(best, start=1)
+        )
+    RelatedSkill.objects.using(db).all().delete()
+    RelatedSkill.objects.using(db).bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0004_skill_prerequisite_path'),
+        ('training', '0002_course_image_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='skills.skill')),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='skills.skill')),
+            ],
+            options={
+                'ordering': ['skill', 'rank'],
+                'indexes': [models.Index(fields=['skill', 'rank'], name='skills_related_rank_idx')],
+                'unique_together': {('skill', 'related')},
+            },
+        ),
+        migrations.RunPython(backfill_related_skills, migrations.RunPython.noop),
+    ]
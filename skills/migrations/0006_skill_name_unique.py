@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:39
+
+from django.db import migrations, models
+from django.db.models import Count
+
+NAME_LENGTH = 200
+
+
+def rename_duplicate_names(apps, schema_editor):
+    """Number every skill sharing its name with an older one, e.g. "Python (2)", so the constraint can be added"""
+    Skill = apps.get_model('skills', 'Skill')
+    skills = Skill.objects.using(schema_editor.connection.alias)
+    duplicated = (
+        skills.order_by().values('name').annotate(total=Count('pk')).filter(total__gt=1).values_list('name', flat=True)
+    )
+    for name in list(duplicated):
+        number = 1
+        for pk in list(skills.filter(name=name).order_by('pk').values_list('pk', flat=True))[1:]:
+            while True:
+                number += 1
+                suffix = f' ({number})'
+                candidate = name[:NAME_LENGTH - len(suffix)] + suffix
+                if not skills.filter(name=candidate).exists():
+                    break
+            skills.filter(pk=pk).update(name=candidate)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0005_related_skill'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='skill',
+            name='name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0006_skill_name_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='image_variants',
+            field=models.CharField(blank=True, editable=False, help_text='Image whose resized variants exist, maintained by core.images', max_length=100),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:20
+
+from django.db import migrations
+
+
+def forget_variants(apps, schema_editor):
+    # Variants are now named after the whole source file name; sets written
+    # under the old names are regenerated by generate_image_variants
+    db = schema_editor.connection.alias
+    Skill = apps.get_model('skills', 'Skill')
+    Skill.objects.using(db).exclude(image_variants='').update(image_variants='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0007_skill_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(forget_variants, migrations.RunPython.noop),
+    ]
@@ -19,10 +19,11 @@ class SkillCategory(BaseModel):
 
 class Skill(BaseModel):
     """Skill model for tracking worker skills"""
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, unique=True)
     description = models.TextField()
     category = models.ForeignKey(SkillCategory, on_delete=models.CASCADE, related_name='skills')
     image = models.ImageField(upload_to='skills/', blank=True, null=True)
+    image_variants = models.CharField(max_length=100, blank=True, editable=False, help_text="Image whose resized variants exist, maintained by core.images")
     difficulty_level = models.CharField(
         max_length=20,
         choices=[
@@ -35,6 +36,9 @@ class Skill(BaseModel):
     )
     estimated_duration_hours = models.PositiveIntegerField(default=40, help_text="Estimated hours to master")
     prerequisites = models.ManyToManyField('self', blank=True, symmetrical=False, related_name='required_for')
+    worker_count = models.PositiveIntegerField(default=0, editable=False, help_text="Active worker skills, maintained from WorkerSkill changes")
+    
+    maintained_fields = ['worker_count', 'image_variants']
     
     class Meta:
         ordering = ['name']
@@ -53,3 +57,33 @@ class Skill(BaseModel):
             'expert': 'danger',
         }
         return colors.get(self.difficulty_level, 'secondary')
+
+
+class SkillPrerequisitePath(models.Model):
+    """Transitive closure of Skill.prerequisites, maintained by skills.graph"""
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='prerequisite_paths')
+    prerequisite = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='dependent_paths')
+    depth = models.PositiveIntegerField(help_text="Length of the longest prerequisite chain between the two skills")
+    
+    class Meta:
+        unique_together = ['skill', 'prerequisite']
+        indexes = [models.Index(fields=['skill', '-depth'], name='skills_path_skill_depth_idx')]
+    
+    def __str__(self):
+        return f"{self.prerequisite} -> {self.skill} ({self.depth})"
+
+
+class RelatedSkill(models.Model):
+    """Precomputed nearest neighbours of a skill, maintained by skills.related"""
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ['skill', 'related']
+        ordering = ['skill', 'rank']
+        indexes = [models.Index(fields=['skill', 'rank'], name='skills_related_rank_idx')]
+    
+    def __str__(self):
+        return f"{self.skill} ~ {self.related} ({self.score:.2f})"
@@ -0,0 +1,31 @@
+"""
+Cached catalog reference data shared by the listing pages.
+
+All datasets live in the ``catalog`` namespace, which skills.signals bumps
+whenever a Skill or SkillCategory changes.
+"""
+from core.cache import get_reference
+from .models import Skill, SkillCategory
+
+CATALOG = 'catalog'
+
+
+def active_categories():
+    return get_reference(CATALOG, 'active_categories', lambda: list(SkillCategory.objects.filter(is_active=True)))
+
+
+def skill_options():
+    """Active skills (id and name only) for filter dropdowns"""
+    return get_reference(
+        CATALOG,
+        'skill_options',
+        lambda: list(Skill.objects.filter(is_active=True).order_by('name').only('id', 'name')),
+    )
+
+
+def featured_skills(limit=6):
+    return get_reference(
+        CATALOG,
+        f'featured_skills:{limit}',
+        lambda: list(Skill.objects.filter(is_active=True).select_related('category')[:limit]),
+    )
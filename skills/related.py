@@ -0,0 +1,119 @@
+"""
+Related-skill similarity job.
+
+Two skills are similar when they are taught together (Jaccard over the active
+courses covering them), share a category and sit at close difficulty levels.
+The top RELATED_LIMIT neighbours of every active skill are materialized in
+RelatedSkill so the detail page reads them with one indexed lookup.
+"""
+from collections import defaultdict
+from itertools import islice
+
+from core.similarity import (
+    DIFFICULTY_LEVELS, DIFFICULTY_RANK, NeighbourTable, difficulty_similarity, jaccard, top_k,
+)
+from .models import RelatedSkill, Skill
+
+RELATED_LIMIT = 8
+
+COURSE_WEIGHT = 0.5
+CATEGORY_WEIGHT = 0.3
+DIFFICULTY_WEIGHT = 0.2
+
+
+def load_features(skill_ids=None, using=None):
+    """Feature tables for compute_related_skills(): ({skill_id: (category_id, difficulty)}, {skill_id: course ids}).
+
+    With ``skill_ids`` only what scoring those skills needs is loaded: the
+    skills themselves, every skill sharing a course with them and the first
+    skills of each difficulty level in their categories.
+    """
+    active = Skill.objects.using(using).filter(is_active=True)
+    links = Skill.courses.through.objects.using(using).filter(course__is_active=True, skill__is_active=True)
+    if skill_ids is not None:
+        skill_ids = set(skill_ids)
+        courses = links.filter(skill_id__in=skill_ids).values('course_id')
+        wanted = skill_ids | set(links.filter(course_id__in=courses).values_list('skill_id', flat=True))
+        categories = set(active.filter(pk__in=skill_ids).values_list('category_id', flat=True))
+        for category_id in categories:
+            for level in DIFFICULTY_LEVELS:
+                # compute_related_skills() takes at most RELATED_LIMIT + 1 per category, lowest pks first
+                wanted.update(
+                    active.filter(category_id=category_id, difficulty_level=level)
+                    .order_by('pk').values_list('pk', flat=True)[:RELATED_LIMIT + 1]
+                )
+        active = active.filter(pk__in=wanted)
+        links = links.filter(skill_id__in=wanted)
+    skills = {
+        pk: (category_id, difficulty)
+        for pk, category_id, difficulty in active.values_list('pk', 'category_id', 'difficulty_level')
+    }
+    courses_by_skill = defaultdict(set)
+    for skill_id, course_id in links.values_list('skill_id', 'course_id').iterator(chunk_size=5000):
+        courses_by_skill[skill_id].add(course_id)
+    return skills, courses_by_skill
+
+
+def compute_related_skills(skills, courses_by_skill, skill_ids=None, limit=RELATED_LIMIT):
+    """Return {skill_id: [(related_id, score), ...]} best first.
+
+    Candidates are skills sharing a course, plus the closest-difficulty
+    skills of the same category. The latter only differ by difficulty, so a
+    handful per level is enough and large categories stay cheap.
+    """
+    skills_by_course = defaultdict(set)
+    for skill_id, course_ids in courses_by_skill.items():
+        for course_id in course_ids:
+            skills_by_course[course_id].add(skill_id)
+    buckets = defaultdict(list)
+    for skill_id in sorted(skills):
+        category_id, difficulty = skills[skill_id]
+        buckets[(category_id, difficulty)].append(skill_id)
+
+    results = {}
+    for skill_id in (skills if skill_ids is None else [pk for pk in skill_ids if pk in skills]):
+        category_id, difficulty = skills[skill_id]
+        courses = courses_by_skill.get(skill_id, set())
+
+        candidates = set()
+        for course_id in courses:
+            candidates |= skills_by_course[course_id]
+        by_distance = sorted(DIFFICULTY_LEVELS, key=lambda level: abs(DIFFICULTY_RANK[level] - DIFFICULTY_RANK.get(difficulty, 0)))
+        same_category = (other for level in by_distance for other in buckets.get((category_id, level), ()))
+        candidates.update(islice(same_category, limit + 1))
+        candidates.discard(skill_id)
+
+        scores = {}
+        for other in candidates:
+            other_category, other_difficulty = skills[other]
+            scores[other] = (
+                COURSE_WEIGHT * jaccard(courses, courses_by_skill.get(other, set()))
+                + CATEGORY_WEIGHT * (other_category == category_id)
+                + DIFFICULTY_WEIGHT * difficulty_similarity(difficulty, other_difficulty)
+            )
+        results[skill_id] = top_k(scores, limit)
+    return results
+
+
+NEIGHBOURS = NeighbourTable(RelatedSkill, 'skill', load_features, compute_related_skills)
+
+
+def refresh_all(using=None):
+    """Recompute every skill's neighbours; returns the number of skills processed"""
+    return NEIGHBOURS.refresh_all(using=using)
+
+
+def refresh(skill_ids, using=None):
+    """Recompute the neighbours of ``skill_ids`` and of the skills around them"""
+    NEIGHBOURS.refresh(skill_ids, using=using)
+
+
+def related_skills(skill, limit=4):
+    """The stored nearest neighbours of ``skill``, best first"""
+    entries = (
+        RelatedSkill.objects
+        .filter(skill=skill, related__is_active=True)
+        .select_related('related__category')
+        .order_by('rank')[:limit]
+    )
+    return [entry.related for entry in entries]
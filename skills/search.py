@@ -0,0 +1,46 @@
+"""
+Ranked full-text search over the skill catalog.
+"""
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from core.search import FullTextIndex
+
+# Name matches rank well above description-only matches
+SKILL_INDEX = FullTextIndex('skills_skill_search', ['name', 'description'], weights=[10.0, 1.0])
+
+# Search results are capped; nobody pages past the first few hundred hits
+SEARCH_RESULT_LIMIT = 200
+
+
+def index_skills(skills, using=None):
+    SKILL_INDEX.index(((skill.pk, [skill.name, skill.description]) for skill in skills), using=using)
+
+
+def unindex_skills(pks, using=None):
+    SKILL_INDEX.remove(pks, using=using)
+
+
+def search_skills(queryset, query):
+    """Filter ``queryset`` down to skills matching ``query``, best match first.
+
+    Apply every other filter to ``queryset`` first: the SEARCH_RESULT_LIMIT
+    best matches are taken among its rows.
+
+    The result is annotated with ``search_rank`` (0 is the best match; every
+    row ranks 0 on backends without a full-text index).
+    """
+    if not SKILL_INDEX.supported:
+        return (
+            queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+            .annotate(search_rank=Value(0, output_field=IntegerField()))
+        )
+
+    # Filters are applied inside the index query so the cap counts only rows that can be shown
+    pks = SKILL_INDEX.search(query, limit=SEARCH_RESULT_LIMIT, within=queryset, using=queryset.db)
+    if not pks:
+        return queryset.none()
+    ranking = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(pks)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=pks).annotate(search_rank=ranking).order_by('search_rank')
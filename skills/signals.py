@@ -0,0 +1,70 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core import images
+from core.cache import bump_version_on_commit
+from core.tasks import submit_on_commit
+from . import graph, related, search
+from .models import RelatedSkill, Skill, SkillCategory
+from .reference import CATALOG
+
+images.track(Skill, 'image')
+
+
+@receiver(post_save, sender=Skill)
+def index_skill(sender, instance, using=None, **kwargs):
+    """Keep the search index in step with the saved skill"""
+    search.index_skills([instance], using=using)
+
+
+@receiver(post_delete, sender=Skill)
+def unindex_skill(sender, instance, using=None, **kwargs):
+    search.unindex_skills([instance.pk], using=using)
+
+
+@receiver(m2m_changed, sender=Skill.prerequisites.through)
+def maintain_prerequisite_closure(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    """Reject cycles and refresh the closure rows of the skills whose prerequisites changed"""
+    if action == 'pre_add':
+        if reverse:
+            # instance became a prerequisite of each skill in pk_set
+            for skill_id in pk_set:
+                graph.validate_prerequisites(skill_id, [instance.pk], using=using)
+        else:
+            graph.validate_prerequisites(instance.pk, pk_set, using=using)
+    elif action == 'pre_clear' and reverse:
+        instance._cleared_dependent_ids = set(instance.required_for.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        graph.refresh(pk_set if reverse else [instance.pk], using=using)
+    elif action == 'post_clear':
+        graph.refresh(getattr(instance, '_cleared_dependent_ids', set()) if reverse else [instance.pk], using=using)
+
+
+@receiver(pre_delete, sender=Skill)
+def remember_dependents(sender, instance, using=None, **kwargs):
+    instance._dependent_ids = graph.dependents_of([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Skill)
+def refresh_dependents(sender, instance, using=None, **kwargs):
+    # Longest chains through the deleted skill are gone; its paths cascade away
+    graph.refresh(getattr(instance, '_dependent_ids', set()), using=using)
+
+
+@receiver([post_save, post_delete, images.variants_recorded], sender=Skill)
+@receiver([post_save, post_delete], sender=SkillCategory)
+def invalidate_catalog(sender, using=None, **kwargs):
+    bump_version_on_commit(CATALOG, using=using)
+
+
+@receiver(post_save, sender=Skill)
+def refresh_related_skills(sender, instance, using=None, **kwargs):
+    # Scoring the skill's neighbourhood takes a few queries, so it stays off the request
+    submit_on_commit(related.refresh, [instance.pk], using, using=using)
+
+
+@receiver(pre_delete, sender=Skill)
+def refresh_related_skills_on_delete(sender, instance, using=None, **kwargs):
+    # Skills listing this one lose a neighbour when its rows cascade away
+    listing = set(RelatedSkill.objects.using(using).filter(related=instance).values_list('skill_id', flat=True))
+    submit_on_commit(related.refresh, listing, using, using=using)
@@ -1,3 +1,179 @@
-from django.test import TestCase
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from training.models import Course
+from workers.models import Worker, WorkerSkill
+from .models import RelatedSkill, Skill, SkillCategory
+from . import related
+from .search import SKILL_INDEX, search_skills
+
+
+class StaleSaveTests(TestCase):
+    def test_saving_a_stale_skill_keeps_its_worker_count(self):
+        category = SkillCategory.objects.create(name='Engineering')
+        skill = Skill.objects.create(name='Python', description='Python', category=category)
+        user = User.objects.create_user('ada')
+        worker = Worker.objects.create(
+            user=user, employee_id='E-1', department='R&D', position='Engineer', date_of_joining=date(2020, 1, 1),
+        )
+
+        WorkerSkill.objects.create(worker=worker, skill=skill, proficiency_level='advanced')
+        skill.description = 'The Python language'
+        skill.save()
+
+        skill.refresh_from_db()
+        self.assertEqual(skill.description, 'The Python language')
+        self.assertEqual(skill.worker_count, 1)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class SkillSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.engineering = SkillCategory.objects.create(name='Engineering')
+        cls.data = SkillCategory.objects.create(name='Data')
+
+    def create(self, name, description='', category=None, **fields):
+        return Skill.objects.create(name=name, description=description, category=category or self.engineering, **fields)
+
+    def test_name_matches_rank_above_description_matches(self):
+        mention = self.create('Flask', 'Web apps in Python')
+        python = self.create('Python', 'A programming language')
+        results = search_skills(Skill.objects.all(), 'python')
+        self.assertEqual(list(results), [python, mention])
+        self.assertEqual([skill.search_rank for skill in results], [0, 1])
+
+    @mock.patch('skills.search.SEARCH_RESULT_LIMIT', 2)
+    def test_filters_apply_before_the_result_limit(self):
+        for number in range(3):
+            self.create(f'Python {number}')
+        self.create('Python retired', is_active=False)
+        wanted = self.create('Python for data', category=self.data, difficulty_level='advanced')
+
+        skills = Skill.objects.filter(is_active=True, category=self.data)
+        self.assertEqual(list(search_skills(skills, 'python')), [wanted])
+
+        response = self.client.get(reverse('skill_list'), {'q': 'python', 'difficulty': 'advanced'})
+        self.assertEqual(list(response.context['skills']), [wanted])
+
+
+class RelatedSkillTests(TestCase):
+    def setUp(self):
+        engineering = SkillCategory.objects.create(name='Engineering')
+        data = SkillCategory.objects.create(name='Data')
+        levels = ['beginner', 'intermediate', 'advanced', 'expert']
+        self.skills = [
+            Skill.objects.create(name=f'Skill {index}', description='', category=engineering, difficulty_level=levels[index % 4])
+            for index in range(related.RELATED_LIMIT * 3)
+        ] + [Skill.objects.create(name=f'Data {index}', description='', category=data) for index in range(3)]
+        for index in range(6):
+            course = Course.objects.create(title=f'Course {index}', description='', duration_hours=10)
+            course.skills.add(*self.skills[index * 4:index * 4 + 5], self.skills[-1 - index % 3])
+
+    def test_partial_features_score_like_the_full_catalog(self):
+        full = related.load_features()
+        for skill in self.skills:
+            with self.subTest(skill=skill.name):
+                self.assertEqual(
+                    related.compute_related_skills(*related.load_features({skill.pk}), {skill.pk}),
+                    related.compute_related_skills(*full, {skill.pk}),
+                )
+
+    def test_refresh_updates_the_changed_skill_and_its_neighbours(self):
+        related.refresh_all()
+        changed = self.skills[0]
+        Skill.objects.filter(pk=changed.pk).update(difficulty_level='expert')
+        related.refresh([changed.pk])
+
+        expected = related.compute_related_skills(*related.load_features())
+        stored = RelatedSkill.objects.filter(skill=changed).order_by('rank').values_list('related', flat=True)
+        self.assertEqual(list(stored), [pk for pk, _ in expected[changed.pk]])
+
+        Skill.objects.filter(pk=changed.pk).update(is_active=False)
+        related.refresh([changed.pk])
+        self.assertFalse(RelatedSkill.objects.filter(skill=changed).exists())
+        self.assertFalse(RelatedSkill.objects.filter(related=changed).exists())
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Runs data migrations against rows created with the historical models"""
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+
+class SkillSearchMigrationTests(MigrationTestCase):
+    def test_existing_skills_are_indexed(self):
+        apps = self.migrate([('skills', '0001_initial')])
+        category = apps.get_model('skills', 'SkillCategory').objects.create(name='Engineering')
+        skill = apps.get_model('skills', 'Skill').objects.create(name='Kubernetes', description='Orchestration', category=category)
+
+        self.migrate([('skills', '0002_skill_search_index')])
+        self.assertEqual(SKILL_INDEX.search('kube'), [skill.pk])
+        self.assertEqual(SKILL_INDEX.search('orchestr'), [skill.pk])
+
+
+class PrerequisitePathMigrationTests(MigrationTestCase):
+    def test_closure_is_built_from_existing_prerequisites(self):
+        apps = self.migrate([('skills', '0003_skill_worker_count')])
+        category = apps.get_model('skills', 'SkillCategory').objects.create(name='Engineering')
+        Skill = apps.get_model('skills', 'Skill')
+        basics, scripting, automation, legacy, obsolete = (
+            Skill.objects.create(name=name, description=name, category=category)
+            for name in ('Basics', 'Scripting', 'Automation', 'Legacy', 'Obsolete')
+        )
+        scripting.prerequisites.add(basics)
+        automation.prerequisites.add(scripting, basics)
+        # A cycle from before cycles were rejected
+        legacy.prerequisites.add(obsolete)
+        obsolete.prerequisites.add(legacy)
+
+        apps = self.migrate([('skills', '0004_skill_prerequisite_path')])
+        paths = apps.get_model('skills', 'SkillPrerequisitePath').objects.values_list('skill', 'prerequisite', 'depth')
+        chain = {(automation.pk, scripting.pk, 1), (automation.pk, basics.pk, 2), (scripting.pk, basics.pk, 1)}
+        self.assertEqual({path for path in paths if path[0] not in (legacy.pk, obsolete.pk)}, chain)
+        self.assertEqual(len(paths), len(chain) + 1)
+
+
+class RelatedSkillMigrationTests(MigrationTestCase):
+    def test_neighbours_are_backfilled(self):
+        apps = self.migrate([('skills', '0004_skill_prerequisite_path'), ('training', '0002_course_image_url')])
+        category = apps.get_model('skills', 'SkillCategory').objects.create(name='Engineering')
+        Skill = apps.get_model('skills', 'Skill')
+        python, django, docker = (
+            Skill.objects.create(name=name, description=name, category=category) for name in ('Python', 'Django', 'Docker')
+        )
+        course = apps.get_model('training', 'Course').objects.create(title='Web', description='Web', duration_hours=10)
+        course.skills.add(python.pk, django.pk)
+
+        apps = self.migrate([('skills', '0005_related_skill')])
+        neighbours = apps.get_model('skills', 'RelatedSkill').objects.filter(skill=python.pk).order_by('rank')
+        self.assertEqual(list(neighbours.values_list('related', flat=True)), [django.pk, docker.pk])
+
+
+class SkillNameMigrationTests(MigrationTestCase):
+    before = [('skills', '0005_related_skill')]
+    after = [('skills', '0006_skill_name_unique')]
+
+    def test_duplicate_names_are_numbered_before_the_constraint(self):
+        apps = self.migrate(self.before)
+        category = apps.get_model('skills', 'SkillCategory').objects.create(name='Engineering')
+        Skill = apps.get_model('skills', 'Skill')
+        for name in ('Python', 'Python', 'Python (2)', 'Python', 'Docker'):
+            Skill.objects.create(name=name, description=name, category=category)
+
+        apps = self.migrate(self.after)
+        names = list(apps.get_model('skills', 'Skill').objects.order_by('pk').values_list('name', flat=True))
+        self.assertEqual(names, ['Python', 'Python (3)', 'Python (2)', 'Python (4)', 'Docker'])
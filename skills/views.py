@@ -1,30 +1,49 @@
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
-from .models import Skill, SkillCategory
+from django.db.models import Count, Max, Q
+from core.conditional import conditional_page
+from core.pagination import paginate
+from .graph import learning_path
+from .models import RelatedSkill, Skill, SkillCategory, SkillPrerequisitePath
+from .reference import active_categories
+from .related import related_skills
+from .search import search_skills
 
 
+def skill_list_version(request):
+    """Validators for skill_list: the newest skill and category, and how many there are"""
+    skills = Skill.objects.aggregate(updated=Max('updated_at'), count=Count('pk'))
+    categories = SkillCategory.objects.aggregate(updated=Max('updated_at'), count=Count('pk'))
+    if skills['updated'] is None or categories['updated'] is None:
+        return None
+    return max(skills['updated'], categories['updated']), (skills['count'], categories['count'])
+
+
+@conditional_page(skill_list_version)
 def skill_list(request):
     """List all skills"""
-    skills = Skill.objects.filter(is_active=True)
-    categories = SkillCategory.objects.filter(is_active=True)
+    skills = Skill.objects.filter(is_active=True).select_related('category')
+    categories = active_categories()
     
     # Filter by category
     category_id = request.GET.get('category')
     if category_id:
         skills = skills.filter(category_id=category_id)
     
-    # Search
-    query = request.GET.get('q')
-    if query:
-        skills = skills.filter(Q(name__icontains=query) | Q(description__icontains=query))
-    
     # Filter by difficulty
     difficulty = request.GET.get('difficulty')
     if difficulty:
         skills = skills.filter(difficulty_level=difficulty)
     
+    # Search, among the filtered skills
+    query = request.GET.get('q')
+    if query:
+        skills = search_skills(skills, query)
+    
+    page = paginate(request, skills, ['search_rank', 'name'] if query else ['name'])
+    
     context = {
-        'skills': skills,
+        'skills': page.object_list,
+        'page': page,
         'categories': categories,
         'current_category': category_id,
         'current_difficulty': difficulty,
@@ -33,13 +52,26 @@ def skill_list(request):
     return render(request, 'skills/skill_list.html', context)
 
 
+def skill_detail_version(request, pk):
+    """Validators for skill_detail: the skill, its learning path and related skills, with their categories"""
+    shown = Skill.objects.filter(
+        Q(pk=pk)
+        | Q(pk__in=SkillPrerequisitePath.objects.filter(skill_id=pk).values('prerequisite_id'))
+        | Q(pk__in=RelatedSkill.objects.filter(skill_id=pk).values('related_id'))
+    ).aggregate(updated=Max('updated_at'), categories=Max('category__updated_at'), count=Count('pk'))
+    if shown['updated'] is None:
+        return None
+    return max(shown['updated'], shown['categories']), (shown['count'],)
+
+
+@conditional_page(skill_detail_version)
 def skill_detail(request, pk):
     """Detail view for a skill"""
     skill = get_object_or_404(Skill, pk=pk, is_active=True)
-    related_skills = Skill.objects.filter(category=skill.category, is_active=True).exclude(pk=pk)[:4]
     
     context = {
         'skill': skill,
-        'related_skills': related_skills,
+        'related_skills': related_skills(skill),
+        'learning_path': learning_path(skill),
     }
     return render(request, 'skills/skill_detail.html', context)
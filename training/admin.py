@@ -1,5 +1,61 @@
-from django.contrib import admin
-from .models import Course, CourseModule, Enrollment, CourseProgress
+import csv
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.template.response import TemplateResponse
+from workers.models import DepartmentFacet, Worker
+from . import certificates
+from .models import CertificateJob, Course, CourseModule, Enrollment, CourseProgress, WaitlistEntry
+from .services import CourseFullError, bulk_enroll, remove_from_waitlist
+
+
+def read_employee_ids(upload):
+    """Employee IDs from a CSV with an employee_id column, or one ID per line"""
+    text = io.TextIOWrapper(upload, encoding='utf-8-sig')
+    rows = [row for row in csv.reader(text) if row and row[0].strip()]
+    if rows and 'employee_id' in rows[0]:
+        column = rows[0].index('employee_id')
+        rows = rows[1:]
+    else:
+        column = 0
+    return {row[column].strip() for row in rows if len(row) > column and row[column].strip()}
+
+
+class BulkEnrollForm(forms.Form):
+    department = forms.ChoiceField(required=False)
+    position = forms.CharField(required=False, max_length=100)
+    employee_ids = forms.FileField(
+        required=False,
+        label='Employee IDs',
+        help_text='CSV with an employee_id column, or one ID per line',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['department'].choices = [('', 'Any department')] + [
+            (name, name) for name in DepartmentFacet.objects.filter(worker_count__gt=0).values_list('name', flat=True)
+        ]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not any(cleaned_data.get(field) for field in ('department', 'position', 'employee_ids')):
+            raise forms.ValidationError('Choose a department, a position or a file of employee IDs.')
+        return cleaned_data
+
+    def workers(self):
+        """(queryset of the chosen workers, employee IDs in the file that matched nobody)"""
+        workers = Worker.objects.all()
+        if self.cleaned_data['department']:
+            workers = workers.filter(department=self.cleaned_data['department'])
+        if self.cleaned_data['position']:
+            workers = workers.filter(position__iexact=self.cleaned_data['position'])
+        unknown = set()
+        if self.cleaned_data['employee_ids']:
+            employee_ids = read_employee_ids(self.cleaned_data['employee_ids'])
+            workers = workers.filter(employee_id__in=employee_ids)
+            unknown = employee_ids - set(Worker.objects.filter(employee_id__in=employee_ids).values_list('employee_id', flat=True))
+        return workers, unknown
 
 
 class CourseModuleInline(admin.TabularInline):
@@ -21,9 +77,10 @@ class CourseAdmin(admin.ModelAdmin):
     list_filter = ['difficulty_level', 'is_active', 'start_date', 'instructor']
     search_fields = ['title', 'description', 'instructor__username']
     list_editable = ['is_active']
-    readonly_fields = ['created_at', 'updated_at', 'enrolled_count', 'available_spots']
+    readonly_fields = ['created_at', 'updated_at', 'enrolled_count', 'available_spots', 'waitlist_count']
     filter_horizontal = ['skills']
     inlines = [CourseModuleInline]
+    actions = ['enroll_workers']
     
     fieldsets = (
         ('Basic Information', {
@@ -36,12 +93,50 @@ class CourseAdmin(admin.ModelAdmin):
             'fields': ('start_date', 'end_date')
         }),
         ('Statistics', {
-            'fields': ('enrolled_count', 'available_spots')
+            'fields': ('enrolled_count', 'available_spots', 'waitlist_count')
         }),
         ('Status', {
             'fields': ('is_active', 'created_at', 'updated_at')
         }),
     )
+    
+    @admin.action(description='Enroll a department, position or list of employees', permissions=['change'])
+    def enroll_workers(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Select exactly one course to enroll workers into.', messages.WARNING)
+            return None
+        course = queryset.get()
+        if 'apply' in request.POST:
+            form = BulkEnrollForm(request.POST, request.FILES)
+            if form.is_valid():
+                workers, unknown = form.workers()
+                try:
+                    result = bulk_enroll(course, workers)
+                except CourseFullError as exc:
+                    self.message_user(request, f'Nobody was enrolled: {exc}.', messages.ERROR)
+                    return None
+                self.message_user(
+                    request,
+                    f'Enrolled {result.created + result.reactivated} workers in {course} '
+                    f'({result.reactivated} re-enrolled, {result.already_enrolled} already enrolled).',
+                    messages.SUCCESS,
+                )
+                if unknown:
+                    self.message_user(
+                        request,
+                        f'{len(unknown)} employee IDs matched no worker: {", ".join(sorted(unknown)[:20])}',
+                        messages.WARNING,
+                    )
+                return None
+        else:
+            form = BulkEnrollForm()
+        return TemplateResponse(request, 'admin/training/course/enroll_workers.html', {
+            **self.admin_site.each_context(request),
+            'title': f'Enroll workers in {course}',
+            'opts': self.model._meta,
+            'course': course,
+            'form': form,
+        })
 
 
 @admin.register(CourseModule)
@@ -59,7 +154,7 @@ class EnrollmentAdmin(admin.ModelAdmin):
     list_filter = ['status', 'certificate_issued', 'rating', 'enrolled_date', 'is_active']
     search_fields = ['worker__employee_id', 'worker__user__username', 'course__title']
     list_editable = ['status', 'is_active']
-    readonly_fields = ['enrolled_date', 'created_at', 'updated_at']
+    readonly_fields = ['enrolled_date', 'completed_modules', 'completed_minutes', 'time_spent_minutes', 'created_at', 'updated_at']
     inlines = [CourseProgressInline]
     
     fieldsets = (
@@ -67,7 +162,8 @@ class EnrollmentAdmin(admin.ModelAdmin):
             'fields': ('worker', 'course', 'enrolled_date')
         }),
         ('Progress', {
-            'fields': ('status', 'progress_percentage', 'completed_date')
+            'fields': ('status', 'progress_percentage', 'completed_date',
+                       'completed_modules', 'completed_minutes', 'time_spent_minutes')
         }),
         ('Certification', {
             'fields': ('certificate_issued', 'certificate_file')
@@ -87,3 +183,44 @@ class CourseProgressAdmin(admin.ModelAdmin):
     list_filter = ['completed', 'completed_date']
     search_fields = ['enrollment__worker__employee_id', 'module__title']
     readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['course', 'position', 'worker', 'joined_at']
+    search_fields = ['worker__employee_id', 'worker__user__username', 'course__title']
+    readonly_fields = ['worker', 'course', 'position', 'joined_at']
+    list_select_related = ['course', 'worker__user']
+    
+    def has_add_permission(self, request):
+        # Positions are handed out by training.services.join_waitlist
+        return False
+    
+    def delete_model(self, request, obj):
+        remove_from_waitlist(obj.course_id, [obj.worker_id])
+    
+    def delete_queryset(self, request, queryset):
+        by_course = {}
+        for course_id, worker_id in queryset.values_list('course_id', 'worker_id'):
+            by_course.setdefault(course_id, []).append(worker_id)
+        for course_id, worker_ids in by_course.items():
+            remove_from_waitlist(course_id, worker_ids)
+
+
+@admin.register(CertificateJob)
+class CertificateJobAdmin(admin.ModelAdmin):
+    list_display = ['enrollment', 'status', 'attempts', 'run_after', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['enrollment__worker__employee_id', 'enrollment__worker__user__username', 'enrollment__course__title']
+    readonly_fields = ['enrollment', 'status', 'attempts', 'run_after', 'claimed_at', 'error', 'created_at', 'updated_at']
+    list_select_related = ['enrollment__worker__user', 'enrollment__course']
+    actions = ['retry_jobs']
+    
+    def has_add_permission(self, request):
+        # Jobs are queued when enrollments complete
+        return False
+    
+    @admin.action(description='Retry selected certificate jobs', permissions=['change'])
+    def retry_jobs(self, request, queryset):
+        retried = certificates.retry(queryset)
+        self.message_user(request, f'Queued {retried} certificate jobs again.', messages.SUCCESS)
@@ -0,0 +1,233 @@
+"""
+Course completion certificates.
+
+Completing an enrollment queues a CertificateJob (enqueue() is called from
+training.progress and training.signals); web requests never render. The
+process_certificates command claims due jobs in batches, renders their PDFs
+with Pillow on a process pool and records the files on the enrollments, so
+a whole cohort finishing at once is worked off BATCH_SIZE at a time.
+
+Jobs are idempotent: a certificate's file name is derived from its
+enrollment, so a retry overwrites instead of duplicating, and a job whose
+enrollment already has its certificate just completes. The name carries an
+HMAC of the enrollment so certificates cannot be found by counting through
+the media URLs. Failed jobs are retried with exponential backoff up to
+MAX_ATTEMPTS, and jobs claimed by a runner that died are reclaimed after
+CLAIM_TIMEOUT seconds; those that already used up their attempts fail.
+"""
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from PIL import Image, ImageDraw, ImageFont
+
+from core.cache import touch
+from workers.models import Worker
+from .models import CertificateJob, Enrollment
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 60
+CLAIM_TIMEOUT = 15 * 60
+
+# A4 landscape at 150 dpi
+PAGE_SIZE = (1754, 1240)
+RESOLUTION = 150
+FONTS = {
+    'regular': 'DejaVuSerif.ttf',
+    'bold': 'DejaVuSerif-Bold.ttf',
+}
+ISSUER = 'SkillDev Platform'
+
+
+def enqueue(enrollments, using=None):
+    """Queue a certificate for each completed enrollment in ``enrollments`` without one; returns how many"""
+    missing = enrollments.using(using).filter(status='completed', is_active=True, certificate_issued=False)
+    # Completing again after a certificate was withdrawn reuses the finished job
+    requeued = retry(CertificateJob.objects.using(using).filter(enrollment__in=missing.values('pk'), status='done'))
+    new = missing.exclude(
+        Exists(CertificateJob.objects.using(using).filter(enrollment=OuterRef('pk')))
+    ).values_list('pk', flat=True)
+    jobs = [CertificateJob(enrollment_id=pk) for pk in new]
+    # Concurrent completions of the same enrollment queue it once
+    CertificateJob.objects.using(using).bulk_create(jobs, ignore_conflicts=True)
+    return requeued + len(jobs)
+
+
+def claim(limit=BATCH_SIZE, using=None):
+    """Mark up to ``limit`` due jobs as running and return their ids.
+
+    One conditional UPDATE claims the jobs under a fresh token, so runners
+    working the queue side by side never claim the same job.
+    """
+    now = timezone.now()
+    stale = Q(status='running', claimed_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT))
+    jobs = CertificateJob.objects.using(using)
+    # A job whose every attempt took its runner down would otherwise be reclaimed forever
+    jobs.filter(stale, attempts__gte=MAX_ATTEMPTS).update(
+        status='failed', claim_token='', error='The runner stopped while rendering on every attempt.', updated_at=now,
+    )
+    due = Q(status='pending', run_after__lte=now) | (stale & Q(attempts__lt=MAX_ATTEMPTS))
+    token = uuid.uuid4().hex
+    candidates = jobs.filter(due).order_by('run_after', 'pk').values('pk')[:limit]
+    jobs.filter(due, pk__in=candidates).update(
+        status='running', claimed_at=now, claim_token=token, attempts=F('attempts') + 1, updated_at=now,
+    )
+    return list(jobs.filter(claim_token=token, status='running').values_list('pk', flat=True))
+
+
+def certificate_name(enrollment):
+    digest = salted_hmac('training.certificates.certificate_name', enrollment.pk).hexdigest()[:32]
+    return f'certificates/certificate-{enrollment.pk:08d}-{digest}.pdf'
+
+
+def certificate_data(enrollment):
+    """Everything render() needs, as plain values that can cross to a pool process"""
+    user = enrollment.worker.user
+    return {
+        'number': f'{enrollment.pk:08d}',
+        'name': user.get_full_name() or user.username,
+        'course': enrollment.course.title,
+        'hours': enrollment.course.duration_hours,
+        'completed': timezone.localtime(enrollment.completed_date or timezone.now()).strftime('%B %d, %Y'),
+    }
+
+
+def _font(style, size):
+    try:
+        return ImageFont.truetype(FONTS[style], size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def _wrap(draw, text, font, width):
+    lines, line = [], ''
+    for word in text.split():
+        candidate = f'{line} {word}'.strip()
+        if line and draw.textlength(candidate, font=font) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    return lines + [line] if line else lines
+
+
+def render(data):
+    """PDF bytes of the certificate described by certificate_data()"""
+    width, height = PAGE_SIZE
+    image = Image.new('RGB', PAGE_SIZE, 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([40, 40, width - 40, height - 40], outline='#1f3b73', width=12)
+    draw.rectangle([70, 70, width - 70, height - 70], outline='#c9a227', width=4)
+
+    y = 190
+    for text, style, size, colour, gap in (
+        ('CERTIFICATE OF COMPLETION', 'bold', 84, '#1f3b73', 130),
+        ('This certifies that', 'regular', 40, '#444444', 90),
+        (data['name'], 'bold', 72, '#111111', 120),
+        ('has successfully completed the course', 'regular', 40, '#444444', 90),
+    ):
+        font = _font(style, size)
+        draw.text((width / 2, y), text, font=font, fill=colour, anchor='mm')
+        y += gap
+
+    font = _font('bold', 56)
+    for line in _wrap(draw, data['course'], font, width - 400)[:3]:
+        draw.text((width / 2, y), line, font=font, fill='#1f3b73', anchor='mm')
+        y += 75
+
+    font = _font('regular', 32)
+    draw.text((width / 2, y + 40), f"{data['hours']} hours", font=font, fill='#444444', anchor='mm')
+    draw.text((260, height - 200), f"Completed {data['completed']}", font=font, fill='#444444', anchor='lm')
+    draw.text((width - 260, height - 200), ISSUER, font=_font('bold', 32), fill='#1f3b73', anchor='rm')
+    draw.text((width / 2, height - 120), f"Certificate no. {data['number']}", font=_font('regular', 24), fill='#888888', anchor='mm')
+
+    buffer = BytesIO()
+    image.save(buffer, 'PDF', resolution=RESOLUTION)
+    return buffer.getvalue()
+
+
+def render_safely(data):
+    """(pdf bytes, None) or (None, error); exceptions do not survive the trip back from a pool process"""
+    try:
+        return render(data), None
+    except Exception as exc:
+        return None, f'{type(exc).__name__}: {exc}'
+
+
+def process(job_ids, pool=None, using=None):
+    """Render and record the certificates of claimed ``job_ids``; returns (issued, failed).
+
+    ``pool`` is an executor to render on; without one rendering runs inline.
+    """
+    jobs = list(
+        CertificateJob.objects.using(using)
+        .filter(pk__in=job_ids)
+        .select_related('enrollment__worker__user', 'enrollment__course')
+    )
+    done, cancelled, todo = [], [], []
+    for job in jobs:
+        enrollment = job.enrollment
+        if enrollment.certificate_issued and enrollment.certificate_file:
+            done.append(job)
+        elif enrollment.status != 'completed' or not enrollment.is_active:
+            # Completing it again queues a new job
+            cancelled.append(job)
+        else:
+            todo.append(job)
+
+    payloads = [certificate_data(job.enrollment) for job in todo]
+    results = pool.map(render_safely, payloads) if pool is not None else map(render_safely, payloads)
+
+    issued, failed = [], []
+    now = timezone.now()
+    for job, (content, error) in zip(todo, results):
+        if error is None:
+            enrollment = job.enrollment
+            name = certificate_name(enrollment)
+            try:
+                # A retry replaces what an earlier attempt may have written
+                default_storage.delete(name)
+                enrollment.certificate_file.name = default_storage.save(name, ContentFile(content))
+            except Exception as exc:
+                # Storage trouble fails this job only; the rest of the batch is recorded
+                failed.append((job, f'{type(exc).__name__}: {exc}'))
+                continue
+            enrollment.certificate_issued = True
+            enrollment.updated_at = now
+            issued.append(enrollment)
+            done.append(job)
+        else:
+            failed.append((job, error))
+
+    with transaction.atomic(using=using):
+        Enrollment.objects.using(using).bulk_update(issued, ['certificate_file', 'certificate_issued', 'updated_at'])
+        CertificateJob.objects.using(using).filter(pk__in=[job.pk for job in done]).update(
+            status='done', claim_token='', error='', updated_at=now,
+        )
+        CertificateJob.objects.using(using).filter(pk__in=[job.pk for job in cancelled]).delete()
+        for job, error in failed:
+            retry = job.attempts < MAX_ATTEMPTS
+            CertificateJob.objects.using(using).filter(pk=job.pk).update(
+                status='pending' if retry else 'failed',
+                run_after=now + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1)),
+                claim_token='',
+                error=error,
+                updated_at=now,
+            )
+        # Worker pages list enrollments in fragments keyed on updated_at
+        touch(Worker, [enrollment.worker_id for enrollment in issued], using=using)
+    return len(issued), len(failed)
+
+
+def retry(jobs):
+    """Queue ``jobs`` (a queryset) again from scratch; returns how many"""
+    return jobs.exclude(status='running').update(
+        status='pending', attempts=0, run_after=timezone.now(), claim_token='', error='', updated_at=timezone.now(),
+    )
@@ -0,0 +1,64 @@
+"""
+Denormalized counters derived from enrollments.
+"""
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Course, Enrollment, WaitlistEntry
+
+
+def adjust_enrollment_count(course_id, delta, using=None):
+    """Atomically shift one course's active_enrollment_count by ``delta``"""
+    if course_id is None or not delta:
+        return
+    Course.objects.using(using).filter(pk=course_id).update(active_enrollment_count=F('active_enrollment_count') + delta)
+
+
+def recount_enrollments(course_ids=None, using=None):
+    """Recompute active_enrollment_count from Enrollment rows; returns the number of courses updated"""
+    active = (
+        Enrollment.objects.using(using)
+        .filter(course=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('course')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    courses = Course.objects.using(using).all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    return courses.update(active_enrollment_count=Coalesce(Subquery(active), 0))
+
+
+def recount_waitlists(course_ids=None, using=None):
+    """Recompute waitlist_count from WaitlistEntry rows and close gaps in their positions.
+
+    Returns the number of courses updated. Entries keep their order; ties
+    go to whoever joined first.
+    """
+    entries = WaitlistEntry.objects.using(using).order_by()
+    if course_ids is not None:
+        entries = entries.filter(course_id__in=course_ids)
+    gapped = (
+        entries.values('course')
+        .annotate(total=Count('pk'), distinct=Count('position', distinct=True), first=Min('position'), last=Max('position'))
+        .exclude(distinct=F('total'), first=1, last=F('total'))
+        .values_list('course', flat=True)
+    )
+    for course_id in list(gapped):
+        renumbered = list(entries.filter(course_id=course_id).order_by('position', 'joined_at', 'pk'))
+        for position, entry in enumerate(renumbered, start=1):
+            entry.position = position
+        WaitlistEntry.objects.using(using).bulk_update(renumbered, ['position'], batch_size=1000)
+
+    waiting = (
+        WaitlistEntry.objects.using(using)
+        .filter(course=OuterRef('pk'))
+        .order_by()
+        .values('course')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    courses = Course.objects.using(using).all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    return courses.update(waitlist_count=Coalesce(Subquery(waiting), 0))
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+import heapq
+
+# Scoring as training.related computed it when the table was added
+RELATED_LIMIT = 8
+SKILL_WEIGHT = 0.7
+DIFFICULTY_WEIGHT = 0.3
+DIFFICULTY_LEVELS = ['beginner', 'intermediate', 'advanced', 'expert']
+DIFFICULTY_RANK = {level: index for index, level in enumerate(DIFFICULTY_LEVELS)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def difficulty_similarity(a, b):
+    distance = abs(DIFFICULTY_RANK.get(a, 0) - DIFFICULTY_RANK.get(b, 0))
+    return 1.0 - distance / (len(DIFFICULTY_LEVELS) - 1)
+
+
+def backfill_related_courses(apps, schema_editor):
+    Course = apps.get_model('training', 'Course')
+    RelatedCourse = apps.get_model('training', 'RelatedCourse')
+    db = schema_editor.connection.alias
+    courses = dict(Course.objects.using(db).filter(is_active=True).values_list('pk', 'difficulty_level'))
+    links = (
+        Course.skills.through.objects.using(db)
+        .filter(course__is_active=True, skill__is_active=True)
+        .values_list('course_id', 'skill_id')
+    )
+    skills_by_course = defaultdict(set)
+    courses_by_skill = defaultdict(set)
+    for course_id, skill_id in links.iterator(chunk_size=5000):
+        skills_by_course[course_id].add(skill_id)
+        courses_by_skill[skill_id].add(course_id)
+
+    rows = []
+    for course_id, difficulty in courses.items():
+        skills = skills_by_course.get(course_id, set())
+        candidates = set()
+        for skill_id in skills:
+            candidates |= courses_by_skill[skill_id]
+        candidates.discard(course_id)
+        scores = []
+        for other in candidates:
+            score = (
+                SKILL_WEIGHT * jaccard(skills, skills_by_course[other])
+                + DIFFICULTY_WEIGHT * difficulty_similarity(difficulty, courses[other])
+            )
+            if score > 0:
+                scores.append((other, score))
+        best = heapq.nsmallest(RELATED_LIMIT, scores, key=lambda pair: (-pair[1], pair[0]))
+        rows.extend(
+            RelatedCourse(course_id=course_id, related_id=related_id, score=score, rank=rank)
+            for rank, (related_id, score) in enumerate(best, start=1)
+        )
+    RelatedCourse.objects.using(db).all().delete()
+    RelatedCourse.objects.using(db).bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0002_course_image_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedCourse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='training.course')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='training.course')),
+            ],
+            options={
+                'ordering': ['course', 'rank'],
+                'indexes': [models.Index(fields=['course', 'rank'], name='training_related_rank_idx')],
+                'unique_together': {('course', 'related')},
+            },
+        ),
+        migrations.RunPython(backfill_related_courses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_enrollment_counts(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Course = apps.get_model('training', 'Course')
+    Enrollment = apps.get_model('training', 'Enrollment')
+    active = (
+        Enrollment.objects.using(db)
+        .filter(course=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('course')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Course.objects.using(db).update(active_enrollment_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0003_related_course'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='active_enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Active enrollments, maintained from Enrollment changes'),
+        ),
+        migrations.RunPython(backfill_enrollment_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0006_department_facet'),
+        ('training', '0004_course_active_enrollment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='training.course')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_recommendations', to='workers.worker')),
+            ],
+            options={
+                'ordering': ['worker', 'rank'],
+                'indexes': [models.Index(fields=['worker', 'rank'], name='training_recommend_rank_idx')],
+                'unique_together': {('worker', 'course')},
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_progress_totals(apps, schema_editor):
+    # Totals only: statuses and percentages edited by hand are left to rebuild_progress
+    db = schema_editor.connection.alias
+    Course = apps.get_model('training', 'Course')
+    CourseModule = apps.get_model('training', 'CourseModule')
+    Enrollment = apps.get_model('training', 'Enrollment')
+    CourseProgress = apps.get_model('training', 'CourseProgress')
+
+    module_minutes = (
+        CourseModule.objects.using(db)
+        .filter(course=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('course')
+        .annotate(total=Sum('duration_minutes'))
+        .values('total')
+    )
+    Course.objects.using(db).update(total_module_minutes=Coalesce(Subquery(module_minutes), 0))
+
+    progress = CourseProgress.objects.using(db).filter(enrollment=OuterRef('pk'), is_active=True).order_by().values('enrollment')
+    completed = progress.filter(completed=True, module__is_active=True)
+    Enrollment.objects.using(db).update(
+        completed_modules=Coalesce(Subquery(completed.annotate(total=Count('pk')).values('total')), 0),
+        completed_minutes=Coalesce(Subquery(completed.annotate(total=Sum('module__duration_minutes')).values('total')), 0),
+        time_spent_minutes=Coalesce(Subquery(progress.annotate(total=Sum('time_spent_minutes')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0005_course_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='total_module_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Duration of all active modules, maintained by training.progress'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Duration of the completed modules'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_modules',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='time_spent_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_progress_totals, migrations.RunPython.noop),
+    ]
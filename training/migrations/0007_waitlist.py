@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0006_department_facet'),
+        ('training', '0006_progress_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='waitlist_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Workers on the waitlist, maintained by training.services'),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(help_text='1 for the next worker to get a seat')),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='training.course')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='workers.worker')),
+            ],
+            options={
+                'verbose_name_plural': 'waitlist entries',
+                'ordering': ['course', 'position'],
+                'indexes': [models.Index(fields=['course', 'position'], name='training_waitlist_pos_idx')],
+                'unique_together': {('worker', 'course')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0007_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Not claimed before this time; pushed back after failures')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('claim_token', models.CharField(blank=True, editable=False, max_length=32)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('enrollment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='certificate_job', to='training.enrollment')),
+            ],
+            options={
+                'ordering': ['run_after', 'pk'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='training_certjob_due_idx'), models.Index(fields=['claim_token'], name='training_certjob_claim_idx')],
+            },
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from core.models import BaseModel
 from skills.models import Skill
 from workers.models import Worker
@@ -13,6 +14,7 @@ class Course(BaseModel):
     description = models.TextField()
     instructor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='taught_courses')
     image = models.ImageField(upload_to='courses/', blank=True, null=True)
+    image_variants = models.CharField(max_length=100, blank=True, editable=False, help_text="Image whose resized variants exist, maintained by core.images")
     image_url = models.URLField(blank=True, null=True, help_text="External image URL as fallback")
     skills = models.ManyToManyField(Skill, related_name='courses', blank=True)
     duration_hours = models.PositiveIntegerField(help_text="Course duration in hours")
@@ -30,6 +32,11 @@ class Course(BaseModel):
     )
     start_date = models.DateTimeField(blank=True, null=True)
     end_date = models.DateTimeField(blank=True, null=True)
+    active_enrollment_count = models.PositiveIntegerField(default=0, editable=False, help_text="Active enrollments, maintained from Enrollment changes")
+    total_module_minutes = models.PositiveIntegerField(default=0, editable=False, help_text="Duration of all active modules, maintained by training.progress")
+    waitlist_count = models.PositiveIntegerField(default=0, editable=False, help_text="Workers on the waitlist, maintained by training.services")
+    
+    maintained_fields = ['active_enrollment_count', 'total_module_minutes', 'waitlist_count', 'image_variants']
     
     class Meta:
         ordering = ['-created_at']
@@ -42,7 +49,7 @@ class Course(BaseModel):
     
     @property
     def enrolled_count(self):
-        return self.enrollments.filter(is_active=True).count()
+        return self.active_enrollment_count
     
     @property
     def available_spots(self):
@@ -69,6 +76,21 @@ class CourseModule(BaseModel):
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets signal handlers shift the course's total minutes by the change
+        instance._loaded_module = (
+            instance.__dict__.get('course_id'),
+            instance.__dict__.get('duration_minutes'),
+            instance.__dict__.get('is_active'),
+        )
+        return instance
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_module = (self.course_id, self.duration_minutes, self.is_active)
 
 
 class Enrollment(BaseModel):
@@ -91,6 +113,9 @@ class Enrollment(BaseModel):
         default=0,
         validators=[MinValueValidator(0), MaxValueValidator(100)]
     )
+    completed_modules = models.PositiveIntegerField(default=0, editable=False)
+    completed_minutes = models.PositiveIntegerField(default=0, editable=False, help_text="Duration of the completed modules")
+    time_spent_minutes = models.PositiveIntegerField(default=0, editable=False)
     certificate_issued = models.BooleanField(default=False)
     certificate_file = models.FileField(upload_to='certificates/', blank=True, null=True)
     rating = models.PositiveIntegerField(
@@ -101,12 +126,22 @@ class Enrollment(BaseModel):
     )
     review = models.TextField(blank=True)
     
+    maintained_fields = ['completed_modules', 'completed_minutes', 'time_spent_minutes']
+    
     class Meta:
         unique_together = ['worker', 'course']
         ordering = ['-enrolled_date']
     
     def __str__(self):
         return f"{self.worker} - {self.course}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so signal handlers can apply counter deltas
+        instance._loaded_course_id = instance.__dict__.get('course_id')
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
 
 
 class CourseProgress(BaseModel):
@@ -123,3 +158,101 @@ class CourseProgress(BaseModel):
     
     def __str__(self):
         return f"{self.enrollment} - {self.module.title}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets signal handlers apply the change to the enrollment's totals
+        instance._loaded_progress = (
+            instance.__dict__.get('enrollment_id'),
+            instance.__dict__.get('module_id'),
+            instance.__dict__.get('completed'),
+            instance.__dict__.get('is_active'),
+            instance.__dict__.get('time_spent_minutes'),
+        )
+        return instance
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_progress = (self.enrollment_id, self.module_id, self.completed, self.is_active, self.time_spent_minutes)
+
+
+class RelatedCourse(models.Model):
+    """Precomputed nearest neighbours of a course, maintained by training.related"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ['course', 'related']
+        ordering = ['course', 'rank']
+        indexes = [models.Index(fields=['course', 'rank'], name='training_related_rank_idx')]
+    
+    def __str__(self):
+        return f"{self.course} ~ {self.related} ({self.score:.2f})"
+
+
+class CourseRecommendation(models.Model):
+    """Precomputed best courses for a worker, maintained by training.recommendations"""
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='course_recommendations')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ['worker', 'course']
+        ordering = ['worker', 'rank']
+        indexes = [models.Index(fields=['worker', 'rank'], name='training_recommend_rank_idx')]
+    
+    def __str__(self):
+        return f"{self.worker} -> {self.course} ({self.score:.2f})"
+
+
+class WaitlistEntry(models.Model):
+    """A worker queued for a seat in a full course, maintained by training.services"""
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='waitlist_entries')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='waitlist_entries')
+    position = models.PositiveIntegerField(help_text="1 for the next worker to get a seat")
+    joined_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['worker', 'course']
+        ordering = ['course', 'position']
+        indexes = [models.Index(fields=['course', 'position'], name='training_waitlist_pos_idx')]
+        verbose_name_plural = 'waitlist entries'
+    
+    def __str__(self):
+        return f"{self.worker} waiting for {self.course} (#{self.position})"
+
+
+class CertificateJob(models.Model):
+    """A certificate waiting to be rendered for a completed enrollment, processed by training.certificates"""
+    enrollment = models.OneToOneField(Enrollment, on_delete=models.CASCADE, related_name='certificate_job')
+    status = models.CharField(
+        max_length=10,
+        choices=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        default='pending'
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Not claimed before this time; pushed back after failures")
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    claim_token = models.CharField(max_length=32, blank=True, editable=False)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['run_after', 'pk']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='training_certjob_due_idx'),
+            models.Index(fields=['claim_token'], name='training_certjob_claim_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Certificate for {self.enrollment} ({self.status})"
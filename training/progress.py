@@ -0,0 +1,208 @@
+"""
+Enrollment progress derived from CourseProgress.
+
+Each enrollment keeps running totals: modules completed, the minutes those
+modules are worth, and the time spent. Each course keeps the minutes of its
+active modules. A CourseProgress change moves one enrollment's totals by
+its delta in a single UPDATE, whatever the course size. The same statement
+re-derives the enrollment's state:
+
+* progress_percentage is completed minutes over course minutes, so long
+  modules weigh more;
+* status moves between enrolled, in_progress and completed;
+* completed_date is set on completion;
+* certificate_issued is withdrawn when an enrollment stops being complete.
+
+Dropped enrollments keep their status. Module edits shift the course total
+and re-derive that course's enrollments in one statement. Courses without
+timed modules are left as edited by hand. Enrollments that reach completed
+get a certificate queued (see training.certificates).
+
+The totals start from recount(); rebuild() also re-derives every
+percentage and status, for backfills.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Least
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual, LessThanOrEqual
+from django.utils import timezone
+
+from workers.models import Worker
+from . import certificates
+from .models import Course, CourseModule, CourseProgress, Enrollment
+
+
+def progress_state(progress):
+    """The fields of a CourseProgress row that its contribution depends on"""
+    return (progress.enrollment_id, progress.module_id, progress.completed, progress.is_active, progress.time_spent_minutes)
+
+
+def module_state(module):
+    return (module.course_id, module.duration_minutes, module.is_active)
+
+
+def derived_fields(completed_modules, completed_minutes, time_spent):
+    """Update expressions deriving progress_percentage, status, completed_date and certificate_issued from the totals"""
+    total = Subquery(Course.objects.filter(pk=OuterRef('course_id')).values('total_module_minutes')[:1])
+    untimed = LessThanOrEqual(total, 0)
+    finished = GreaterThanOrEqual(completed_minutes, total)
+    started = GreaterThan(completed_modules, 0) | GreaterThan(time_spent, 0)
+    return {
+        'progress_percentage': Case(
+            When(untimed, then=F('progress_percentage')),
+            default=Least(Value(100), completed_minutes * 100 / total),
+            output_field=IntegerField(),
+        ),
+        'status': Case(
+            When(status='dropped', then=F('status')),
+            When(untimed, then=F('status')),
+            When(finished, then=Value('completed')),
+            When(started, then=Value('in_progress')),
+            default=Value('enrolled'),
+        ),
+        'completed_date': Case(
+            When(status='dropped', then=F('completed_date')),
+            When(untimed, then=F('completed_date')),
+            When(finished, then=Coalesce(F('completed_date'), Value(timezone.now()))),
+            default=Value(None),
+        ),
+        'certificate_issued': Case(
+            When(status='dropped', then=F('certificate_issued')),
+            When(untimed, then=F('certificate_issued')),
+            When(finished, then=F('certificate_issued')),
+            default=Value(False),
+        ),
+    }
+
+
+def record(enrollment_id, modules=0, minutes=0, time_spent=0, using=None):
+    """Shift one enrollment's totals and re-derive its progress, in one UPDATE"""
+    if enrollment_id is None or not (modules or minutes or time_spent):
+        return
+    completed_modules = F('completed_modules') + modules
+    completed_minutes = F('completed_minutes') + minutes
+    time_spent_minutes = F('time_spent_minutes') + time_spent
+    now = timezone.now()
+    Enrollment.objects.using(using).filter(pk=enrollment_id).update(
+        completed_modules=completed_modules,
+        completed_minutes=completed_minutes,
+        time_spent_minutes=time_spent_minutes,
+        updated_at=now,
+        **derived_fields(completed_modules, completed_minutes, time_spent_minutes),
+    )
+    # Worker pages show enrollment progress in a fragment keyed on updated_at
+    Worker.objects.using(using).filter(enrollments=enrollment_id).update(updated_at=now)
+    if modules > 0 or minutes > 0:
+        # Only progress forward can complete an enrollment
+        certificates.enqueue(Enrollment.objects.filter(pk=enrollment_id), using=using)
+
+
+def _module_weights(module_ids, using=None):
+    """{module_id: minutes} of the active modules among ``module_ids``"""
+    return dict(
+        CourseModule.objects.using(using)
+        .filter(pk__in=module_ids, is_active=True)
+        .values_list('pk', 'duration_minutes')
+    )
+
+
+def progress_changed(old, new, using=None):
+    """Apply a CourseProgress change; ``old`` and ``new`` are progress_state() tuples or None"""
+    states = [state for state in (old, new) if state is not None]
+    minutes = _module_weights({state[1] for state in states if state[2] and state[3]}, using=using)
+
+    totals = defaultdict(lambda: [0, 0, 0])
+    for sign, state in ((-1, old), (1, new)):
+        if state is None:
+            continue
+        enrollment_id, module_id, completed, is_active, time_spent = state
+        if not is_active:
+            continue
+        counted = completed and module_id in minutes
+        totals[enrollment_id][0] += sign * int(counted)
+        totals[enrollment_id][1] += sign * (minutes[module_id] if counted else 0)
+        totals[enrollment_id][2] += sign * (time_spent or 0)
+    for enrollment_id, (modules, module_minutes, time_spent) in totals.items():
+        record(enrollment_id, modules, module_minutes, time_spent, using=using)
+
+
+def refresh_courses(course_ids, using=None):
+    """Re-derive the progress of every enrollment in ``course_ids`` from its stored totals"""
+    enrollments = Enrollment.objects.using(using).filter(course_id__in=course_ids, course__total_module_minutes__gt=0)
+    now = timezone.now()
+    enrollments.update(
+        updated_at=now,
+        **derived_fields(F('completed_modules'), F('completed_minutes'), F('time_spent_minutes')),
+    )
+    Worker.objects.using(using).filter(pk__in=enrollments.values('worker_id')).update(updated_at=now)
+    certificates.enqueue(enrollments, using=using)
+
+
+def module_changed(module_id, old, new, using=None):
+    """Apply a CourseModule change; ``old`` and ``new`` are module_state() tuples or None"""
+    def weight(state):
+        if state is None or not state[2]:
+            return 0, 0
+        return 1, state[1] or 0
+
+    (old_modules, old_minutes), (new_modules, new_minutes) = weight(old), weight(new)
+    courses = defaultdict(int)
+    if old is not None:
+        courses[old[0]] -= old_minutes
+    if new is not None:
+        courses[new[0]] += new_minutes
+    if (old_modules, old_minutes) == (new_modules, new_minutes) and len(courses) == 1:
+        return
+
+    with transaction.atomic(using=using):
+        for course_id, delta in courses.items():
+            if delta:
+                Course.objects.using(using).filter(pk=course_id).update(
+                    total_module_minutes=F('total_module_minutes') + delta
+                )
+        if (old_modules, old_minutes) != (new_modules, new_minutes):
+            completers = CourseProgress.objects.using(using).filter(module_id=module_id, completed=True, is_active=True)
+            Enrollment.objects.using(using).filter(pk__in=completers.values('enrollment_id')).update(
+                completed_modules=F('completed_modules') + new_modules - old_modules,
+                completed_minutes=F('completed_minutes') + new_minutes - old_minutes,
+            )
+        refresh_courses(courses.keys(), using=using)
+
+
+def recount(course_ids=None, using=None):
+    """Recompute course minutes and enrollment totals from their rows; returns the enrollments updated"""
+    courses = Course.objects.using(using).all()
+    enrollments = Enrollment.objects.using(using).all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+        enrollments = enrollments.filter(course_id__in=course_ids)
+
+    module_minutes = (
+        CourseModule.objects.using(using)
+        .filter(course=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('course')
+        .annotate(total=Sum('duration_minutes'))
+        .values('total')
+    )
+    courses.update(total_module_minutes=Coalesce(Subquery(module_minutes), 0))
+
+    progress = CourseProgress.objects.using(using).filter(enrollment=OuterRef('pk'), is_active=True).order_by().values('enrollment')
+    completed = progress.filter(completed=True, module__is_active=True)
+    return enrollments.update(
+        completed_modules=Coalesce(Subquery(completed.annotate(total=Count('pk')).values('total')), 0),
+        completed_minutes=Coalesce(Subquery(completed.annotate(total=Sum('module__duration_minutes')).values('total')), 0),
+        time_spent_minutes=Coalesce(Subquery(progress.annotate(total=Sum('time_spent_minutes')).values('total')), 0),
+    )
+
+
+def rebuild(course_ids=None, using=None):
+    """Recount every total and re-derive percentages and statuses; returns the enrollments updated"""
+    with transaction.atomic(using=using):
+        updated = recount(course_ids, using=using)
+        if course_ids is None:
+            course_ids = Course.objects.using(using).values('pk')
+        refresh_courses(course_ids, using=using)
+    return updated
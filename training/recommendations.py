@@ -0,0 +1,343 @@
+"""
+Personalized course recommendations.
+
+A course's score for a worker is a weighted sum of:
+
+* coverage   - the mean need over the course's skills: high for skills the
+               worker lacks or holds at a low level, plus a bonus where the
+               worker falls short of a SkillGapTarget for their department
+               and position;
+* readiness  - the share of the course skills' direct prerequisites the
+               worker already holds;
+* difficulty - how close the course level is to one step above the worker's
+               level in its skills;
+* popularity - active enrollments, log-scaled against the busiest course;
+* capacity   - the share of seats still free. Full courses are skipped.
+
+Scoring every worker against every course would be 10^9 pairs at 100k x 10k,
+and a popular skill alone can touch thousands of courses. Instead, courses
+are split by how many of a worker's skills (held or targeted) they involve:
+
+* none: every worker-dependent term has its default value, so the score is
+  a per-course baseline and the catalog is walked in that order;
+* one: the score depends on that skill's level alone, so each
+  (skill, level, target) combination keeps its courses sorted by score,
+  memoized in the catalog, and the worker takes the head of each list;
+* two or more: found through an index of skill pairs and scored exactly.
+
+The result is exact, and each worker costs roughly the number of skill
+pairs they hold plus RECOMMENDATION_LIMIT per skill, whatever the catalog
+size. The batch job streams workers in keyset chunks, so memory stays at
+the catalog plus one chunk.
+"""
+import heapq
+import math
+import threading
+from collections import defaultdict
+from itertools import combinations
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+
+from core.similarity import DIFFICULTY_LEVELS, DIFFICULTY_RANK
+from core.tasks import submit
+from skills.graph import load_edges
+from workers.models import SkillGapTarget, Worker, WorkerSkill
+from workers.talent import LEVEL_RANK
+from .models import Course, CourseRecommendation, Enrollment
+
+RECOMMENDATION_LIMIT = 10
+CHUNK_SIZE = 2000
+
+COVERAGE_WEIGHT = 0.45
+READINESS_WEIGHT = 0.2
+DIFFICULTY_WEIGHT = 0.15
+POPULARITY_WEIGHT = 0.1
+CAPACITY_WEIGHT = 0.1
+
+# Need for a course skill by the worker's proficiency rank in it
+HELD_NEED = [0.45, 0.3, 0.15, 0.0]
+MISSING_NEED = 0.6
+TARGET_BONUS = 0.4
+
+HIGHEST_DIFFICULTY = len(DIFFICULTY_LEVELS) - 1
+
+# A worker without stored recommendations gets them computed at most this often
+ON_DEMAND_INTERVAL = 60 * 60
+
+# Workers waiting for on-demand recommendations, refreshed together on one catalog
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class Catalog:
+    """Scoring features of every open course, indexed by the skills that touch it"""
+
+    def __init__(self, courses, skills_by_course, edges, targets):
+        """``courses`` yields (pk, difficulty_level, capacity, active_enrollment_count)"""
+        courses = [row for row in courses if row[0] in skills_by_course]
+        busiest = max((enrolled for _, _, _, enrolled in courses), default=0)
+        self.skills = {}
+        self.prerequisites = {}
+        self.difficulty = {}
+        self.static = {}
+        self.by_skill = defaultdict(list)
+        self.by_prerequisite = defaultdict(list)
+        self.by_pair = defaultdict(list)
+        for course_id, difficulty, capacity, enrolled in courses:
+            skills = skills_by_course[course_id]
+            prerequisites = set().union(*(edges.get(skill_id, ()) for skill_id in skills)) - skills
+            self.skills[course_id] = tuple(skills)
+            self.prerequisites[course_id] = frozenset(prerequisites)
+            self.difficulty[course_id] = DIFFICULTY_RANK.get(difficulty, 0)
+            popularity = math.log1p(enrolled) / math.log1p(busiest) if busiest else 0.0
+            self.static[course_id] = POPULARITY_WEIGHT * popularity + CAPACITY_WEIGHT * (capacity - enrolled) / capacity
+            for skill_id in skills:
+                self.by_skill[skill_id].append(course_id)
+            for skill_id in prerequisites:
+                self.by_prerequisite[skill_id].append(course_id)
+            for pair in combinations(sorted(skills | prerequisites), 2):
+                self.by_pair[pair].append(course_id)
+
+        self.targets = targets
+        self._targets_by_group = {}
+        self._single = {}
+        # What every course scores for a worker none of whose skills touch it
+        self.baseline = {course_id: self.score(course_id, {}, {}) for course_id in self.skills}
+        self.ranked = sorted(self.baseline, key=lambda course_id: (-self.baseline[course_id], course_id))
+
+    @classmethod
+    def load(cls, using=None):
+        """The catalog of active courses with free seats, in four queries"""
+        courses = (
+            Course.objects.using(using)
+            .filter(is_active=True, active_enrollment_count__lt=F('capacity'))
+            .values_list('pk', 'difficulty_level', 'capacity', 'active_enrollment_count')
+        )
+        skill_links = (
+            Course.skills.through.objects.using(using)
+            .filter(course__is_active=True, skill__is_active=True)
+            .values_list('course_id', 'skill_id')
+        )
+        skills_by_course = defaultdict(set)
+        for course_id, skill_id in skill_links.iterator(chunk_size=5000):
+            skills_by_course[course_id].add(skill_id)
+        targets = (
+            SkillGapTarget.objects.using(using)
+            .filter(is_active=True)
+            .values_list('department', 'position', 'skill_id', 'minimum_level')
+        )
+        return cls(list(courses), skills_by_course, load_edges(using=using), list(targets))
+
+    def targets_for(self, department, position):
+        """{skill_id: minimum rank} the SkillGapTargets set for a department and position"""
+        key = (department, position)
+        if key not in self._targets_by_group:
+            minimums = {}
+            for target_department, target_position, skill_id, level in self.targets:
+                if target_department not in ('', department) or target_position not in ('', position):
+                    continue
+                if level in LEVEL_RANK:
+                    minimums[skill_id] = max(minimums.get(skill_id, 0), LEVEL_RANK[level])
+            self._targets_by_group[key] = minimums
+        return self._targets_by_group[key]
+
+    def score(self, course_id, held, targets):
+        """Score of one course for a worker holding ``held`` ({skill_id: rank}); 0 if it teaches nothing new"""
+        skills = self.skills[course_id]
+        need = level = 0.0
+        for skill_id in skills:
+            rank = held.get(skill_id)
+            if rank is None:
+                need += MISSING_NEED
+            else:
+                need += HELD_NEED[rank]
+                level += rank + 1
+            minimum = targets.get(skill_id)
+            if minimum is not None and (rank is None or rank < minimum):
+                need += TARGET_BONUS
+        if not need:
+            return 0.0
+        prerequisites = self.prerequisites[course_id]
+        readiness = sum(1 for skill_id in prerequisites if skill_id in held) / len(prerequisites) if prerequisites else 1.0
+        wanted = min(level / len(skills), HIGHEST_DIFFICULTY)
+        difficulty = 1.0 - abs(self.difficulty[course_id] - wanted) / HIGHEST_DIFFICULTY
+        return (
+            COVERAGE_WEIGHT * need / len(skills)
+            + READINESS_WEIGHT * readiness
+            + DIFFICULTY_WEIGHT * difficulty
+            + self.static[course_id]
+        )
+
+    def touches(self, course_id, held, targets):
+        """Whether the worker's skills or targets change ``course_id``'s score from its baseline"""
+        return (
+            any(skill_id in held or skill_id in targets for skill_id in self.skills[course_id])
+            or any(skill_id in held for skill_id in self.prerequisites[course_id])
+        )
+
+    def single(self, skill_id, rank, minimum):
+        """[(score, course_id)] best first, for a worker whose only relevant skill is ``skill_id``.
+
+        ``rank`` is the worker's level in it (None if not held) and
+        ``minimum`` their target level (None without a target).
+        """
+        key = (skill_id, rank, minimum)
+        if key not in self._single:
+            held = {} if rank is None else {skill_id: rank}
+            targets = {} if minimum is None else {skill_id: minimum}
+            courses = set(self.by_skill.get(skill_id, ()))
+            if rank is not None:
+                courses.update(self.by_prerequisite.get(skill_id, ()))
+            self._single[key] = sorted(
+                ((self.score(course_id, held, targets), course_id) for course_id in courses),
+                key=lambda pair: (-pair[0], pair[1]),
+            )
+        return self._single[key]
+
+    def recommend(self, held, targets=None, exclude=(), limit=RECOMMENDATION_LIMIT):
+        """Best ``limit`` (course_id, score) pairs for one worker, skipping ``exclude``"""
+        targets = targets or {}
+        relevant = sorted(held.keys() | targets.keys())
+        # Courses involving two or more relevant skills get scored exactly
+        multiple = set()
+        for pair in combinations(relevant, 2):
+            multiple.update(self.by_pair.get(pair, ()))
+        multiple.difference_update(exclude)
+        candidates = [(self.score(course_id, held, targets), course_id) for course_id in multiple]
+
+        for skill_id in relevant:
+            # Prerequisites only count when held, so a target-only skill touches its own courses
+            taken = 0
+            for score, course_id in self.single(skill_id, held.get(skill_id), targets.get(skill_id)):
+                if taken == limit:
+                    break
+                if course_id not in multiple and course_id not in exclude:
+                    candidates.append((score, course_id))
+                    taken += 1
+
+        taken = 0
+        for course_id in self.ranked:
+            if taken == limit:
+                break
+            if course_id not in exclude and not self.touches(course_id, held, targets):
+                candidates.append((self.baseline[course_id], course_id))
+                taken += 1
+
+        best = heapq.nsmallest(limit, candidates, key=lambda pair: (-pair[0], pair[1]))
+        return [(course_id, score) for score, course_id in best if score > 0]
+
+
+def compute_recommendations(catalog, workers, limit=RECOMMENDATION_LIMIT, using=None):
+    """{worker_id: [(course_id, score), ...]} for the active workers in the ``workers`` queryset"""
+    workers = workers.filter(is_active=True)
+    worker_ids = workers.values('pk')
+    held = defaultdict(dict)
+    rows = (
+        WorkerSkill.objects.using(using)
+        .filter(worker__in=worker_ids, is_active=True)
+        .values_list('worker_id', 'skill_id', 'proficiency_level')
+    )
+    for worker_id, skill_id, level in rows:
+        if level in LEVEL_RANK:
+            held[worker_id][skill_id] = LEVEL_RANK[level]
+    # Courses a worker is in, finished or dropped are not suggested again
+    enrolled = defaultdict(set)
+    for worker_id, course_id in Enrollment.objects.using(using).filter(worker__in=worker_ids).values_list('worker_id', 'course_id'):
+        enrolled[worker_id].add(course_id)
+    return {
+        worker_id: catalog.recommend(held[worker_id], catalog.targets_for(department, position), enrolled[worker_id], limit)
+        for worker_id, department, position in workers.values_list('pk', 'department', 'position')
+    }
+
+
+def store(results, stored):
+    """Replace the recommendations in the ``stored`` queryset with ``results``"""
+    with transaction.atomic(using=stored.db):
+        stored.delete()
+        CourseRecommendation.objects.using(stored.db).bulk_create(
+            (
+                CourseRecommendation(worker_id=worker_id, course_id=course_id, score=score, rank=rank)
+                for worker_id, courses in results.items()
+                for rank, (course_id, score) in enumerate(courses, start=1)
+            ),
+            batch_size=5000,
+        )
+
+
+def refresh_all(chunk_size=CHUNK_SIZE, limit=RECOMMENDATION_LIMIT, progress=None, using=None):
+    """Recompute every active worker's recommendations; returns the number of workers processed.
+
+    Workers are processed in pk order, ``chunk_size`` at a time, each chunk
+    committed on its own. ``progress`` is called with the running total.
+    """
+    catalog = Catalog.load(using=using)
+    workers = Worker.objects.using(using)
+    recommendations = CourseRecommendation.objects.using(using)
+    processed = last = 0
+    while True:
+        ids = list(
+            workers.filter(is_active=True, pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        results = compute_recommendations(catalog, workers.filter(pk__gt=last, pk__lte=ids[-1]), limit, using=using)
+        # The range also clears what inactive workers in it had stored
+        store(results, recommendations.filter(worker_id__gt=last, worker_id__lte=ids[-1]))
+        last = ids[-1]
+        processed += len(ids)
+        if progress:
+            progress(processed)
+    recommendations.filter(worker_id__gt=last).delete()
+    return processed
+
+
+def refresh(worker_ids, limit=RECOMMENDATION_LIMIT, using=None):
+    """Recompute the recommendations of a few workers"""
+    worker_ids = set(worker_ids)
+    if not worker_ids:
+        return
+    catalog = Catalog.load(using=using)
+    results = compute_recommendations(catalog, Worker.objects.using(using).filter(pk__in=worker_ids), limit, using=using)
+    store(results, CourseRecommendation.objects.using(using).filter(worker_id__in=worker_ids))
+
+
+def _refresh_pending():
+    """Refresh every worker queued by recommended_courses() since the last run"""
+    with _pending_lock:
+        worker_ids = set(_pending)
+        _pending.clear()
+    refresh(worker_ids)
+
+
+def _queue_refresh(worker_id):
+    """Queue ``worker_id`` for the next on-demand refresh, submitting one if none is waiting.
+
+    Workers that arrive while a refresh is queued join it, so a burst of new
+    workers loads the catalog once instead of once each.
+    """
+    with _pending_lock:
+        idle = not _pending
+        _pending.add(worker_id)
+    if idle:
+        submit(_refresh_pending)
+
+
+def recommended_courses(worker, limit=4):
+    """The stored recommendations ``worker`` can still enroll in, best first.
+
+    Workers with none stored yet (new since the last batch run) get theirs
+    computed on the background pool, batched with other new workers.
+    """
+    entries = list(
+        CourseRecommendation.objects
+        .filter(worker=worker, course__is_active=True, course__active_enrollment_count__lt=F('course__capacity'))
+        .exclude(Exists(Enrollment.objects.filter(worker=worker, course=OuterRef('course_id'))))
+        .select_related('course')
+        .order_by('rank')[:limit]
+    )
+    if not entries and cache.add(f'recommendations:on_demand:{worker.pk}', True, ON_DEMAND_INTERVAL):
+        if not CourseRecommendation.objects.filter(worker=worker).exists():
+            _queue_refresh(worker.pk)
+    return [entry.course for entry in entries]
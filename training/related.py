@@ -0,0 +1,85 @@
+"""
+Related-course similarity job.
+
+Two courses are similar when they cover the same skills (Jaccard over their
+skill sets) at close difficulty levels. The top RELATED_LIMIT neighbours of
+every active course are materialized in RelatedCourse so the detail page
+reads them with one indexed lookup instead of a join + DISTINCT.
+"""
+from collections import defaultdict
+
+from core.similarity import NeighbourTable, difficulty_similarity, jaccard, top_k
+from .models import Course, RelatedCourse
+
+RELATED_LIMIT = 8
+
+SKILL_WEIGHT = 0.7
+DIFFICULTY_WEIGHT = 0.3
+
+
+def load_features(course_ids=None, using=None):
+    """Feature tables for compute_related_courses(): ({course_id: difficulty}, {course_id: skill ids}).
+
+    With ``course_ids`` only those courses and every course sharing a skill
+    with them are loaded.
+    """
+    active = Course.objects.using(using).filter(is_active=True)
+    links = Course.skills.through.objects.using(using).filter(course__is_active=True, skill__is_active=True)
+    if course_ids is not None:
+        skills = links.filter(course_id__in=course_ids).values('skill_id')
+        wanted = set(course_ids) | set(links.filter(skill_id__in=skills).values_list('course_id', flat=True))
+        active = active.filter(pk__in=wanted)
+        links = links.filter(course_id__in=wanted)
+    courses = dict(active.values_list('pk', 'difficulty_level'))
+    skills_by_course = defaultdict(set)
+    for course_id, skill_id in links.values_list('course_id', 'skill_id').iterator(chunk_size=5000):
+        skills_by_course[course_id].add(skill_id)
+    return courses, skills_by_course
+
+
+def compute_related_courses(courses, skills_by_course, course_ids=None, limit=RELATED_LIMIT):
+    """Return {course_id: [(related_id, score), ...]} best first; candidates share a skill"""
+    courses_by_skill = defaultdict(set)
+    for course_id, skill_ids in skills_by_course.items():
+        for skill_id in skill_ids:
+            courses_by_skill[skill_id].add(course_id)
+
+    results = {}
+    for course_id in (courses if course_ids is None else [pk for pk in course_ids if pk in courses]):
+        skills = skills_by_course.get(course_id, set())
+        candidates = set()
+        for skill_id in skills:
+            candidates |= courses_by_skill[skill_id]
+        candidates.discard(course_id)
+
+        scores = {
+            other: SKILL_WEIGHT * jaccard(skills, skills_by_course[other])
+            + DIFFICULTY_WEIGHT * difficulty_similarity(courses[course_id], courses[other])
+            for other in candidates
+        }
+        results[course_id] = top_k(scores, limit)
+    return results
+
+
+NEIGHBOURS = NeighbourTable(RelatedCourse, 'course', load_features, compute_related_courses)
+
+
+def refresh_all(using=None):
+    """Recompute every course's neighbours; returns the number of courses processed"""
+    return NEIGHBOURS.refresh_all(using=using)
+
+
+def refresh(course_ids, using=None):
+    """Recompute the neighbours of ``course_ids`` and of the courses around them"""
+    NEIGHBOURS.refresh(course_ids, using=using)
+
+
+def related_courses(course, limit=4):
+    """The stored nearest neighbours of ``course``, best first"""
+    entries = (
+        RelatedCourse.objects
+        .filter(course=course, related__is_active=True)
+        .select_related('related')
+        .order_by('rank')[:limit]
+    )
+    return [entry.related for entry in entries]
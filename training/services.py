@@ -0,0 +1,215 @@
+"""
+Enrollment operations that must respect course capacity.
+
+Workers who find a course full join its waitlist. Entries keep their place
+in a stored position, so showing it costs one row lookup; leaving or being
+promoted moves everyone behind forward in one UPDATE. Every waitlist change
+first writes the course row, which serializes them per course. Freed seats
+go to the head of the queue in promote_waitlist(), which training.signals
+runs in the background whenever a seat is released or capacity grows.
+While anyone is waiting, enroll() does not hand out seats to newcomers.
+"""
+from collections import namedtuple
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Case, Exists, F, OuterRef, When
+from django.utils import timezone
+
+from core.cache import touch
+from core.tasks import submit_on_commit
+from workers.models import Worker
+from . import counters
+from .models import Course, Enrollment, WaitlistEntry
+
+BulkEnrollment = namedtuple('BulkEnrollment', ['created', 'reactivated', 'already_enrolled'])
+
+
+class CourseFullError(Exception):
+    """The course has no seats left"""
+
+
+def reserve_seat(course_id, using=None, seats=1, jump_waitlist=False):
+    """Take ``seats`` seats of an active course if it has room for all; True on success.
+
+    The capacity check and the increment are a single conditional UPDATE, so
+    concurrent reservations can never overbook. Seats are refused while
+    workers are waiting unless ``jump_waitlist`` is set.
+    """
+    courses = Course.objects.using(using).filter(
+        pk=course_id, is_active=True, active_enrollment_count__lte=F('capacity') - seats
+    )
+    if not jump_waitlist:
+        courses = courses.filter(waitlist_count=0)
+    return bool(courses.update(active_enrollment_count=F('active_enrollment_count') + seats))
+
+
+def enroll(worker, course, using=None):
+    """Enroll ``worker`` in ``course``, reactivating a dropped enrollment.
+
+    Returns (enrollment, created); created is False when the worker was
+    already enrolled. Raises CourseFullError when no seat is left or others
+    are waiting for one.
+    """
+    using = using or router.db_for_write(Enrollment)
+    try:
+        with transaction.atomic(using=using):
+            # Writing first takes the course's row (or SQLite's database) lock up front
+            reserved = reserve_seat(course.pk, using=using)
+            enrollment = (
+                Enrollment.objects.using(using)
+                .select_for_update()
+                .filter(worker=worker, course=course)
+                .first()
+            )
+            if enrollment and enrollment.is_active:
+                # Hand back the seat taken above
+                transaction.set_rollback(True, using=using)
+                return enrollment, False
+            if not reserved:
+                raise CourseFullError(f'{course} is full')
+            if enrollment is None:
+                enrollment = Enrollment(worker=worker, course=course)
+            enrollment.is_active = True
+            enrollment.status = 'enrolled'
+            # The seat is already counted; see training.signals
+            enrollment._seat_reserved = True
+            enrollment.save(using=using)
+            return enrollment, True
+    except IntegrityError:
+        # A concurrent request enrolled the worker first; the rollback released our seat
+        return Enrollment.objects.using(using).get(worker=worker, course=course), False
+
+
+def bulk_enroll(course, workers, using=None):
+    """Enroll every active worker in the ``workers`` queryset into ``course`` at once.
+
+    Workers already enrolled are left alone and dropped enrollments are
+    reactivated; everyone chosen leaves the course's waitlist. Either
+    everyone gets a seat or nobody does: CourseFullError is raised when the
+    course cannot take them all. The work is a fixed handful of statements
+    plus the bulk INSERT batches, whatever the number of workers. Returns a
+    BulkEnrollment of counts.
+    """
+    using = using or router.db_for_write(Enrollment)
+    enrollments = Enrollment.objects.using(using).filter(worker=OuterRef('pk'), course=course)
+    with transaction.atomic(using=using):
+        # Writing first takes the course's row (or SQLite's database) lock up front
+        touch(Course, [course.pk], using=using)
+        rows = (
+            workers.using(using)
+            .filter(is_active=True)
+            .annotate(enrolled=Exists(enrollments.filter(is_active=True)), dropped=Exists(enrollments))
+            .order_by()
+            .values_list('pk', 'enrolled', 'dropped')
+        )
+        already_enrolled, dropped, new = [], [], []
+        for worker_id, enrolled, has_enrollment in rows:
+            if enrolled:
+                already_enrolled.append(worker_id)
+            elif has_enrollment:
+                dropped.append(worker_id)
+            else:
+                new.append(worker_id)
+
+        remove_from_waitlist(course.pk, workers.using(using).values('pk'), using=using)
+        seats = len(dropped) + len(new)
+        if not seats:
+            return BulkEnrollment(0, 0, len(already_enrolled))
+        # Staff picking who gets in overrides the queue
+        if not reserve_seat(course.pk, using=using, seats=seats, jump_waitlist=True):
+            raise CourseFullError(f'{course} does not have {seats} free seats')
+
+        now = timezone.now()
+        # Queryset writes skip the per-row signals; the count is recounted below
+        reactivated = Enrollment.objects.using(using).filter(course=course, worker_id__in=dropped).update(
+            is_active=True, status='enrolled', updated_at=now,
+        )
+        # Conflicts can only come from rows that appeared since the read above
+        Enrollment.objects.using(using).bulk_create(
+            [Enrollment(worker_id=worker_id, course=course) for worker_id in new],
+            ignore_conflicts=True,
+        )
+        counters.recount_enrollments([course.pk], using=using)
+        touch(Worker, dropped + new, using=using)
+    return BulkEnrollment(len(new), reactivated, len(already_enrolled))
+
+
+def join_waitlist(worker, course, using=None):
+    """Queue ``worker`` for a seat in ``course``; returns (entry, created)"""
+    using = using or router.db_for_write(WaitlistEntry)
+    try:
+        with transaction.atomic(using=using):
+            # The counter update locks the course row, so positions are handed out in order
+            Course.objects.using(using).filter(pk=course.pk).update(
+                waitlist_count=F('waitlist_count') + 1, updated_at=timezone.now(),
+            )
+            position = Course.objects.using(using).values_list('waitlist_count', flat=True).get(pk=course.pk)
+            entry = WaitlistEntry.objects.using(using).create(worker=worker, course=course, position=position)
+    except IntegrityError:
+        return WaitlistEntry.objects.using(using).get(worker=worker, course=course), False
+    # A seat may have opened between the caller finding the course full and now
+    submit_on_commit(promote_waitlist, course.pk, using=using)
+    return entry, True
+
+
+def remove_from_waitlist(course_id, worker_ids, using=None):
+    """Take ``worker_ids`` (ids or a subquery) off a course's waitlist; returns how many were waiting"""
+    using = using or router.db_for_write(WaitlistEntry)
+    with transaction.atomic(using=using):
+        touch(Course, [course_id], using=using)
+        entries = WaitlistEntry.objects.using(using).filter(course_id=course_id, worker_id__in=worker_ids)
+        positions = sorted(entries.values_list('position', flat=True))
+        if not positions:
+            return 0
+        entries.delete()
+        # Everyone behind a removed entry moves forward by the number removed
+        # ahead of them; one branch per run of consecutive removed positions
+        shifts = []
+        for removed, position in enumerate(positions, start=1):
+            if shifts and shifts[-1][0] == position - 1:
+                shifts[-1] = (position, removed)
+            else:
+                shifts.append((position, removed))
+        WaitlistEntry.objects.using(using).filter(course_id=course_id, position__gt=positions[0]).update(
+            position=Case(*[When(position__gt=last, then=F('position') - removed) for last, removed in reversed(shifts)])
+        )
+        Course.objects.using(using).filter(pk=course_id).update(waitlist_count=F('waitlist_count') - len(positions))
+    return len(positions)
+
+
+def leave_waitlist(worker, course, using=None):
+    """Take ``worker`` off the waitlist; False if they were not on it"""
+    return bool(remove_from_waitlist(course.pk, [worker.pk], using=using))
+
+
+def promote_waitlist(course_id, using=None):
+    """Give a course's free seats to the head of its waitlist; returns how many were enrolled.
+
+    The course row and the promoted entries are locked for the duration, so
+    concurrent runs (and concurrent joins and leaves) queue up behind each
+    other instead of handing out a seat twice.
+    """
+    using = using or router.db_for_write(WaitlistEntry)
+    courses = Course.objects.using(using).filter(pk=course_id, is_active=True)
+    if not courses.filter(waitlist_count__gt=0, active_enrollment_count__lt=F('capacity')).exists():
+        return 0
+    promoted = 0
+    with transaction.atomic(using=using):
+        # Writing first takes the course's row (or SQLite's database) lock up front
+        touch(Course, [course_id], using=using)
+        course = courses.select_for_update().first()
+        while course is not None and course.available_spots:
+            heads = list(
+                WaitlistEntry.objects.using(using)
+                .select_for_update()
+                .filter(course_id=course_id)
+                .order_by('position')
+                .values_list('worker_id', flat=True)[:course.available_spots]
+            )
+            if not heads:
+                break
+            # Inactive or already enrolled workers just leave the queue, so repeat until the seats are gone
+            result = bulk_enroll(course, Worker.objects.filter(pk__in=heads), using=using)
+            promoted += result.created + result.reactivated
+            course.refresh_from_db(fields=['capacity', 'active_enrollment_count'])
+    return promoted
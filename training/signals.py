@@ -0,0 +1,180 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core import images
+from core.cache import touch
+from core.tasks import submit_on_commit
+from skills import related as skill_related
+from . import certificates, counters, progress, related, services
+from workers.models import Worker
+from .models import Course, CourseModule, CourseProgress, Enrollment, RelatedCourse, WaitlistEntry
+
+images.track(Course, 'image')
+
+
+def refresh_related(course_ids, skill_ids, using=None):
+    related.refresh(course_ids, using=using)
+    # Skill similarity is partly based on being taught together
+    skill_related.refresh(skill_ids, using=using)
+
+
+def refresh_related_on_commit(course_ids, skill_ids=(), using=None):
+    # Scoring the neighbourhoods takes a few queries, so it stays off the request
+    submit_on_commit(refresh_related, set(course_ids), set(skill_ids), using, using=using)
+
+
+@receiver(post_save, sender=Course)
+def refresh_related_courses(sender, instance, using=None, **kwargs):
+    refresh_related_on_commit([instance.pk], instance.skills.values_list('pk', flat=True), using=using)
+
+
+@receiver(post_save, sender=Course)
+def promote_waitlist_on_course_change(sender, instance, created, raw=False, using=None, **kwargs):
+    # Raised capacity or a reactivated course can open seats for the queue
+    if not created and not raw and instance.is_active and instance.waitlist_count and not instance.is_full:
+        submit_on_commit(services.promote_waitlist, instance.pk, using=using)
+
+
+@receiver(pre_delete, sender=Worker)
+def leave_waitlists_on_worker_delete(sender, instance, using=None, **kwargs):
+    # The entries would cascade away without moving anyone forward or updating waitlist_count
+    course_ids = WaitlistEntry.objects.using(using).filter(worker=instance).values_list('course_id', flat=True)
+    for course_id in list(course_ids):
+        services.remove_from_waitlist(course_id, [instance.pk], using=using)
+
+
+@receiver(pre_delete, sender=Course)
+def refresh_related_courses_on_delete(sender, instance, using=None, **kwargs):
+    listing = RelatedCourse.objects.using(using).filter(related=instance).values_list('course_id', flat=True)
+    refresh_related_on_commit(listing, instance.skills.values_list('pk', flat=True), using=using)
+
+
+@receiver(m2m_changed, sender=Course.skills.through)
+def refresh_related_on_skills_changed(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if action == 'pre_clear':
+        # The cleared side is only known before the rows go
+        cleared = instance.courses if reverse else instance.skills
+        instance._cleared_related_ids = set(cleared.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    changed = pk_set if action != 'post_clear' else getattr(instance, '_cleared_related_ids', set())
+    if reverse:
+        refresh_related_on_commit(changed, [instance.pk], using=using)
+    else:
+        refresh_related_on_commit([instance.pk], changed, using=using)
+
+
+@receiver([post_save, post_delete], sender=CourseModule)
+def touch_course_on_module_change(sender, instance, using=None, **kwargs):
+    touch(Course, [instance.course_id], using=using)
+
+
+@receiver(pre_save, sender=Enrollment)
+def remember_loaded_enrollment(sender, instance, raw=False, using=None, **kwargs):
+    """Fetch the stored state for instances that were not loaded through the ORM"""
+    if raw or instance.pk is None or hasattr(instance, '_loaded_course_id'):
+        return
+    stored = Enrollment.objects.using(using).filter(pk=instance.pk).values_list('course_id', 'is_active').first()
+    if stored:
+        instance._loaded_course_id, instance._loaded_is_active = stored
+
+
+@receiver(post_save, sender=Enrollment)
+def update_enrollment_count_on_save(sender, instance, created, using=None, **kwargs):
+    loaded = (getattr(instance, '_loaded_course_id', None), getattr(instance, '_loaded_is_active', False))
+    if created:
+        loaded = (None, False)
+    # services.enroll() counted its seat when reserving it
+    reserved = instance.__dict__.pop('_seat_reserved', False)
+    if loaded != (instance.course_id, instance.is_active):
+        if loaded[1]:
+            counters.adjust_enrollment_count(loaded[0], -1, using=using)
+            submit_on_commit(services.promote_waitlist, loaded[0], using=using)
+        if instance.is_active and not reserved:
+            counters.adjust_enrollment_count(instance.course_id, 1, using=using)
+
+    instance._loaded_course_id = instance.course_id
+    instance._loaded_is_active = instance.is_active
+
+
+@receiver(post_delete, sender=Enrollment)
+def update_enrollment_count_on_delete(sender, instance, using=None, **kwargs):
+    # Count what was stored, not what may have been edited in memory since
+    if getattr(instance, '_loaded_is_active', instance.is_active):
+        course_id = getattr(instance, '_loaded_course_id', instance.course_id)
+        counters.adjust_enrollment_count(course_id, -1, using=using)
+        submit_on_commit(services.promote_waitlist, course_id, using=using)
+
+
+@receiver(post_save, sender=Enrollment)
+def queue_certificate(sender, instance, raw=False, using=None, **kwargs):
+    # Completions from module progress are queued by training.progress
+    if not raw and instance.status == 'completed' and instance.is_active and not instance.certificate_issued:
+        certificates.enqueue(Enrollment.objects.filter(pk=instance.pk), using=using)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def touch_on_enrollment_change(sender, instance, using=None, **kwargs):
+    # Course pages show the enrolled count, worker pages the enrollments
+    touch(Course, [instance.course_id], using=using)
+    touch(Worker, [instance.worker_id], using=using)
+
+
+@receiver(m2m_changed, sender=Course.skills.through)
+def touch_course_on_skills_change(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        touch(Course, [instance.pk], using=using)
+    elif action == 'post_clear':
+        touch(Course, getattr(instance, '_cleared_related_ids', set()), using=using)
+    else:
+        touch(Course, pk_set, using=using)
+
+
+@receiver(pre_save, sender=CourseProgress)
+def remember_loaded_progress(sender, instance, raw=False, using=None, **kwargs):
+    """Fetch the stored state for instances that were not loaded through the ORM"""
+    if raw or instance.pk is None or hasattr(instance, '_loaded_progress'):
+        return
+    stored = CourseProgress.objects.using(using).filter(pk=instance.pk).first()
+    if stored:
+        instance._loaded_progress = stored._loaded_progress
+
+
+@receiver(post_save, sender=CourseProgress)
+def aggregate_progress_on_save(sender, instance, created, using=None, **kwargs):
+    loaded = None if created else getattr(instance, '_loaded_progress', None)
+    progress.progress_changed(loaded, progress.progress_state(instance), using=using)
+    instance._loaded_progress = progress.progress_state(instance)
+
+
+@receiver(post_delete, sender=CourseProgress)
+def aggregate_progress_on_delete(sender, instance, using=None, **kwargs):
+    # Remove what was stored, not what may have been edited in memory since
+    loaded = getattr(instance, '_loaded_progress', progress.progress_state(instance))
+    progress.progress_changed(loaded, None, using=using)
+
+
+@receiver(pre_save, sender=CourseModule)
+def remember_loaded_module(sender, instance, raw=False, using=None, **kwargs):
+    """Fetch the stored state for instances that were not loaded through the ORM"""
+    if raw or instance.pk is None or hasattr(instance, '_loaded_module'):
+        return
+    stored = CourseModule.objects.using(using).filter(pk=instance.pk).first()
+    if stored:
+        instance._loaded_module = stored._loaded_module
+
+
+@receiver(post_save, sender=CourseModule)
+def aggregate_module_on_save(sender, instance, created, using=None, **kwargs):
+    loaded = None if created else getattr(instance, '_loaded_module', None)
+    progress.module_changed(instance.pk, loaded, progress.module_state(instance), using=using)
+    instance._loaded_module = progress.module_state(instance)
+
+
+@receiver(post_delete, sender=CourseModule)
+def aggregate_module_on_delete(sender, instance, using=None, **kwargs):
+    loaded = getattr(instance, '_loaded_module', progress.module_state(instance))
+    progress.module_changed(instance.pk, loaded, None, using=using)
@@ -1,3 +1,616 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from skills.models import Skill, SkillCategory
+from workers.models import Worker
+from . import certificates, recommendations, related
+from .counters import recount_waitlists
+from .models import (
+    CertificateJob, Course, CourseModule, CourseProgress, CourseRecommendation, Enrollment, RelatedCourse,
+    WaitlistEntry,
+)
+from .services import BulkEnrollment, CourseFullError, bulk_enroll, enroll, join_waitlist, leave_waitlist, promote_waitlist
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class CatalogConditionalGetTests(TestCase):
+    def setUp(self):
+        category = SkillCategory.objects.create(name='Engineering')
+        self.skill = Skill.objects.create(name='Python', description='Python', category=category)
+        instructor = User.objects.create_user('grace')
+        self.course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10, instructor=instructor)
+        self.course.skills.add(self.skill)
+
+    def assertRevalidates(self, url, change):
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_detail_changes_with_its_skills(self):
+        def rename():
+            self.skill.name = 'Python 3'
+            self.skill.save()
+
+        response = self.assertRevalidates(reverse('course_detail', args=[self.course.pk]), rename)
+        self.assertContains(response, 'Python 3')
+
+    def test_list_changes_with_the_skill_dropdown(self):
+        def add_skill():
+            Skill.objects.create(name='Docker', description='Docker', category=self.skill.category)
+
+        response = self.assertRevalidates(reverse('course_list'), add_skill)
+        self.assertContains(response, 'Docker')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class CourseListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        category = SkillCategory.objects.create(name='Engineering')
+        self.python = Skill.objects.create(name='Python', description='Python', category=category)
+        self.pytorch = Skill.objects.create(name='PyTorch', description='PyTorch', category=category)
+        self.course = Course.objects.create(title='Machine learning', description='ML', duration_hours=10, capacity=2)
+        self.course.skills.add(self.python, self.pytorch)
+        Course.objects.create(title='Negotiation', description='Sales', duration_hours=5)
+
+    def courses(self, **params):
+        return list(self.client.get(reverse('course_list'), params).context['courses'])
+
+    def test_course_matching_several_skills_is_listed_once(self):
+        self.assertEqual(self.courses(skill='py'), [self.course])
+        self.assertEqual(self.courses(skill=str(self.pytorch.pk)), [self.course])
+        self.assertEqual(len(self.courses(skill='none')), 2)
+
+    def test_queries_do_not_grow_with_the_courses(self):
+        enroll(make_worker('ada'), self.course)
+        response = self.client.get(reverse('course_list'))
+        self.assertContains(response, '1/2')
+        with self.assertNumQueries(4):
+            self.client.get(reverse('course_list'), {'skill': 'py'})
+        for number in range(5):
+            course = Course.objects.create(title=f'Python {number}', description='Python', duration_hours=1)
+            course.skills.add(self.python)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('course_list'), {'skill': 'py'})
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class CourseDetailFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        category = SkillCategory.objects.create(name='Engineering')
+        self.skill = Skill.objects.create(name='Pandas', description='Pandas', category=category)
+        instructor = User.objects.create_user('grace')
+        self.course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10, instructor=instructor)
+        self.module = CourseModule.objects.create(course=self.course, title='Syntax', duration_minutes=30)
+        self.url = reverse('course_detail', args=[self.course.pk])
+
+    def test_cached_fragments_skip_their_queries(self):
+        with self.assertNumQueries(6):
+            self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.assertContains(self.client.get(self.url), 'Syntax')
+
+    def test_child_changes_re_render_the_fragments(self):
+        self.client.get(self.url)
+        self.module.title = 'Control flow'
+        self.module.save()
+        self.assertContains(self.client.get(self.url), 'Control flow')
+
+        self.course.skills.add(self.skill)
+        self.assertContains(self.client.get(self.url), 'Pandas')
+
+        self.skill.courses.clear()
+        self.assertNotContains(self.client.get(self.url), 'Pandas')
+
+
+def make_worker(username):
+    user = User.objects.create_user(username)
+    return Worker.objects.create(
+        user=user, employee_id=username, department='R&D', position='Engineer', date_of_joining=date(2020, 1, 1),
+    )
+
+
+class StaleSaveTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10)
+        self.worker = make_worker('ada')
+
+    def test_saving_a_stale_course_keeps_its_counters(self):
+        stale = Course.objects.get(pk=self.course.pk)
+        enroll(self.worker, self.course)
+        stale.title = 'Python fundamentals'
+        stale.save()
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.title, 'Python fundamentals')
+        self.assertEqual(self.course.active_enrollment_count, 1)
+
+    def test_saving_a_stale_course_keeps_its_waitlist_count(self):
+        self.course.capacity = 1
+        self.course.save()
+        enroll(self.worker, self.course)
+        stale = Course.objects.get(pk=self.course.pk)
+        join_waitlist(make_worker('grace'), self.course)
+        stale.save()
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.waitlist_count, 1)
+
+    def test_saving_stale_progress_totals_keeps_them(self):
+        stale_course = Course.objects.get(pk=self.course.pk)
+        module = CourseModule.objects.create(course=self.course, title='Syntax', duration_minutes=30)
+        CourseModule.objects.create(course=self.course, title='Types', order=2, duration_minutes=30)
+        enrollment, _ = enroll(self.worker, self.course)
+        stale = Enrollment.objects.get(pk=enrollment.pk)
+        CourseProgress.objects.create(enrollment=enrollment, module=module, completed=True, time_spent_minutes=45)
+
+        stale_course.save()
+        stale.rating = 5
+        stale.save()
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.total_module_minutes, 60)
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.rating, 5)
+        self.assertEqual(
+            (enrollment.completed_modules, enrollment.completed_minutes, enrollment.time_spent_minutes), (1, 30, 45),
+        )
+
+
+class EnrollmentExportTests(TestCase):
+    def test_jsonl_lists_enrollments_with_worker_names(self):
+        course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10)
+        worker = make_worker('ada')
+        worker.user.first_name, worker.user.last_name = 'Ada', 'Lovelace'
+        worker.user.save()
+        enroll(worker, course)
+        enroll(make_worker('grace'), course)
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+
+        response = self.client.get(reverse('export_enrollments'), {'format': 'jsonl'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['worker'] for record in records], ['Ada Lovelace', 'grace'])
+        self.assertEqual(records[0]['course'], 'Python basics')
+        self.assertEqual(records[0]['status'], 'enrolled')
+
+
+class ProgressTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10)
+        self.enrollment, _ = enroll(make_worker('ada'), self.course)
+
+    def test_untimed_courses_keep_their_hand_edited_progress(self):
+        module = CourseModule.objects.create(course=self.course, title='Reading', duration_minutes=0)
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(progress_percentage=40, status='in_progress')
+        CourseProgress.objects.create(enrollment=self.enrollment, module=module, completed=True, time_spent_minutes=20)
+
+        self.enrollment.refresh_from_db()
+        self.assertEqual((self.enrollment.completed_modules, self.enrollment.time_spent_minutes), (1, 20))
+        self.assertEqual((self.enrollment.progress_percentage, self.enrollment.status), (40, 'in_progress'))
+
+    def test_uncompleting_withdraws_the_certificate_until_completed_again(self):
+        module = CourseModule.objects.create(course=self.course, title='Syntax', duration_minutes=30)
+        progress = CourseProgress.objects.create(enrollment=self.enrollment, module=module, completed=True)
+        self.assertEqual(certificates.process(certificates.claim()), (1, 0))
+        self.enrollment.refresh_from_db()
+        self.assertEqual((self.enrollment.status, self.enrollment.certificate_issued), ('completed', True))
+
+        progress.completed = False
+        progress.save()
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.status, 'enrolled')
+        self.assertFalse(self.enrollment.certificate_issued)
+        self.assertIsNone(self.enrollment.completed_date)
+
+        progress.completed = True
+        progress.save()
+        self.assertEqual(CertificateJob.objects.get().status, 'pending')
+        self.assertEqual(certificates.process(certificates.claim()), (1, 0))
+        self.enrollment.refresh_from_db()
+        self.assertTrue(self.enrollment.certificate_issued)
+
+
+class CertificateTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10)
+
+    def complete(self, username):
+        # Saving a completed enrollment queues its certificate
+        return Enrollment.objects.create(worker=make_worker(username), course=self.course, status='completed')
+
+    def test_claimed_jobs_are_rendered_under_unguessable_names(self):
+        first, second = self.complete('ada'), self.complete('grace')
+        job_ids = certificates.claim()
+        self.assertEqual(len(job_ids), 2)
+        self.assertEqual(certificates.claim(), [])
+
+        self.assertEqual(certificates.process(job_ids), (2, 0))
+        first.refresh_from_db()
+        self.assertTrue(first.certificate_issued)
+        self.assertTrue(first.certificate_file.name.startswith(f'certificates/certificate-{first.pk:08d}-'))
+        self.assertNotEqual(
+            first.certificate_file.name.rsplit('-', 1)[1], certificates.certificate_name(second).rsplit('-', 1)[1],
+        )
+        self.assertEqual(set(CertificateJob.objects.values_list('status', flat=True)), {'done'})
+
+    def test_failures_back_off_then_fail(self):
+        self.complete('ada')
+        job = CertificateJob.objects.get()
+        with mock.patch('training.certificates.render', side_effect=OSError('no fonts')):
+            for attempt in range(1, certificates.MAX_ATTEMPTS + 1):
+                CertificateJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+                started = timezone.now()
+                self.assertEqual(certificates.process(certificates.claim()), (0, 1))
+                job.refresh_from_db()
+                self.assertEqual((job.attempts, job.error), (attempt, 'OSError: no fonts'))
+                if attempt < certificates.MAX_ATTEMPTS:
+                    self.assertEqual(job.status, 'pending')
+                    self.assertGreaterEqual(job.run_after, started + timedelta(seconds=certificates.RETRY_DELAY * 2 ** (attempt - 1)))
+                    self.assertEqual(certificates.claim(), [])
+        self.assertEqual(job.status, 'failed')
+
+    def test_storage_error_fails_only_its_job(self):
+        broken, fine = self.complete('ada'), self.complete('grace')
+        save = certificates.default_storage.save
+
+        def save_unless_broken(name, content):
+            if name == certificates.certificate_name(broken):
+                raise OSError('disk full')
+            return save(name, content)
+
+        with mock.patch.object(certificates.default_storage, 'save', save_unless_broken):
+            self.assertEqual(certificates.process(certificates.claim()), (1, 1))
+        jobs = dict(CertificateJob.objects.values_list('enrollment', 'status'))
+        self.assertEqual(jobs, {broken.pk: 'pending', fine.pk: 'done'})
+        broken.refresh_from_db()
+        self.assertFalse(broken.certificate_issued)
+
+    def test_stale_claims_are_retried_until_attempts_run_out(self):
+        self.complete('ada')
+        self.complete('grace')
+        stale = timezone.now() - timedelta(seconds=certificates.CLAIM_TIMEOUT + 1)
+        retried, exhausted = CertificateJob.objects.order_by('pk')
+        CertificateJob.objects.update(status='running', claimed_at=stale)
+        CertificateJob.objects.filter(pk=exhausted.pk).update(attempts=certificates.MAX_ATTEMPTS)
+
+        self.assertEqual(certificates.claim(), [retried.pk])
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, 'failed')
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10, capacity=1)
+        enroll(make_worker('holder'), self.course)
+        self.queued = [make_worker(f'waiting{index}') for index in range(3)]
+        for worker in self.queued:
+            join_waitlist(worker, self.course)
+
+    def assertQueue(self, workers):
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.waitlist_count, len(workers))
+        self.assertEqual(
+            list(self.course.waitlist_entries.order_by('position').values_list('worker', 'position')),
+            [(worker.pk, position) for position, worker in enumerate(workers, start=1)],
+        )
+
+    def test_deleting_a_waiting_worker_moves_the_queue_forward(self):
+        self.queued[1].user.delete()
+        self.assertQueue([self.queued[0], self.queued[2]])
+
+    def test_repair_closes_gaps_in_positions(self):
+        WaitlistEntry.objects.filter(worker=self.queued[0]).delete()
+        Course.objects.filter(pk=self.course.pk).update(waitlist_count=7)
+        self.assertEqual(recount_waitlists(), 1)
+        self.assertQueue(self.queued[1:])
+
+
+class BulkEnrollTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10, capacity=3)
+        self.enrolled, self.dropped, self.new = make_worker('ada'), make_worker('grace'), make_worker('linus')
+        enroll(self.enrolled, self.course)
+        enrollment, _ = enroll(self.dropped, self.course)
+        enrollment.is_active = False
+        enrollment.status = 'dropped'
+        enrollment.save()
+        retired = make_worker('retired')
+        retired.is_active = False
+        retired.save()
+
+    def assertEnrolled(self, workers):
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrollment_count, len(workers))
+        self.assertEqual(
+            set(self.course.enrollments.filter(is_active=True).values_list('worker', flat=True)),
+            {worker.pk for worker in workers},
+        )
+
+    def test_enrolls_new_workers_and_reactivates_dropped_ones(self):
+        self.assertEqual(bulk_enroll(self.course, Worker.objects.all()), BulkEnrollment(1, 1, 1))
+        self.assertEnrolled([self.enrolled, self.dropped, self.new])
+        self.assertEqual(Enrollment.objects.get(worker=self.dropped).status, 'enrolled')
+
+    def test_nobody_is_enrolled_unless_everyone_fits(self):
+        extra = make_worker('alan')
+        with self.assertRaises(CourseFullError):
+            bulk_enroll(self.course, Worker.objects.all())
+        self.assertEnrolled([self.enrolled])
+        self.assertFalse(Enrollment.objects.filter(worker=extra).exists())
+
+    def test_chosen_workers_leave_the_waitlist_ahead_of_the_queue(self):
+        Course.objects.filter(pk=self.course.pk).update(capacity=1)
+        join_waitlist(self.dropped, self.course)
+        join_waitlist(self.new, self.course)
+        Course.objects.filter(pk=self.course.pk).update(capacity=2)
+
+        self.assertEqual(bulk_enroll(self.course, Worker.objects.filter(pk=self.new.pk)), BulkEnrollment(1, 0, 0))
+        self.assertEnrolled([self.enrolled, self.new])
+        self.assertEqual(list(self.course.waitlist_entries.values_list('worker', 'position')), [(self.dropped.pk, 1)])
+        self.assertEqual(self.course.waitlist_count, 1)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_action_enrolls_listed_employees(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        upload = SimpleUploadedFile('ids.csv', b'employee_id,name\nlinus,Linus\nnobody,Nobody\n')
+        response = self.client.post(reverse('admin:training_course_changelist'), {
+            'action': 'enroll_workers', '_selected_action': [self.course.pk], 'apply': 'Enroll workers',
+            'department': 'R&D', 'position': 'engineer', 'employee_ids': upload,
+        }, follow=True)
+        messages = [str(message) for message in response.context['messages']]
+        self.assertEqual(messages, [
+            'Enrolled 1 workers in Python basics (0 re-enrolled, 0 already enrolled).',
+            '1 employee IDs matched no worker: nobody',
+        ])
+        self.assertEnrolled([self.enrolled, self.new])
+
+
+class OnDemandRecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        category = SkillCategory.objects.create(name='Engineering')
+        skill = Skill.objects.create(name='Python', description='Python', category=category)
+        course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10)
+        course.skills.add(skill)
+
+    def test_new_workers_share_one_refresh(self):
+        workers = [make_worker(name) for name in ('ada', 'grace', 'alan')]
+        tasks = []
+        with mock.patch('training.recommendations.submit', lambda fn, *args: tasks.append((fn, args))):
+            for worker in workers:
+                self.assertEqual(recommendations.recommended_courses(worker), [])
+        self.assertEqual(len(tasks), 1)
+
+        load = recommendations.Catalog.load
+        with mock.patch.object(recommendations.Catalog, 'load', side_effect=load) as loaded:
+            fn, args = tasks[0]
+            fn(*args)
+        loaded.assert_called_once()
+        self.assertEqual(
+            set(CourseRecommendation.objects.values_list('worker_id', flat=True)), {worker.pk for worker in workers},
+        )
+        self.assertEqual(recommendations._pending, set())
+
+
+class ConcurrencyTests(TransactionTestCase):
+    """Services racing each other from separate threads, each with its own connection"""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('threads cannot share an in-memory SQLite database; use skilldevplatform.settings_test')
+        # Background tasks run inline so they finish within the test
+        patcher = mock.patch('core.tasks.submit', lambda fn, *args, **kwargs: fn(*args, **kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.course = Course.objects.create(title='Python basics', description='Basics', duration_hours=10, capacity=1)
+
+    def run_concurrently(self, *calls):
+        """Start every call at once; returns what each returned or raised"""
+        barrier = threading.Barrier(len(calls))
+        results = [None] * len(calls)
+
+        def run(index, call):
+            try:
+                barrier.wait()
+                results[index] = call()
+            except Exception as exc:
+                results[index] = exc
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(index, call)) for index, call in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def assertCountersMatchRecount(self):
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrollment_count, self.course.enrollments.filter(is_active=True).count())
+        self.assertEqual(self.course.waitlist_count, self.course.waitlist_entries.count())
+        positions = list(self.course.waitlist_entries.order_by('position').values_list('position', flat=True))
+        self.assertEqual(positions, list(range(1, len(positions) + 1)))
+
+    def test_enrolls_racing_for_the_last_seat(self):
+        first, second = make_worker('ada'), make_worker('grace')
+        results = self.run_concurrently(lambda: enroll(first, self.course), lambda: enroll(second, self.course))
+
+        self.assertEqual(sum(isinstance(result, CourseFullError) for result in results), 1)
+        self.assertEqual(sum(isinstance(result, tuple) and result[1] for result in results), 1)
+        self.assertCountersMatchRecount()
+        self.assertEqual(self.course.active_enrollment_count, 1)
+
+    def fill_course(self, waiting):
+        """Give the only seat to one worker and queue ``waiting`` more; returns (enrollment, queued workers)"""
+        enrollment, _ = enroll(make_worker('holder'), self.course)
+        queued = [make_worker(f'waiting{index}') for index in range(waiting)]
+        for worker in queued:
+            join_waitlist(worker, self.course)
+        return enrollment, queued
+
+    def test_drop_racing_with_promotion(self):
+        enrollment, queued = self.fill_course(2)
+
+        def drop():
+            enrollment.is_active = False
+            enrollment.status = 'dropped'
+            enrollment.save()
+
+        self.run_concurrently(drop, lambda: promote_waitlist(self.course.pk))
+
+        self.assertCountersMatchRecount()
+        self.assertEqual(list(self.course.enrollments.filter(is_active=True).values_list('worker', flat=True)), [queued[0].pk])
+        self.assertEqual(list(self.course.waitlist_entries.values_list('worker', flat=True)), [queued[1].pk])
+
+    def test_concurrent_leaves(self):
+        _, queued = self.fill_course(6)
+        leaving = [queued[1], queued[3], queued[4]]
+        results = self.run_concurrently(*[lambda worker=worker: leave_waitlist(worker, self.course) for worker in leaving])
+
+        self.assertEqual(results, [True] * len(leaving))
+        self.assertCountersMatchRecount()
+        self.assertEqual(
+            list(self.course.waitlist_entries.order_by('position').values_list('worker', flat=True)),
+            [queued[0].pk, queued[2].pk, queued[5].pk],
+        )
+
+
+class RelatedCourseTests(TestCase):
+    def setUp(self):
+        category = SkillCategory.objects.create(name='Engineering')
+        skills = [Skill.objects.create(name=f'Skill {index}', description='', category=category) for index in range(8)]
+        levels = ['beginner', 'intermediate', 'advanced', 'expert']
+        self.courses = []
+        for index in range(12):
+            course = Course.objects.create(
+                title=f'Course {index}', description='', duration_hours=10, difficulty_level=levels[index % 4],
+            )
+            course.skills.add(*skills[index % 6:index % 6 + 3])
+            self.courses.append(course)
+
+    def test_partial_features_score_like_the_full_catalog(self):
+        full = related.load_features()
+        for course in self.courses:
+            with self.subTest(course=course.title):
+                self.assertEqual(
+                    related.compute_related_courses(*related.load_features({course.pk}), {course.pk}),
+                    related.compute_related_courses(*full, {course.pk}),
+                )
+
+    def test_refresh_updates_the_changed_course(self):
+        related.refresh_all()
+        changed = self.courses[0]
+        changed.skills.set(self.courses[5].skills.all())
+        related.refresh([changed.pk])
+
+        expected = related.compute_related_courses(*related.load_features())
+        stored = RelatedCourse.objects.filter(course=changed).order_by('rank').values_list('related', flat=True)
+        self.assertEqual(list(stored), [pk for pk, _ in expected[changed.pk]])
+        self.assertEqual(stored[0], self.courses[5].pk)
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Runs data migrations against rows created with the historical models"""
+
+    def setUp(self):
+        # Rows made with current models fire signals; their background tasks must not hold table locks
+        patcher = mock.patch('core.tasks.submit', lambda fn, *args, **kwargs: fn(*args, **kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+
+class RelatedCourseMigrationTests(MigrationTestCase):
+    def test_neighbours_are_backfilled(self):
+        apps = self.migrate([('training', '0002_course_image_url')])
+        # Skills stay fully migrated, so their current models fit their tables
+        category = SkillCategory.objects.create(name='Engineering')
+        python, django = (Skill.objects.create(name=name, description=name, category=category) for name in ('Python', 'Django'))
+        Course = apps.get_model('training', 'Course')
+        basics, web, other = (
+            Course.objects.create(title=title, description=title, duration_hours=10) for title in ('Basics', 'Web', 'Other')
+        )
+        basics.skills.add(python.pk)
+        web.skills.add(python.pk, django.pk)
+
+        apps = self.migrate([('training', '0003_related_course')])
+        neighbours = apps.get_model('training', 'RelatedCourse').objects.order_by('course_id', 'rank')
+        self.assertEqual(list(neighbours.values_list('course', 'related')), [(basics.pk, web.pk), (web.pk, basics.pk)])
+
+
+class EnrollmentCountMigrationTests(MigrationTestCase):
+    def test_counts_are_backfilled(self):
+        apps = self.migrate([('training', '0003_related_course')])
+        Course = apps.get_model('training', 'Course')
+        busy, empty = (Course.objects.create(title=title, description=title, duration_hours=10) for title in ('Busy', 'Empty'))
+        Enrollment = apps.get_model('training', 'Enrollment')
+        Enrollment.objects.create(worker_id=make_worker('ada').pk, course=busy)
+        Enrollment.objects.create(worker_id=make_worker('grace').pk, course=busy)
+        Enrollment.objects.create(worker_id=make_worker('alan').pk, course=busy, is_active=False)
+
+        apps = self.migrate([('training', '0004_course_active_enrollment_count')])
+        counts = apps.get_model('training', 'Course').objects.values_list('pk', 'active_enrollment_count')
+        self.assertEqual(dict(counts), {busy.pk: 2, empty.pk: 0})
+
+
+class ProgressTotalsMigrationTests(MigrationTestCase):
+    def test_totals_are_backfilled(self):
+        apps = self.migrate([('training', '0005_course_recommendation')])
+        # Other apps stay fully migrated, so their current models fit their tables
+        worker = make_worker('ada')
+        course = apps.get_model('training', 'Course').objects.create(title='Python', description='Python', duration_hours=10)
+        CourseModule = apps.get_model('training', 'CourseModule')
+        syntax = CourseModule.objects.create(course=course, title='Syntax', order=1, duration_minutes=30)
+        types = CourseModule.objects.create(course=course, title='Types', order=2, duration_minutes=45)
+        CourseModule.objects.create(course=course, title='Retired', order=3, duration_minutes=60, is_active=False)
+        enrollment = apps.get_model('training', 'Enrollment').objects.create(worker_id=worker.pk, course=course)
+        CourseProgress = apps.get_model('training', 'CourseProgress')
+        CourseProgress.objects.create(enrollment=enrollment, module=syntax, completed=True, time_spent_minutes=40)
+        CourseProgress.objects.create(enrollment=enrollment, module=types, completed=False, time_spent_minutes=10)
+
+        apps = self.migrate([('training', '0006_progress_totals')])
+        course = apps.get_model('training', 'Course').objects.get(pk=course.pk)
+        self.assertEqual(course.total_module_minutes, 75)
+        enrollment = apps.get_model('training', 'Enrollment').objects.get(pk=enrollment.pk)
+        self.assertEqual((enrollment.completed_modules, enrollment.completed_minutes, enrollment.time_spent_minutes), (1, 30, 50))
@@ -5,6 +5,8 @@ urlpatterns = [
     path('', views.course_list, name='course_list'),
     path('<int:pk>/', views.course_detail, name='course_detail'),
     path('<int:pk>/enroll/', views.enroll_course, name='enroll_course'),
+    path('<int:pk>/waitlist/leave/', views.leave_course_waitlist, name='leave_course_waitlist'),
     path('my-courses/', views.my_courses, name='my_courses'),
+    path('enrollments/export/', views.export_enrollments, name='export_enrollments'),
 ]
 
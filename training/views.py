@@ -1,18 +1,37 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.db.models import Q
-from django.utils import timezone
+from django.db.models import Count, Exists, Max, OuterRef, Q, Subquery
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import require_POST
+from core.cache import FRAGMENT_TIMEOUT
+from core.conditional import conditional_page
+from core.exports import chunked, streaming_export
+from core.pagination import paginate
 from skills.models import Skill
-from .models import Course, Enrollment
-from workers.models import Worker
-import random
+from skills.reference import skill_options
+from .models import Course, Enrollment, RelatedCourse, WaitlistEntry
+from .related import related_courses
+from .services import CourseFullError, enroll, join_waitlist, leave_waitlist
+from workers.services import provision_worker
 
 
+def course_list_version(request):
+    """Validators for course_list: the newest course and skill (for the skill dropdown) and how many of each"""
+    courses = Course.objects.aggregate(updated=Max('updated_at'), count=Count('pk'))
+    if courses['updated'] is None:
+        return None
+    skills = Skill.objects.aggregate(updated=Max('updated_at'), count=Count('pk'))
+    updated = max(courses['updated'], skills['updated'] or courses['updated'])
+    return updated, (courses['count'], skills['count'])
+
+
+@conditional_page(course_list_version)
 def course_list(request):
     """List all courses"""
-    courses = Course.objects.filter(is_active=True).distinct()
-    available_skills = Skill.objects.filter(is_active=True).order_by('name')
+    courses = Course.objects.filter(is_active=True)
+    available_skills = skill_options()
     
     # Search
     query = request.GET.get('q')
@@ -30,13 +49,19 @@ def course_list(request):
     if normalized_skill_query == 'none':
         skill_query = ''
     if skill_query:
+        # A semi-join keeps one row per course, so the page and count queries need no DISTINCT
+        taught = Course.skills.through.objects.filter(course=OuterRef('pk'))
         if skill_query.isdigit():
-            courses = courses.filter(skills__id=int(skill_query))
+            taught = taught.filter(skill_id=int(skill_query))
         else:
-            courses = courses.filter(skills__name__icontains=skill_query)
+            taught = taught.filter(skill__name__icontains=skill_query)
+        courses = courses.filter(Exists(taught))
+    
+    page = paginate(request, courses, ['-created_at'])
     
     context = {
-        'courses': courses,
+        'courses': page.object_list,
+        'page': page,
         'current_difficulty': difficulty,
         'current_skill': skill_query,
         'search_query': query,
@@ -45,15 +70,43 @@ def course_list(request):
     return render(request, 'training/course_list.html', context)
 
 
+def _with_dependencies(courses):
+    """Annotate ``courses`` with when their skills and related courses last changed"""
+    return courses.annotate(
+        skills_updated=Subquery(
+            Skill.objects.filter(courses=OuterRef('pk')).order_by().values('courses')
+            .annotate(updated=Max('updated_at')).values('updated')
+        ),
+        related_updated=Subquery(
+            RelatedCourse.objects.filter(course=OuterRef('pk')).order_by().values('course')
+            .annotate(updated=Max('related__updated_at')).values('updated')
+        ),
+    )
+
+
+def course_detail_version(request, pk):
+    """Validators for course_detail: the course (touched when its modules, enrollments or neighbours change), its skills and related courses"""
+    timestamps = (
+        _with_dependencies(Course.objects.filter(pk=pk))
+        .values_list('updated_at', 'skills_updated', 'related_updated')
+        .first()
+    )
+    if timestamps is None:
+        return None
+    return max(updated for updated in timestamps if updated is not None), ()
+
+
+@conditional_page(course_detail_version)
 def course_detail(request, pk):
     """Detail view for a course"""
-    course = get_object_or_404(Course, pk=pk, is_active=True)
+    # The fragments are keyed on the same timestamps as the validators
+    course = get_object_or_404(_with_dependencies(Course.objects.filter(is_active=True)), pk=pk)
     modules = course.modules.filter(is_active=True)
-    related_courses = Course.objects.filter(skills__in=course.skills.all(), is_active=True).distinct().exclude(pk=pk)[:4]
     
     # Check if user is enrolled
     is_enrolled = False
     enrollment = None
+    waitlist_entry = None
     if request.user.is_authenticated:
         # Auto-create worker profile if it doesn't exist (for display purposes)
         if not hasattr(request.user, 'worker_profile'):
@@ -64,14 +117,19 @@ def course_detail(request, pk):
                 enrollment = Enrollment.objects.get(worker=request.user.worker_profile, course=course, is_active=True)
                 is_enrolled = True
             except Enrollment.DoesNotExist:
-                pass
+                if course.waitlist_count:
+                    # The stored position saves counting the queue on every view
+                    waitlist_entry = WaitlistEntry.objects.filter(worker=request.user.worker_profile, course=course).first()
     
     context = {
         'course': course,
         'modules': modules,
-        'related_courses': related_courses,
+        # Only queried when the cached fragment has to be re-rendered
+        'related_courses': SimpleLazyObject(lambda: related_courses(course)),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
         'is_enrolled': is_enrolled,
         'enrollment': enrollment,
+        'waitlist_entry': waitlist_entry,
     }
     return render(request, 'training/course_detail.html', context)
 
@@ -82,76 +140,47 @@ def enroll_course(request, pk):
     course = get_object_or_404(Course, pk=pk, is_active=True)
     
     # Auto-create worker profile if it doesn't exist
-    if not hasattr(request.user, 'worker_profile'):
-        # Generate unique employee ID
-        max_attempts = 100
-        for _ in range(max_attempts):
-            employee_id = f'EMP{random.randint(10000, 99999)}'
-            if not Worker.objects.filter(employee_id=employee_id).exists():
-                break
-        else:
-            # If we couldn't generate a unique ID, use timestamp-based
-            employee_id = f'EMP{int(timezone.now().timestamp())}'
-        
-        # Create worker profile with default values
-        worker = Worker.objects.create(
-            user=request.user,
-            employee_id=employee_id,
-            department='General',
-            position='Employee',
-            date_of_joining=timezone.now().date(),
-            is_active=True,
-        )
-        messages.info(request, f'Worker profile created automatically! Employee ID: {employee_id}. You can update your profile details later.')
-    else:
-        worker = request.user.worker_profile
+    worker, created = provision_worker(request.user)
+    if created:
+        messages.info(request, f'Worker profile created automatically! Employee ID: {worker.employee_id}. You can update your profile details later.')
     
-    # Check if already enrolled
-    if Enrollment.objects.filter(worker=worker, course=course, is_active=True).exists():
-        messages.warning(request, 'You are already enrolled in this course.')
+    try:
+        _, enrolled = enroll(worker, course)
+    except CourseFullError:
+        entry, joined = join_waitlist(worker, course)
+        if joined:
+            messages.info(request, f'This course is full. You are number {entry.position} on the waitlist and will be enrolled when a seat opens.')
+        else:
+            messages.info(request, f'You are already number {entry.position} on the waitlist.')
         return redirect('course_detail', pk=pk)
-    
-    # Check if course is full
-    if course.is_full:
-        messages.error(request, 'This course is full.')
+    if not enrolled:
+        messages.warning(request, 'You are already enrolled in this course.')
         return redirect('course_detail', pk=pk)
     
-    # Create enrollment
-    Enrollment.objects.create(
-        worker=worker,
-        course=course,
-        status='enrolled'
-    )
-    
     messages.success(request, f'Successfully enrolled in {course.title}!')
     return redirect('course_detail', pk=pk)
 
 
+@login_required
+@require_POST
+def leave_course_waitlist(request, pk):
+    """Take the worker off a course's waitlist"""
+    course = get_object_or_404(Course, pk=pk)
+    worker = getattr(request.user, 'worker_profile', None)
+    if worker is not None and leave_waitlist(worker, course):
+        messages.success(request, f'You left the waitlist for {course.title}.')
+    else:
+        messages.warning(request, 'You are not on the waitlist for this course.')
+    return redirect('course_detail', pk=pk)
+
+
 @login_required
 def my_courses(request):
     """List courses enrolled by the current user"""
     # Auto-create worker profile if it doesn't exist
-    if not hasattr(request.user, 'worker_profile'):
-        # Generate unique employee ID
-        max_attempts = 100
-        for _ in range(max_attempts):
-            employee_id = f'EMP{random.randint(10000, 99999)}'
-            if not Worker.objects.filter(employee_id=employee_id).exists():
-                break
-        else:
-            employee_id = f'EMP{int(timezone.now().timestamp())}'
-        
-        worker = Worker.objects.create(
-            user=request.user,
-            employee_id=employee_id,
-            department='General',
-            position='Employee',
-            date_of_joining=timezone.now().date(),
-            is_active=True,
-        )
-        messages.info(request, f'Worker profile created automatically! Employee ID: {employee_id}.')
-    else:
-        worker = request.user.worker_profile
+    worker, created = provision_worker(request.user)
+    if created:
+        messages.info(request, f'Worker profile created automatically! Employee ID: {worker.employee_id}.')
     
     enrollments = Enrollment.objects.filter(worker=worker, is_active=True).order_by('-enrolled_date')
     
@@ -159,3 +188,39 @@ def my_courses(request):
         'enrollments': enrollments,
     }
     return render(request, 'training/my_courses.html', context)
+
+
+ENROLLMENT_EXPORT_FIELDS = [
+    'employee_id', 'worker', 'department', 'course', 'status', 'progress_percentage',
+    'enrolled_date', 'completed_date', 'certificate_issued', 'rating', 'is_active',
+]
+
+
+@staff_member_required
+def export_enrollments(request):
+    """Stream every enrollment with its progress"""
+    enrollments = Enrollment.objects.values(
+        'pk', 'worker__employee_id', 'worker__user__username', 'worker__user__first_name',
+        'worker__user__last_name', 'worker__department', 'course__title', 'status', 'progress_percentage',
+        'enrolled_date', 'completed_date', 'certificate_issued', 'rating', 'is_active',
+    )
+    
+    def records():
+        for chunk in chunked(enrollments):
+            for enrollment in chunk:
+                name = f"{enrollment['worker__user__first_name']} {enrollment['worker__user__last_name']}".strip()
+                yield {
+                    'employee_id': enrollment['worker__employee_id'],
+                    'worker': name or enrollment['worker__user__username'],
+                    'department': enrollment['worker__department'],
+                    'course': enrollment['course__title'],
+                    'status': enrollment['status'],
+                    'progress_percentage': enrollment['progress_percentage'],
+                    'enrolled_date': enrollment['enrolled_date'],
+                    'completed_date': enrollment['completed_date'],
+                    'certificate_issued': enrollment['certificate_issued'],
+                    'rating': enrollment['rating'],
+                    'is_active': enrollment['is_active'],
+                }
+    
+    return streaming_export(request, 'enrollments', ENROLLMENT_EXPORT_FIELDS, records())
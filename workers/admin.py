@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Worker, WorkerSkill
+from .models import SkillGapTarget, Worker, WorkerSkill
 
 
 class WorkerSkillInline(admin.TabularInline):
@@ -49,3 +49,13 @@ class WorkerSkillAdmin(admin.ModelAdmin):
     search_fields = ['worker__employee_id', 'worker__user__username', 'skill__name']
     list_editable = ['is_active']
     readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(SkillGapTarget)
+class SkillGapTargetAdmin(admin.ModelAdmin):
+    list_display = ['skill', 'department', 'position', 'minimum_level', 'target_percent', 'is_active']
+    list_filter = ['department', 'minimum_level', 'is_active']
+    search_fields = ['skill__name', 'department', 'position']
+    list_editable = ['target_percent', 'is_active']
+    autocomplete_fields = ['skill']
+    readonly_fields = ['created_at', 'updated_at']
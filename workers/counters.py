@@ -0,0 +1,61 @@
+"""
+Denormalized counters derived from worker data.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from skills.models import Skill
+from .models import DepartmentFacet, Worker, WorkerSkill
+
+
+def adjust_skill_worker_count(skill_id, delta, using=None):
+    """Atomically shift one skill's worker_count by ``delta``"""
+    if skill_id is None or not delta:
+        return
+    # Moving updated_at lets conditional GETs of the skill pages see the new count
+    Skill.objects.using(using).filter(pk=skill_id).update(worker_count=F('worker_count') + delta, updated_at=timezone.now())
+
+
+def recount_skill_workers(skill_ids=None, using=None):
+    """Recompute worker_count from WorkerSkill rows; returns the number of skills whose count changed"""
+    active = (
+        WorkerSkill.objects.using(using)
+        .filter(skill=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('skill')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    skills = Skill.objects.using(using).all()
+    if skill_ids is not None:
+        skills = skills.filter(pk__in=skill_ids)
+    count = Coalesce(Subquery(active), 0)
+    return skills.exclude(worker_count=count).update(worker_count=count, updated_at=timezone.now())
+
+
+def adjust_department_count(name, delta, using=None):
+    """Atomically shift one department's active worker count by ``delta``"""
+    if not name or not delta:
+        return
+    facets = DepartmentFacet.objects.using(using)
+    if not facets.filter(name=name).update(worker_count=F('worker_count') + delta) and delta > 0:
+        # First worker of a new department; tolerate a concurrent insert
+        facets.bulk_create([DepartmentFacet(name=name)], ignore_conflicts=True)
+        facets.filter(name=name).update(worker_count=F('worker_count') + delta)
+
+
+def recount_departments(using=None):
+    """Rebuild the department facets from active workers; returns the number of departments"""
+    counts = (
+        Worker.objects.using(using)
+        .filter(is_active=True)
+        .order_by()
+        .values_list('department')
+        .annotate(total=Count('pk'))
+    )
+    facets = [DepartmentFacet(name=name, worker_count=total) for name, total in counts if name]
+    with transaction.atomic(using=using):
+        DepartmentFacet.objects.using(using).all().delete()
+        DepartmentFacet.objects.using(using).bulk_create(facets)
+    return len(facets)
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# Schema of workers.search.WORKER_INDEX as of this migration, inlined so later
+# changes to the live index do not rewrite history
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    workers = apps.get_model('workers', 'Worker')._meta.db_table
+    users = apps.get_model('auth', 'User')._meta.db_table
+    name = "COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, '') || ' ' || COALESCE(u.username, '')"
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS workers_worker_search "
+            "USING fts5(name, employee_id, department, position, tokenize='unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO workers_worker_search (rowid, name, employee_id, department, position) "
+            f"SELECT w.id, {name}, COALESCE(w.employee_id, ''), COALESCE(w.department, ''), COALESCE(w.position, '') "
+            f"FROM {workers} w JOIN {users} u ON u.id = w.user_id"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS workers_worker_search (object_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS workers_worker_search_document_gin ON workers_worker_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO workers_worker_search (object_id, document) "
+            f"SELECT w.id, setweight(to_tsvector('simple', {name}), 'A') "
+            f"|| setweight(to_tsvector('simple', COALESCE(w.employee_id, '')), 'B') "
+            f"|| setweight(to_tsvector('simple', COALESCE(w.department, '')), 'C') "
+            f"|| setweight(to_tsvector('simple', COALESCE(w.position, '')), 'D') "
+            f"FROM {workers} w JOIN {users} u ON u.id = w.user_id "
+            f"ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document"
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS workers_worker_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0002_worker_profile_picture_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0003_worker_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_value', models.PositiveBigIntegerField()),
+            ],
+        ),
+    ]
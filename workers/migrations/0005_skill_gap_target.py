@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:45
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0006_skill_name_unique'),
+        ('workers', '0004_employee_id_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillGapTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('department', models.CharField(blank=True, help_text='Leave blank to apply to every department', max_length=100)),
+                ('position', models.CharField(blank=True, help_text='Leave blank to apply to every position', max_length=100)),
+                ('minimum_level', models.CharField(choices=[('beginner', 'Beginner'), ('intermediate', 'Intermediate'), ('advanced', 'Advanced'), ('expert', 'Expert')], default='intermediate', max_length=20)),
+                ('target_percent', models.PositiveSmallIntegerField(default=50, help_text='Percentage of workers who should hold the skill at the minimum level or above', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(100)])),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gap_targets', to='skills.skill')),
+            ],
+            options={
+                'ordering': ['department', 'position', 'skill__name'],
+                'unique_together': {('department', 'position', 'skill')},
+            },
+        ),
+    ]
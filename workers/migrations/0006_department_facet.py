@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:47
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_department_facets(apps, schema_editor):
+    db = schema_editor.connection.alias
+    DepartmentFacet = apps.get_model('workers', 'DepartmentFacet')
+    counts = (
+        apps.get_model('workers', 'Worker').objects.using(db)
+        .filter(is_active=True)
+        .order_by()
+        .values_list('department')
+        .annotate(total=Count('pk'))
+    )
+    DepartmentFacet.objects.using(db).all().delete()
+    DepartmentFacet.objects.using(db).bulk_create(
+        DepartmentFacet(name=name, worker_count=total) for name, total in counts if name
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0005_skill_gap_target'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('worker_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(backfill_department_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0006_department_facet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worker',
+            name='profile_picture_variants',
+            field=models.CharField(blank=True, editable=False, help_text='Picture whose resized variants exist, maintained by core.images', max_length=100),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:20
+
+from django.db import migrations
+
+
+def forget_variants(apps, schema_editor):
+    # Variants are now named after the whole source file name; sets written
+    # under the old names are regenerated by generate_image_variants
+    db = schema_editor.connection.alias
+    Worker = apps.get_model('workers', 'Worker')
+    Worker.objects.using(db).exclude(profile_picture_variants='').update(profile_picture_variants='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0007_worker_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(forget_variants, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django.urls import reverse
 from core.models import BaseModel
 from skills.models import Skill
@@ -13,11 +14,14 @@ class Worker(BaseModel):
     position = models.CharField(max_length=100)
     phone = models.CharField(max_length=20, blank=True)
     profile_picture = models.ImageField(upload_to='workers/', blank=True, null=True)
+    profile_picture_variants = models.CharField(max_length=100, blank=True, editable=False, help_text="Picture whose resized variants exist, maintained by core.images")
     profile_picture_url = models.URLField(blank=True, null=True, help_text="External profile picture URL as fallback")
     bio = models.TextField(blank=True)
     date_of_joining = models.DateField()
     skills = models.ManyToManyField(Skill, through='WorkerSkill', related_name='workers', blank=True)
     
+    maintained_fields = ['profile_picture_variants']
+    
     class Meta:
         ordering = ['-created_at']
     
@@ -27,6 +31,14 @@ class Worker(BaseModel):
     def get_absolute_url(self):
         return reverse('worker_detail', kwargs={'pk': self.pk})
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets signal handlers tell when the worker was (de)activated or moved
+        instance._loaded_department = instance.__dict__.get('department')
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
+    
     @property
     def full_name(self):
         return self.user.get_full_name() or self.user.username
@@ -60,3 +72,57 @@ class WorkerSkill(BaseModel):
     
     def __str__(self):
         return f"{self.worker} - {self.skill} ({self.proficiency_level})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so signal handlers can apply counter deltas
+        instance._loaded_skill_id = instance.__dict__.get('skill_id')
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
+
+
+class DepartmentFacet(models.Model):
+    """Active worker count per department, maintained by workers.signals"""
+    name = models.CharField(max_length=100, unique=True)
+    worker_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return f"{self.name} ({self.worker_count})"
+
+
+class EmployeeIdSequence(models.Model):
+    """Named counter that employee IDs are allocated from in blocks"""
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} ({self.next_value})"
+
+
+class SkillGapTarget(BaseModel):
+    """Share of a department's workers that should hold a skill at a minimum level"""
+    department = models.CharField(max_length=100, blank=True, help_text="Leave blank to apply to every department")
+    position = models.CharField(max_length=100, blank=True, help_text="Leave blank to apply to every position")
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='gap_targets')
+    minimum_level = models.CharField(
+        max_length=20,
+        choices=WorkerSkill._meta.get_field('proficiency_level').choices,
+        default='intermediate'
+    )
+    target_percent = models.PositiveSmallIntegerField(
+        default=50,
+        validators=[MinValueValidator(1), MaxValueValidator(100)],
+        help_text="Percentage of workers who should hold the skill at the minimum level or above"
+    )
+    
+    class Meta:
+        ordering = ['department', 'position', 'skill__name']
+        unique_together = ['department', 'position', 'skill']
+    
+    def __str__(self):
+        scope = ' / '.join(filter(None, [self.department, self.position])) or 'All departments'
+        return f"{scope}: {self.target_percent}% {self.skill} ({self.minimum_level}+)"
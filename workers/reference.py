@@ -0,0 +1,19 @@
+"""
+Cached worker directory reference data.
+
+Datasets live in the ``directory`` namespace, which workers.signals bumps
+whenever a department's worker count changes.
+"""
+from core.cache import get_reference
+from .models import DepartmentFacet
+
+DIRECTORY = 'directory'
+
+
+def department_facets():
+    """Departments with active workers, with their counts"""
+    return get_reference(
+        DIRECTORY,
+        'department_facets',
+        lambda: list(DepartmentFacet.objects.filter(worker_count__gt=0)),
+    )
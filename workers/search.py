@@ -0,0 +1,76 @@
+"""
+Ranked prefix search over the worker directory.
+
+Each worker has one denormalized search document (names, employee ID,
+department, position) so a directory search is a single index lookup
+instead of icontains scans joined across auth_user and workers_worker.
+"""
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from core.search import FullTextIndex
+
+WORKER_INDEX = FullTextIndex(
+    'workers_worker_search',
+    ['name', 'employee_id', 'department', 'position'],
+    weights=[10.0, 8.0, 3.0, 3.0],
+    prefix_all=True,
+)
+
+SEARCH_RESULT_LIMIT = 500
+
+
+def document(worker):
+    """Search columns for ``worker``; expects ``worker.user`` to be loaded"""
+    user = worker.user
+    return [
+        ' '.join(filter(None, [user.first_name, user.last_name, user.username])),
+        worker.employee_id,
+        worker.department,
+        worker.position,
+    ]
+
+
+def index_workers(workers, using=None):
+    WORKER_INDEX.index(((worker.pk, document(worker)) for worker in workers), using=using)
+
+
+def unindex_workers(pks, using=None):
+    WORKER_INDEX.remove(pks, using=using)
+
+
+def search_workers(queryset, query):
+    """Filter ``queryset`` down to workers matching ``query``, best match first.
+
+    Apply every other filter to ``queryset`` first: the SEARCH_RESULT_LIMIT
+    best matches are taken among its rows. Queries with a digit also match
+    any part of an employee ID ("12345" finds EMP12345), ranked after the
+    index matches.
+
+    The result is annotated with ``search_rank`` (0 is the best match; every
+    row ranks 0 on backends without a full-text index).
+    """
+    if not WORKER_INDEX.supported:
+        return queryset.filter(
+            Q(user__first_name__icontains=query) |
+            Q(user__last_name__icontains=query) |
+            Q(employee_id__icontains=query) |
+            Q(department__icontains=query) |
+            Q(position__icontains=query)
+        ).annotate(search_rank=Value(0, output_field=IntegerField()))
+
+    pks = WORKER_INDEX.search(query, limit=SEARCH_RESULT_LIMIT, within=queryset, using=queryset.db)
+    if any(char.isdigit() for char in query):
+        # The index only matches token prefixes; IDs are also looked up by any part of them
+        found = set(pks)
+        pks += [
+            pk for pk in queryset.filter(employee_id__icontains=query.strip())
+            .order_by('employee_id').values_list('pk', flat=True)[:SEARCH_RESULT_LIMIT]
+            if pk not in found
+        ][:SEARCH_RESULT_LIMIT - len(pks)]
+    if not pks:
+        return queryset.none()
+    ranking = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(pks)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=pks).annotate(search_rank=ranking)
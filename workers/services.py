@@ -0,0 +1,89 @@
+"""
+Worker provisioning.
+
+Employee IDs come from EmployeeIdSequence. Each process reserves a block of
+ID_BLOCK_SIZE numbers with one atomic UPDATE and hands them out from memory,
+so provisioning a worker costs no lookups and concurrent processes can never
+draw the same number. Numbers left in a block when a process exits are
+skipped, which only leaves gaps.
+
+A block only stays in memory when it was reserved in autocommit mode. Inside
+a caller's transaction the reservation would be undone by a rollback while
+the block lived on, so there a single number is reserved per ID.
+"""
+import threading
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmployeeIdSequence, Worker
+
+SEQUENCE_NAME = 'employee_id'
+ID_PREFIX = 'EMP'
+# Above the five-digit range the old random IDs were drawn from
+ID_START = 100000
+ID_BLOCK_SIZE = 20
+
+_lock = threading.Lock()
+_blocks = {}
+
+
+def _reserve_block(size=ID_BLOCK_SIZE, using=None):
+    """Claim the next ``size`` numbers; returns the first one"""
+    sequences = EmployeeIdSequence.objects.using(using)
+    with transaction.atomic(using=using):
+        # The UPDATE locks the row until commit, so concurrent callers queue up
+        if not sequences.filter(name=SEQUENCE_NAME).update(next_value=F('next_value') + size):
+            try:
+                with transaction.atomic(using=using):
+                    sequences.create(name=SEQUENCE_NAME, next_value=ID_START + size)
+                return ID_START
+            except IntegrityError:
+                # Another process created the row first
+                sequences.filter(name=SEQUENCE_NAME).update(next_value=F('next_value') + size)
+        return sequences.get(name=SEQUENCE_NAME).next_value - size
+
+
+def next_employee_id(using=None):
+    """Allocate a new, never handed out employee ID such as 'EMP100000'"""
+    if transaction.get_connection(using).in_atomic_block:
+        # A rollback would release the number, so it must not outlive the transaction
+        return f'{ID_PREFIX}{_reserve_block(1, using)}'
+    key = using or 'default'
+    with _lock:
+        current, end = _blocks.get(key, (0, 0))
+        if current >= end:
+            current = _reserve_block(using=using)
+            end = current + ID_BLOCK_SIZE
+        _blocks[key] = (current + 1, end)
+    return f'{ID_PREFIX}{current}'
+
+
+def provision_worker(user, max_attempts=5):
+    """Return (worker, created) for ``user``, creating a default profile if needed"""
+    try:
+        return user.worker_profile, False
+    except Worker.DoesNotExist:
+        pass
+    for _ in range(max_attempts):
+        # Drawn before the transaction so a failed insert cannot undo the reservation
+        employee_id = next_employee_id()
+        try:
+            with transaction.atomic():
+                worker = Worker.objects.create(
+                    user=user,
+                    employee_id=employee_id,
+                    department='General',
+                    position='Employee',
+                    date_of_joining=timezone.now().date(),
+                    is_active=True,
+                )
+            return worker, True
+        except IntegrityError:
+            # Either a concurrent request provisioned this user, or the ID
+            # was entered by hand elsewhere and the next one is tried
+            worker = Worker.objects.filter(user=user).first()
+            if worker is not None:
+                return worker, False
+    raise IntegrityError(f'Could not allocate an employee ID for {user} after {max_attempts} attempts.')
@@ -0,0 +1,125 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import images
+from core.cache import bump_version_on_commit, touch
+from . import counters, search, talent
+from .models import SkillGapTarget, Worker, WorkerSkill
+from .reference import DIRECTORY
+from .skill_gap import SKILL_GAP
+
+images.track(Worker, 'profile_picture')
+
+
+@receiver(pre_save, sender=WorkerSkill)
+def remember_loaded_worker_skill(sender, instance, raw=False, using=None, **kwargs):
+    """Fetch the stored state for instances that were not loaded through the ORM"""
+    if raw or instance._state.adding or hasattr(instance, '_loaded_skill_id'):
+        return
+    stored = WorkerSkill.objects.using(using).filter(pk=instance.pk).values_list('skill_id', 'is_active').first()
+    if stored:
+        instance._loaded_skill_id, instance._loaded_is_active = stored
+
+
+@receiver(post_save, sender=WorkerSkill)
+def update_skill_worker_count_on_save(sender, instance, created, using=None, **kwargs):
+    loaded = (getattr(instance, '_loaded_skill_id', None), getattr(instance, '_loaded_is_active', False))
+    if created:
+        loaded = (None, False)
+    if loaded != (instance.skill_id, instance.is_active):
+        if loaded[1]:
+            counters.adjust_skill_worker_count(loaded[0], -1, using=using)
+        if instance.is_active:
+            counters.adjust_skill_worker_count(instance.skill_id, 1, using=using)
+
+    pairs = {(instance.worker_id, instance.skill_id), (instance.worker_id, loaded[0])}
+    pairs.discard((instance.worker_id, None))
+    transaction.on_commit(lambda: talent.apply_changes(pairs, using=using), using=using)
+
+    instance._loaded_skill_id = instance.skill_id
+    instance._loaded_is_active = instance.is_active
+
+
+@receiver(post_delete, sender=WorkerSkill)
+def update_skill_worker_count_on_delete(sender, instance, using=None, **kwargs):
+    # Count what was stored, not what may have been edited in memory since
+    if getattr(instance, '_loaded_is_active', instance.is_active):
+        counters.adjust_skill_worker_count(getattr(instance, '_loaded_skill_id', instance.skill_id), -1, using=using)
+    pair = (instance.worker_id, getattr(instance, '_loaded_skill_id', instance.skill_id))
+    transaction.on_commit(lambda: talent.apply_changes([pair], using=using), using=using)
+
+
+@receiver(pre_save, sender=Worker)
+def remember_loaded_worker(sender, instance, raw=False, using=None, **kwargs):
+    """Fetch the stored state for instances that were not loaded through the ORM"""
+    if raw or instance._state.adding or hasattr(instance, '_loaded_is_active'):
+        return
+    stored = Worker.objects.using(using).filter(pk=instance.pk).values_list('department', 'is_active').first()
+    if stored:
+        instance._loaded_department, instance._loaded_is_active = stored
+
+
+@receiver(post_save, sender=Worker)
+def index_worker(sender, instance, using=None, **kwargs):
+    search.index_workers([instance], using=using)
+
+
+@receiver(post_save, sender=Worker)
+def track_worker_changes(sender, instance, created, using=None, **kwargs):
+    """Apply department count deltas and refresh the talent matrix's active mask"""
+    loaded = (getattr(instance, '_loaded_department', None), getattr(instance, '_loaded_is_active', None))
+    if created:
+        loaded = (None, False)
+    if loaded != (instance.department, instance.is_active):
+        if loaded[1]:
+            counters.adjust_department_count(loaded[0], -1, using=using)
+        if instance.is_active:
+            counters.adjust_department_count(instance.department, 1, using=using)
+        bump_version_on_commit(DIRECTORY, using=using)
+    if loaded[1] != instance.is_active:
+        pk = instance.pk
+        transaction.on_commit(lambda: talent.apply_changes(workers=[pk], using=using), using=using)
+
+    instance._loaded_department = instance.department
+    instance._loaded_is_active = instance.is_active
+
+
+@receiver(post_delete, sender=Worker)
+def unindex_worker(sender, instance, using=None, **kwargs):
+    search.unindex_workers([instance.pk], using=using)
+    pk = instance.pk
+    transaction.on_commit(lambda: talent.apply_changes(workers=[pk], using=using), using=using)
+
+
+@receiver(post_delete, sender=Worker)
+def update_department_count_on_delete(sender, instance, using=None, **kwargs):
+    if getattr(instance, '_loaded_is_active', instance.is_active):
+        counters.adjust_department_count(getattr(instance, '_loaded_department', instance.department), -1, using=using)
+        bump_version_on_commit(DIRECTORY, using=using)
+
+
+@receiver(post_save, sender=User)
+def reindex_user_worker(sender, instance, created, update_fields=None, using=None, **kwargs):
+    """Names live on the user, so renaming a user refreshes their worker's document"""
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    workers = list(Worker.objects.using(using).filter(user=instance))
+    for worker in workers:
+        worker.user = instance
+    search.index_workers(workers, using=using)
+    # The profile page shows the user's name and email
+    touch(Worker, [worker.pk for worker in workers], using=using)
+
+
+@receiver([post_save, post_delete], sender=Worker)
+@receiver([post_save, post_delete], sender=WorkerSkill)
+@receiver([post_save, post_delete], sender=SkillGapTarget)
+def invalidate_skill_gap_report(sender, using=None, **kwargs):
+    bump_version_on_commit(SKILL_GAP, using=using)
+
+
+@receiver([post_save, post_delete], sender=WorkerSkill)
+def touch_worker_on_skill_change(sender, instance, using=None, **kwargs):
+    touch(Worker, [instance.worker_id], using=using)
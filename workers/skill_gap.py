@@ -0,0 +1,114 @@
+"""
+Department skill-gap analysis.
+
+The database does the heavy lifting: one GROUP BY counts active holdings per
+(department, position, skill, proficiency level) and another counts
+headcount per (department, position). Gaps against SkillGapTarget rows are
+then computed over those few aggregate rows, so the cost depends on the
+number of departments and targets rather than on the number of workers.
+The report is cached in the ``skill_gap`` namespace, which workers.signals
+bumps whenever workers, their skills or the targets change.
+"""
+import math
+from collections import defaultdict, namedtuple
+
+from django.db.models import Count
+
+from core.cache import get_reference
+from .models import SkillGapTarget, Worker, WorkerSkill
+from .talent import LEVEL_RANK, LEVELS
+
+SKILL_GAP = 'skill_gap'
+REPORT_TIMEOUT = 60 * 60
+
+Gap = namedtuple('Gap', [
+    'department', 'position', 'skill', 'minimum_level', 'target_percent',
+    'headcount', 'holders', 'actual_percent', 'gap_percent', 'workers_needed', 'distribution',
+])
+
+
+def load_profile(using=None):
+    """Aggregate headcounts and proficiency counts in two queries.
+
+    Returns ({(department, position): headcount},
+    {(department, position, skill_id): [count per level in LEVELS order]}).
+    """
+    headcounts = {
+        (row['department'], row['position']): row['total']
+        for row in Worker.objects.using(using)
+        .filter(is_active=True)
+        .order_by()
+        .values('department', 'position')
+        .annotate(total=Count('pk'))
+    }
+    counts = defaultdict(lambda: [0] * len(LEVELS))
+    rows = (
+        WorkerSkill.objects.using(using)
+        .filter(is_active=True, worker__is_active=True)
+        .order_by()
+        .values('worker__department', 'worker__position', 'skill_id', 'proficiency_level')
+        .annotate(total=Count('pk'))
+    )
+    for row in rows:
+        if row['proficiency_level'] in LEVEL_RANK:
+            key = (row['worker__department'], row['worker__position'], row['skill_id'])
+            counts[key][LEVEL_RANK[row['proficiency_level']]] += row['total']
+    return headcounts, dict(counts)
+
+
+def analyze(targets, headcounts, counts):
+    """Compare ``targets`` with the aggregated profile; returns Gaps, largest shortfall first.
+
+    A target with a blank department applies to every department, and one
+    with a blank position covers every position in the department.
+    """
+    positions_by_department = defaultdict(list)
+    for department, position in headcounts:
+        positions_by_department[department].append(position)
+
+    gaps = []
+    for target in targets:
+        departments = [target.department] if target.department else sorted(positions_by_department)
+        minimum = LEVEL_RANK[target.minimum_level]
+        for department in departments:
+            positions = [
+                position for position in positions_by_department.get(department, [])
+                if not target.position or position == target.position
+            ]
+            headcount = sum(headcounts[(department, position)] for position in positions)
+            if not headcount:
+                continue
+            distribution = [0] * len(LEVELS)
+            for position in positions:
+                for index, total in enumerate(counts.get((department, position, target.skill_id), ())):
+                    distribution[index] += total
+            holders = sum(distribution[minimum:])
+            actual = 100 * holders / headcount
+            gaps.append(Gap(
+                department=department,
+                position=target.position,
+                skill=target.skill,
+                minimum_level=target.minimum_level,
+                target_percent=target.target_percent,
+                headcount=headcount,
+                holders=holders,
+                actual_percent=round(actual, 1),
+                gap_percent=round(max(target.target_percent - actual, 0), 1),
+                workers_needed=max(math.ceil(target.target_percent * headcount / 100) - holders, 0),
+                distribution=distribution,
+            ))
+    gaps.sort(key=lambda gap: (-gap.gap_percent, -gap.workers_needed, gap.department, gap.skill.name))
+    return gaps
+
+
+def build_report(using=None):
+    targets = list(SkillGapTarget.objects.using(using).filter(is_active=True).select_related('skill'))
+    if not targets:
+        return []
+    headcounts, counts = load_profile(using=using)
+    return analyze(targets, headcounts, counts)
+
+
+def skill_gap_report():
+    """The cached company-wide report"""
+    return get_reference(SKILL_GAP, 'report', build_report, timeout=REPORT_TIMEOUT)
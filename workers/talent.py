@@ -0,0 +1,184 @@
+"""
+In-memory worker x skill proficiency matrix for talent searches.
+
+For every skill the matrix keeps one bitset per proficiency level, with bit
+``worker_id`` set when that worker holds the skill at that level or above.
+"Python >= advanced AND Docker >= intermediate" is then the AND of two
+integers and the active-worker mask, which takes microseconds even for
+100k workers. Only skills someone holds get bitsets, each as wide as the
+highest worker id holding it.
+
+Each process builds its matrix lazily from WorkerSkill and tags it with
+the version of the ``talent`` cache namespace, which every process shares
+through the database (see core.cache). Changes made by this process are
+applied in place (see workers.signals); changes from other processes bump
+the shared version, and the matrix is rebuilt on the next search at most
+every REBUILD_INTERVAL seconds. Bulk writes that skip signals must call
+invalidate().
+"""
+import threading
+import time
+from collections import defaultdict
+
+from core.cache import bump_version, get_version
+from .models import Worker, WorkerSkill
+
+TALENT = 'talent'
+
+LEVELS = [level for level, _ in WorkerSkill._meta.get_field('proficiency_level').choices]
+LEVEL_RANK = {level: rank for rank, level in enumerate(LEVELS)}
+
+REBUILD_INTERVAL = 30
+
+_lock = threading.RLock()
+_matrix = None
+
+
+def _bitset(ids):
+    """Integer with the bits at ``ids`` set"""
+    if not ids:
+        return 0
+    buffer = bytearray((max(ids) >> 3) + 1)
+    for worker_id in ids:
+        buffer[worker_id >> 3] |= 1 << (worker_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def worker_ids(bits):
+    """Positions of the set bits of ``bits``, ascending"""
+    binary = format(bits, 'b')[::-1] if bits else ''
+    ids = []
+    position = binary.find('1')
+    while position != -1:
+        ids.append(position)
+        position = binary.find('1', position + 1)
+    return ids
+
+
+class ProficiencyMatrix:
+    """Per-skill, per-level bitsets of worker ids plus the active-worker mask"""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.skills = {}
+        self.active = 0
+
+    @classmethod
+    def build(cls, version=None, using=None):
+        matrix = cls(version)
+        workers = Worker.objects.using(using).filter(is_active=True).values_list('pk', flat=True)
+        matrix.active = _bitset(list(workers.iterator(chunk_size=10000)))
+
+        holders = defaultdict(lambda: [[] for _ in LEVELS])
+        rows = (
+            WorkerSkill.objects.using(using)
+            .filter(is_active=True)
+            .values_list('worker_id', 'skill_id', 'proficiency_level')
+        )
+        for worker_id, skill_id, level in rows.iterator(chunk_size=10000):
+            if level in LEVEL_RANK:
+                holders[skill_id][LEVEL_RANK[level]].append(worker_id)
+        for skill_id, by_level in holders.items():
+            # Cumulative: a level's bitset includes every higher level
+            bitsets, ids = [], []
+            for level_ids in reversed(by_level):
+                ids.extend(level_ids)
+                bitsets.append(_bitset(ids))
+            matrix.skills[skill_id] = bitsets[::-1]
+        return matrix
+
+    def set_proficiency(self, worker_id, skill_id, level):
+        """Record ``worker_id``'s level in ``skill_id``; None removes the skill"""
+        rank = LEVEL_RANK.get(level, -1)
+        bitsets = self.skills.setdefault(skill_id, [0] * len(LEVELS))
+        bit = 1 << worker_id
+        for index in range(len(LEVELS)):
+            if index <= rank:
+                bitsets[index] |= bit
+            elif bitsets[index] & bit:
+                bitsets[index] &= ~bit
+
+    def set_active(self, worker_id, active):
+        bit = 1 << worker_id
+        self.active = self.active | bit if active else self.active & ~bit
+
+    def match(self, requirements):
+        """Bitset of active workers meeting every (skill_id, minimum level) pair"""
+        result = self.active
+        for skill_id, level in requirements:
+            bitsets = self.skills.get(skill_id)
+            if not bitsets:
+                return 0
+            result &= bitsets[LEVEL_RANK[level]]
+            if not result:
+                break
+        return result
+
+    def find(self, requirements):
+        return worker_ids(self.match(requirements))
+
+
+def get_matrix(using=None):
+    """This process's matrix, rebuilt when another process changed the data"""
+    global _matrix
+    version = get_version(TALENT)
+    with _lock:
+        stale = _matrix is None or (
+            _matrix.version != version and time.monotonic() - _matrix.built_at >= REBUILD_INTERVAL
+        )
+        if stale:
+            _matrix = ProficiencyMatrix.build(version, using=using)
+        return _matrix
+
+
+def find_workers(requirements, using=None):
+    """Ids of active workers holding every skill in ``requirements`` at or above the level.
+
+    ``requirements`` yields (skill_id, level) pairs, level being one of LEVELS.
+    """
+    return get_matrix(using).find(requirements)
+
+
+def apply_changes(pairs=(), workers=(), using=None):
+    """Patch the matrix after commits made by this process, then publish a new version.
+
+    ``pairs`` are changed (worker_id, skill_id) holdings and ``workers`` the
+    ids of workers whose is_active may have changed. Other processes pick the
+    change up through the version bump.
+    """
+    global _matrix
+    pairs, workers = set(pairs), set(workers)
+    if not pairs and not workers:
+        return
+    with _lock:
+        version = bump_version(TALENT)
+        if _matrix is None or _matrix.version != version - 1:
+            # Someone else changed the data too; rebuild on the next search
+            _matrix = None
+            return
+        levels = {}
+        if pairs:
+            rows = (
+                WorkerSkill.objects.using(using)
+                .filter(
+                    worker_id__in={worker_id for worker_id, _ in pairs},
+                    skill_id__in={skill_id for _, skill_id in pairs},
+                    is_active=True,
+                )
+                .values_list('worker_id', 'skill_id', 'proficiency_level')
+            )
+            levels = {(worker_id, skill_id): level for worker_id, skill_id, level in rows}
+        active = set()
+        if workers:
+            active = set(Worker.objects.using(using).filter(pk__in=workers, is_active=True).values_list('pk', flat=True))
+        for worker_id, skill_id in pairs:
+            _matrix.set_proficiency(worker_id, skill_id, levels.get((worker_id, skill_id)))
+        for worker_id in workers:
+            _matrix.set_active(worker_id, worker_id in active)
+        _matrix.version = version
+
+
+def invalidate():
+    """Force every process to rebuild, for bulk writes that bypass signals"""
+    bump_version(TALENT)
@@ -1,3 +1,324 @@
-from django.test import TestCase
+import csv
+import json
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import cache as core_cache
+from core.cache import bump_version
+from skills.models import Skill, SkillCategory
+from . import services, skill_gap, talent
+from .models import EmployeeIdSequence, SkillGapTarget, Worker, WorkerSkill
+from .search import WORKER_INDEX, search_workers
+
+
+class TalentMatrixTests(TestCase):
+    def setUp(self):
+        talent._matrix = None
+        self.addCleanup(setattr, talent, '_matrix', None)
+        category = SkillCategory.objects.create(name='Engineering')
+        self.skill = Skill.objects.create(name='Python', description='Python', category=category)
+        user = User.objects.create_user('ada')
+        self.worker = Worker.objects.create(
+            user=user, employee_id='E-1', department='R&D', position='Engineer', date_of_joining=date(2020, 1, 1),
+        )
+        WorkerSkill.objects.create(worker=self.worker, skill=self.skill, proficiency_level='advanced')
+
+    def test_rebuilds_after_a_bump_from_another_process(self):
+        requirements = [(self.skill.pk, 'intermediate')]
+        self.assertEqual(talent.find_workers(requirements), [self.worker.pk])
+
+        # Another process writes and bumps the shared version; this one's matrix is untouched
+        WorkerSkill.objects.filter(worker=self.worker).update(proficiency_level='beginner')
+        bump_version(talent.TALENT)
+
+        self.assertEqual(talent.find_workers(requirements), [self.worker.pk])
+        with mock.patch.object(talent, 'REBUILD_INTERVAL', 0):
+            self.assertEqual(talent.find_workers(requirements), [])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class WorkerSearchTests(TestCase):
+    def create(self, username, employee_id, department='R&D', first_name='', is_active=True):
+        user = User.objects.create_user(username, first_name=first_name)
+        return Worker.objects.create(
+            user=user, employee_id=employee_id, department=department, position='Engineer',
+            date_of_joining=date(2020, 1, 1), is_active=is_active,
+        )
+
+    def test_name_matches_rank_above_department_matches(self):
+        department = self.create('grace', 'E-2', department='Ada Labs')
+        name = self.create('lovelace', 'E-1', first_name='Ada')
+        results = search_workers(Worker.objects.all(), 'ada').order_by('search_rank')
+        self.assertEqual(list(results), [name, department])
+
+    @mock.patch('workers.search.SEARCH_RESULT_LIMIT', 2)
+    def test_filters_apply_before_the_result_limit(self):
+        for number in range(3):
+            self.create(f'ada{number}', f'E-{number}', first_name='Ada')
+        self.create('retired', 'E-8', department='Sales', first_name='Ada', is_active=False)
+        wanted = self.create('seller', 'E-9', department='Sales', first_name='Ada')
+
+        response = self.client.get(reverse('worker_list'), {'q': 'ada', 'department': 'Sales'})
+        self.assertEqual(list(response.context['workers']), [wanted])
+
+    def test_any_part_of_an_employee_id_matches(self):
+        worker = self.create('ada', 'EMP12345')
+        self.create('grace', 'EMP99999')
+        for query in ('12345', 'p1234', 'EMP12'):
+            with self.subTest(query=query):
+                self.assertEqual(list(search_workers(Worker.objects.all(), query)), [worker])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class WorkerDetailFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        category = SkillCategory.objects.create(name='Engineering')
+        self.skill = Skill.objects.create(name='Pandas', description='Pandas', category=category)
+        self.user = User.objects.create_user('ada', first_name='Ada', last_name='Lovelace')
+        self.worker = Worker.objects.create(
+            user=self.user, employee_id='E-1', department='R&D', position='Engineer', date_of_joining=date(2020, 1, 1),
+        )
+        self.url = reverse('worker_detail', args=[self.worker.pk])
+
+    def test_cached_page_makes_one_query(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get(self.url), 'Lovelace')
+
+    def test_skill_and_name_changes_re_render_the_page(self):
+        self.client.get(self.url)
+        WorkerSkill.objects.create(worker=self.worker, skill=self.skill, proficiency_level='advanced')
+        self.assertContains(self.client.get(self.url), 'Pandas')
+
+        self.user.last_name = 'Byron'
+        self.user.save()
+        self.assertContains(self.client.get(self.url), 'Byron')
+
+    def test_logging_in_does_not_touch_the_worker(self):
+        updated = self.worker.updated_at
+        self.client.force_login(self.user)
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.updated_at, updated)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class SkillGapTests(TestCase):
+    def setUp(self):
+        for clear in (cache.clear, core_cache._local.clear, core_cache._versions.clear):
+            clear()
+            self.addCleanup(clear)
+        category = SkillCategory.objects.create(name='Engineering')
+        self.python = Skill.objects.create(name='Python', description='Python', category=category)
+        for username, department, position, level in (
+            ('ada', 'R&D', 'Engineer', 'expert'),
+            ('grace', 'R&D', 'Engineer', 'intermediate'),
+            ('linus', 'R&D', 'Engineer', 'beginner'),
+            ('guido', 'R&D', 'Manager', None),
+            ('joan', 'Sales', 'Engineer', 'advanced'),
+            ('mary', 'Sales', 'Engineer', None),
+        ):
+            worker = self.create(username, department, position)
+            if level:
+                WorkerSkill.objects.create(worker=worker, skill=self.python, proficiency_level=level)
+        # Neither an inactive holding nor an inactive worker counts
+        WorkerSkill.objects.filter(worker__user__username='linus').update(is_active=False)
+        retired = self.create('retired', 'R&D', 'Engineer', is_active=False)
+        WorkerSkill.objects.create(worker=retired, skill=self.python, proficiency_level='expert')
+
+    def create(self, username, department, position, is_active=True):
+        user = User.objects.create_user(username)
+        return Worker.objects.create(
+            user=user, employee_id=username, department=department, position=position,
+            date_of_joining=date(2020, 1, 1), is_active=is_active,
+        )
+
+    def summary(self, gaps):
+        return [
+            (gap.department, gap.position, gap.headcount, gap.holders, gap.actual_percent, gap.gap_percent,
+             gap.workers_needed, gap.distribution)
+            for gap in gaps
+        ]
+
+    def test_company_wide_target_reports_each_department(self):
+        SkillGapTarget.objects.create(skill=self.python, minimum_level='intermediate', target_percent=75)
+        self.assertEqual(self.summary(skill_gap.build_report()), [
+            ('R&D', '', 4, 2, 50.0, 25.0, 1, [0, 1, 0, 1]),
+            ('Sales', '', 2, 1, 50.0, 25.0, 1, [0, 0, 1, 0]),
+        ])
+
+    def test_position_target_counts_only_that_position(self):
+        SkillGapTarget.objects.create(
+            department='R&D', position='Engineer', skill=self.python, minimum_level='advanced', target_percent=100,
+        )
+        self.assertEqual(self.summary(skill_gap.build_report()), [
+            ('R&D', 'Engineer', 3, 1, 33.3, 66.7, 2, [0, 1, 0, 1]),
+        ])
+
+    def test_view_filters_by_department_and_follows_target_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            target = SkillGapTarget.objects.create(skill=self.python, minimum_level='intermediate', target_percent=75)
+        self.client.force_login(User.objects.get(username='ada'))
+        response = self.client.get(reverse('skill_gaps'), {'department': 'Sales'})
+        self.assertEqual(response.context['departments'], ['R&D', 'Sales'])
+        self.assertEqual(self.summary(response.context['gaps']), [('Sales', '', 2, 1, 50.0, 25.0, 1, [0, 0, 1, 0])])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            target.target_percent = 50
+            target.save()
+        response = self.client.get(reverse('skill_gaps'), {'department': 'Sales'})
+        self.assertEqual(response.context['gaps'][0].gap_percent, 0)
+
+
+class WorkerExportTests(TestCase):
+    def setUp(self):
+        category = SkillCategory.objects.create(name='Engineering')
+        python = Skill.objects.create(name='Python', description='Python', category=category)
+        docker = Skill.objects.create(name='Docker', description='Docker', category=category)
+        user = User.objects.create_user('ada', email='ada@example.com', first_name='Ada', last_name='Lovelace')
+        self.worker = Worker.objects.create(
+            user=user, employee_id='E-1', department='R&D', position='Engineer', date_of_joining=date(2020, 1, 1),
+        )
+        WorkerSkill.objects.create(worker=self.worker, skill=python, proficiency_level='advanced')
+        WorkerSkill.objects.create(worker=self.worker, skill=docker, proficiency_level='beginner')
+        Worker.objects.create(
+            user=User.objects.create_user('grace'), employee_id='E-2', department='Sales', position='Manager',
+            date_of_joining=date(2021, 6, 1),
+        )
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_workers'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.get(username='ada'))
+        self.assertEqual(self.client.get(reverse('export_workers')).status_code, 302)
+
+    def test_csv_round_trips_through_sync_roster(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row['employee_id'] for row in rows], ['E-1', 'E-2'])
+        self.assertEqual(rows[0]['skills'], 'Docker:beginner|Python:advanced')
+        self.assertEqual(rows[1]['skills'], '')
+
+        Worker.objects.filter(pk=self.worker.pk).update(department='Sales')
+        WorkerSkill.objects.filter(skill__name='Docker').update(proficiency_level='expert')
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        (directory / 'workers.csv').write_text(content)
+        call_command('sync_roster', str(directory / 'workers.csv'), stdout=StringIO())
+
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.department, 'R&D')
+        self.assertEqual(
+            dict(self.worker.worker_skills.values_list('skill__name', 'proficiency_level')),
+            {'Docker': 'beginner', 'Python': 'advanced'},
+        )
+
+    def test_jsonl(self):
+        response, content = self.export(format='jsonl')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertTrue(response['Content-Disposition'].endswith('.jsonl"'))
+        first = json.loads(content.splitlines()[0])
+        self.assertEqual(first['email'], 'ada@example.com')
+        self.assertEqual(first['date_of_joining'], '2020-01-01')
+        self.assertEqual(first['skills'], ['Docker:beginner', 'Python:advanced'])
+
+
+class EmployeeIdTests(TransactionTestCase):
+    def setUp(self):
+        services._blocks.clear()
+        self.addCleanup(services._blocks.clear)
+
+    def test_ids_come_from_one_reserved_block(self):
+        with mock.patch.object(services, '_reserve_block', wraps=services._reserve_block) as reserve:
+            ids = [services.next_employee_id() for _ in range(services.ID_BLOCK_SIZE + 1)]
+        self.assertEqual(ids[:2], ['EMP100000', 'EMP100001'])
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(reserve.call_count, 2)
+
+    def test_rolled_back_reservation_is_not_reused_from_memory(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.assertEqual(services.next_employee_id(), 'EMP100000')
+            raise ValueError
+        self.assertEqual(services._blocks, {})
+        self.assertFalse(EmployeeIdSequence.objects.exists())
+
+        # Another process now reserves the released numbers, and this one must not hand them out again
+        EmployeeIdSequence.objects.create(name=services.SEQUENCE_NAME, next_value=services.ID_START + services.ID_BLOCK_SIZE)
+        self.assertEqual(services.next_employee_id(), f'EMP{services.ID_START + services.ID_BLOCK_SIZE}')
+
+    def test_provisioning_skips_ids_entered_by_hand(self):
+        taken = User.objects.create_user('grace')
+        Worker.objects.create(
+            user=taken, employee_id='EMP100000', department='R&D', position='Engineer', date_of_joining=date(2020, 1, 1),
+        )
+        user = User.objects.create_user('ada')
+        worker, created = services.provision_worker(user)
+        self.assertTrue(created)
+        self.assertEqual(worker.employee_id, 'EMP100001')
+        self.assertEqual(services.provision_worker(user), (worker, False))
+
+
+class WorkerSearchMigrationTests(TransactionTestCase):
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_existing_workers_are_indexed(self):
+        apps = self.migrate([('workers', '0002_worker_profile_picture_url')])
+        user = apps.get_model('auth', 'User').objects.create(username='alovelace', first_name='Ada', last_name='Lovelace')
+        worker = apps.get_model('workers', 'Worker').objects.create(
+            user=user, employee_id='EMP-0042', department='Analytics', position='Engineer', date_of_joining=date(2020, 1, 1),
+        )
+
+        self.migrate([('workers', '0003_worker_search_index')])
+        for query in ('ada', 'lovelace', 'alovel', 'emp 0042', 'analytics eng'):
+            with self.subTest(query=query):
+                self.assertEqual(WORKER_INDEX.search(query), [worker.pk])
+
+
+class DepartmentFacetMigrationTests(TransactionTestCase):
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_facets_are_backfilled(self):
+        apps = self.migrate([('workers', '0005_skill_gap_target')])
+        User = apps.get_model('auth', 'User')
+        Worker = apps.get_model('workers', 'Worker')
+        for username, department, is_active in (('ada', 'R&D', True), ('grace', 'R&D', True), ('alan', 'Sales', False)):
+            Worker.objects.create(
+                user=User.objects.create(username=username), employee_id=username, department=department,
+                position='Engineer', date_of_joining=date(2020, 1, 1), is_active=is_active,
+            )
+
+        apps = self.migrate([('workers', '0006_department_facet')])
+        facets = apps.get_model('workers', 'DepartmentFacet').objects.values_list('name', 'worker_count')
+        self.assertEqual(list(facets), [('R&D', 2)])
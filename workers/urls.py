@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path('', views.worker_list, name='worker_list'),
+    path('find/', views.worker_find, name='worker_find'),
+    path('export/', views.export_workers, name='export_workers'),
+    path('skill-gaps/', views.skill_gaps, name='skill_gaps'),
     path('<int:pk>/', views.worker_detail, name='worker_detail'),
     path('my-profile/', views.my_profile, name='my_profile'),
 ]
@@ -1,34 +1,42 @@
+from collections import defaultdict
+
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from .models import Worker
+from django.contrib.admin.views.decorators import staff_member_required
+from core.cache import FRAGMENT_TIMEOUT
+from core.exports import chunked, streaming_export
+from core.pagination import paginate
+from skills.reference import skill_options
+from . import talent
+from .models import Worker, WorkerSkill
+from .reference import department_facets
+from .search import search_workers
+from .services import provision_worker
+from .skill_gap import skill_gap_report
 
 
 def worker_list(request):
     """List all workers"""
     workers = Worker.objects.filter(is_active=True)
     
-    # Search
-    query = request.GET.get('q')
-    if query:
-        workers = workers.filter(
-            Q(user__first_name__icontains=query) |
-            Q(user__last_name__icontains=query) |
-            Q(employee_id__icontains=query) |
-            Q(department__icontains=query) |
-            Q(position__icontains=query)
-        )
-    
     # Filter by department
     department = request.GET.get('department')
     if department:
         workers = workers.filter(department=department)
     
-    # Get unique departments for filter
-    departments = Worker.objects.filter(is_active=True).values_list('department', flat=True).distinct()
+    # Search, among the filtered workers
+    query = request.GET.get('q')
+    if query:
+        workers = search_workers(workers, query)
+    
+    # Departments and their worker counts for the filter
+    departments = department_facets()
+    
+    page = paginate(request, workers.select_related('user'), ['search_rank', '-created_at'] if query else ['-created_at'])
     
     context = {
-        'workers': workers,
+        'workers': page.object_list,
+        'page': page,
         'departments': departments,
         'current_department': department,
         'search_query': query,
@@ -36,16 +44,72 @@ def worker_list(request):
     return render(request, 'workers/worker_list.html', context)
 
 
+MAX_REQUIREMENTS = 5
+# Talent searches list at most this many of the newest matching workers
+MATCH_LIMIT = 1000
+
+
+def worker_find(request):
+    """Find workers holding every requested skill at a minimum proficiency"""
+    requirements = []
+    for skill_id, level in zip(request.GET.getlist('skill'), request.GET.getlist('level')):
+        if skill_id.isdigit() and level in talent.LEVEL_RANK:
+            requirements.append((int(skill_id), level))
+    requirements = requirements[:MAX_REQUIREMENTS]
+    
+    matrix = talent.get_matrix()
+    matches = matrix.find(requirements) if requirements else []
+    workers = Worker.objects.filter(pk__in=matches[-MATCH_LIMIT:], is_active=True).select_related('user')
+    page = paginate(request, workers, ['-created_at'], count=False) if matches else None
+    
+    # One row per requirement plus blanks to add more
+    rows = [{'skill_id': skill_id, 'level': level} for skill_id, level in requirements]
+    rows += [{'skill_id': None, 'level': 'beginner'}] * max(MAX_REQUIREMENTS - len(rows), 0)
+    
+    context = {
+        'workers': page.object_list if page else [],
+        'page': page,
+        'match_count': len(matches),
+        'requirement_rows': rows[:max(len(requirements) + 1, 3)],
+        # Only skills someone holds can match
+        'skills': [skill for skill in skill_options() if matrix.skills.get(skill.id, [0])[0]],
+        'levels': talent.LEVELS,
+        'searched': bool(requirements),
+    }
+    return render(request, 'workers/worker_find.html', context)
+
+
+@login_required
+def skill_gaps(request):
+    """Departments furthest below their skill targets"""
+    gaps = skill_gap_report()
+    departments = sorted({gap.department for gap in gaps})
+    
+    department = request.GET.get('department')
+    if department:
+        gaps = [gap for gap in gaps if gap.department == department]
+    
+    context = {
+        'gaps': gaps,
+        'departments': departments,
+        'current_department': department,
+        'levels': talent.LEVELS,
+    }
+    return render(request, 'workers/skill_gaps.html', context)
+
+
 def worker_detail(request, pk):
     """Detail view for a worker"""
-    worker = get_object_or_404(Worker, pk=pk, is_active=True)
-    worker_skills = worker.worker_skills.filter(is_active=True)
-    enrollments = worker.enrollments.filter(is_active=True)[:5]
+    worker = get_object_or_404(Worker.objects.select_related('user'), pk=pk, is_active=True)
+    # Lazy querysets: only evaluated when the cached fragments are re-rendered
+    worker_skills = worker.worker_skills.filter(is_active=True).select_related('skill')
+    enrollments = worker.enrollments.filter(is_active=True).select_related('course')[:5]
     
     context = {
         'worker': worker,
         'worker_skills': worker_skills,
         'enrollments': enrollments,
+        'fragment_timeout': FRAGMENT_TIMEOUT,
     }
     return render(request, 'workers/worker_detail.html', context)
 
@@ -53,30 +117,8 @@ def worker_detail(request, pk):
 @login_required
 def my_profile(request):
     """User's own profile"""
-    from django.utils import timezone
-    import random
-    
     # Auto-create worker profile if it doesn't exist
-    if not hasattr(request.user, 'worker_profile'):
-        # Generate unique employee ID
-        max_attempts = 100
-        for _ in range(max_attempts):
-            employee_id = f'EMP{random.randint(10000, 99999)}'
-            if not Worker.objects.filter(employee_id=employee_id).exists():
-                break
-        else:
-            employee_id = f'EMP{int(timezone.now().timestamp())}'
-        
-        worker = Worker.objects.create(
-            user=request.user,
-            employee_id=employee_id,
-            department='General',
-            position='Employee',
-            date_of_joining=timezone.now().date(),
-            is_active=True,
-        )
-    else:
-        worker = request.user.worker_profile
+    worker, _ = provision_worker(request.user)
     
     worker_skills = worker.worker_skills.filter(is_active=True)
     enrollments = worker.enrollments.filter(is_active=True)
@@ -87,3 +129,46 @@ def my_profile(request):
         'enrollments': enrollments,
     }
     return render(request, 'workers/my_profile.html', context)
+
+
+WORKER_EXPORT_FIELDS = [
+    'employee_id', 'username', 'email', 'first_name', 'last_name', 'department', 'position',
+    'phone', 'date_of_joining', 'is_active', 'skills',
+]
+
+
+@staff_member_required
+def export_workers(request):
+    """Stream every worker with their skills, in the format sync_roster reads"""
+    workers = Worker.objects.values(
+        'pk', 'employee_id', 'user__username', 'user__email', 'user__first_name', 'user__last_name',
+        'department', 'position', 'phone', 'date_of_joining', 'is_active',
+    )
+    
+    def records():
+        for chunk in chunked(workers):
+            skills = defaultdict(list)
+            rows = (
+                WorkerSkill.objects
+                .filter(worker_id__in=[worker['pk'] for worker in chunk], is_active=True)
+                .order_by('skill__name')
+                .values_list('worker_id', 'skill__name', 'proficiency_level')
+            )
+            for worker_id, name, level in rows:
+                skills[worker_id].append(f'{name}:{level}')
+            for worker in chunk:
+                yield {
+                    'employee_id': worker['employee_id'],
+                    'username': worker['user__username'],
+                    'email': worker['user__email'],
+                    'first_name': worker['user__first_name'],
+                    'last_name': worker['user__last_name'],
+                    'department': worker['department'],
+                    'position': worker['position'],
+                    'phone': worker['phone'],
+                    'date_of_joining': worker['date_of_joining'],
+                    'is_active': worker['is_active'],
+                    'skills': skills[worker['pk']],
+                }
+    
+    return streaming_export(request, 'workers', WORKER_EXPORT_FIELDS, records())